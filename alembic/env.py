@@ -32,6 +32,7 @@ from extensions.ext_database import Base, engine
 from model.user import User
 from model.mcp_server import McpServer
 from model.chat_window import ChatWindow
+from model.chat_message import ChatMessage
 
 
 target_metadata = Base.metadata
@@ -0,0 +1,70 @@
+"""initial schema
+
+Revision ID: 1a0b3c5d7e92
+Revises: 
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a0b3c5d7e92'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 基线：后续迁移之前已有的 account、mcp_servers、chat_window 表
+    # 已有数据库（表已存在）执行 alembic stamp 1a0b3c5d7e92 后再升级
+    op.create_table(
+        'account',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('create_time', sa.Time(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_account_id', 'account', ['id'])
+    op.create_index('ix_account_name', 'account', ['name'], unique=True)
+    op.create_index('ix_account_email', 'account', ['email'], unique=True)
+
+    op.create_table(
+        'mcp_servers',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('server_name', sa.String(length=100), nullable=False),
+        sa.Column('command', sa.String(length=100), nullable=False),
+        sa.Column('args', postgresql.ARRAY(sa.TEXT()), nullable=False),
+        sa.Column('env', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_mcp_servers_id', 'mcp_servers', ['id'])
+    op.create_index('ix_mcp_servers_user_id', 'mcp_servers', ['user_id'])
+
+    op.create_table(
+        'chat_window',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('summary', sa.String(length=100), nullable=False),
+        sa.Column('content', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_chat_window_id', 'chat_window', ['id'])
+    op.create_index('ix_chat_window_user_id', 'chat_window', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('chat_window')
+    op.drop_table('mcp_servers')
+    op.drop_table('account')
@@ -0,0 +1,28 @@
+"""ensure account.name unique index
+
+Revision ID: 2c8e5a1f7d63
+Revises: 9d2f6b8e4a17
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c8e5a1f7d63'
+down_revision: Union[str, None] = '9d2f6b8e4a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 认证时按用户名查询用户；模型已声明该索引，但未通过 create_all 建表的库可能缺少
+    op.execute('CREATE UNIQUE INDEX IF NOT EXISTS ix_account_name ON account (name)')
+
+
+def downgrade() -> None:
+    # 索引由模型声明，可能在本迁移之前已存在，降级时保留
+    pass
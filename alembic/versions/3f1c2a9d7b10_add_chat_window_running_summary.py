@@ -0,0 +1,28 @@
+"""add chat_window running summary
+
+Revision ID: 3f1c2a9d7b10
+Revises: 1a0b3c5d7e92
+Create Date: 2026-10-19 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b10'
+down_revision: Union[str, None] = '1a0b3c5d7e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_window', sa.Column('running_summary', sa.Text(), nullable=True))
+    op.add_column('chat_window', sa.Column('summarized_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_window', 'summarized_count')
+    op.drop_column('chat_window', 'running_summary')
@@ -0,0 +1,29 @@
+"""add chat_window (user_id, id desc) index
+
+Revision ID: 5b9e3c7d2f18
+Revises: c52e7f1a0d44
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e3c7d2f18'
+down_revision: Union[str, None] = 'c52e7f1a0d44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_chat_window_user_id_id', 'chat_window', ['user_id', sa.text('id DESC')])
+    # 复合索引已覆盖按 user_id 的查询
+    op.execute('DROP INDEX IF EXISTS ix_chat_window_user_id')
+
+
+def downgrade() -> None:
+    op.create_index('ix_chat_window_user_id', 'chat_window', ['user_id'])
+    op.drop_index('ix_chat_window_user_id_id', table_name='chat_window')
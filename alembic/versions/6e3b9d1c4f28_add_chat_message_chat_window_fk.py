@@ -0,0 +1,33 @@
+"""add chat_message chat_window_id foreign key
+
+Revision ID: 6e3b9d1c4f28
+Revises: 2c8e5a1f7d63
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e3b9d1c4f28'
+down_revision: Union[str, None] = '2c8e5a1f7d63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 清理会话已删除后遗留的消息，否则无法创建外键
+    op.execute("""
+        DELETE FROM chat_message m
+        WHERE NOT EXISTS (SELECT 1 FROM chat_window w WHERE w.id = m.chat_window_id)
+    """)
+    # 删除会话时级联删除其消息（唯一约束 uq_chat_message_window_seq 已覆盖 chat_window_id，无需另建索引）
+    op.create_foreign_key('fk_chat_message_chat_window_id', 'chat_message', 'chat_window',
+                          ['chat_window_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_chat_message_chat_window_id', 'chat_message', type_='foreignkey')
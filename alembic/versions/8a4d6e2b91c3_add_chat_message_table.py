@@ -0,0 +1,65 @@
+"""add chat_message table
+
+Revision ID: 8a4d6e2b91c3
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d6e2b91c3'
+down_revision: Union[str, None] = '3f1c2a9d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_message',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('chat_window_id', sa.BigInteger(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('role', sa.String(length=20), nullable=False),
+        sa.Column('content', sa.JSON(), nullable=False),
+        sa.Column('token_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('chat_window_id', 'seq', name='uq_chat_message_window_seq')
+    )
+    op.add_column('chat_window', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+
+    # 将已有会话的 content 数组逐条迁移到 chat_message，序号即数组下标（从 1 开始）
+    op.execute("""
+        INSERT INTO chat_message (chat_window_id, seq, role, content, created_at, updated_at)
+        SELECT w.id, m.seq, m.message ->> 'role', m.message -> 'content', w.updated_at, w.updated_at
+        FROM chat_window w
+        CROSS JOIN LATERAL json_array_elements(w.content) WITH ORDINALITY AS m(message, seq)
+        WHERE w.content IS NOT NULL AND json_typeof(w.content) = 'array'
+    """)
+    op.execute("""
+        UPDATE chat_window w
+        SET message_count = c.message_count
+        FROM (SELECT chat_window_id, max(seq) AS message_count FROM chat_message GROUP BY chat_window_id) c
+        WHERE w.id = c.chat_window_id
+    """)
+
+
+def downgrade() -> None:
+    # 将 chat_message 写回 content，避免丢失升级后追加的消息
+    op.execute("""
+        UPDATE chat_window w
+        SET content = c.content
+        FROM (
+            SELECT chat_window_id, json_agg(json_build_object('role', role, 'content', content) ORDER BY seq) AS content
+            FROM chat_message GROUP BY chat_window_id
+        ) c
+        WHERE w.id = c.chat_window_id
+    """)
+    op.drop_column('chat_window', 'message_count')
+    op.drop_table('chat_message')
@@ -0,0 +1,35 @@
+"""add mcp_servers (user_id, server_name) unique constraint
+
+Revision ID: 9d2f6b8e4a17
+Revises: e7a1d4c9b352
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6b8e4a17'
+down_revision: Union[str, None] = 'e7a1d4c9b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 此前按名称去重在应用层完成，并发写入可能留下同名服务器，只保留最新的一条
+    op.execute("""
+        DELETE FROM mcp_servers a
+        USING mcp_servers b
+        WHERE a.user_id = b.user_id AND a.server_name = b.server_name AND a.id < b.id
+    """)
+    op.create_unique_constraint('uq_mcp_servers_user_id_server_name', 'mcp_servers', ['user_id', 'server_name'])
+    # 唯一约束的索引已覆盖按 user_id 的查询
+    op.execute('DROP INDEX IF EXISTS ix_mcp_servers_user_id')
+
+
+def downgrade() -> None:
+    op.create_index('ix_mcp_servers_user_id', 'mcp_servers', ['user_id'])
+    op.drop_constraint('uq_mcp_servers_user_id_server_name', 'mcp_servers', type_='unique')
@@ -0,0 +1,35 @@
+"""chat_window content to jsonb
+
+Revision ID: c52e7f1a0d44
+Revises: 8a4d6e2b91c3
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e7f1a0d44'
+down_revision: Union[str, None] = '8a4d6e2b91c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('chat_window', 'content',
+                    type_=postgresql.JSONB(),
+                    existing_type=sa.JSON(),
+                    existing_nullable=True,
+                    postgresql_using='content::jsonb')
+
+
+def downgrade() -> None:
+    op.alter_column('chat_window', 'content',
+                    type_=sa.JSON(),
+                    existing_type=postgresql.JSONB(),
+                    existing_nullable=True,
+                    postgresql_using='content::json')
@@ -0,0 +1,27 @@
+"""add chat_window draft
+
+Revision ID: e7a1d4c9b352
+Revises: 5b9e3c7d2f18
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a1d4c9b352'
+down_revision: Union[str, None] = '5b9e3c7d2f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_window', sa.Column('draft', postgresql.JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('chat_window', 'draft')
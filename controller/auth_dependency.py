@@ -0,0 +1,74 @@
+from typing import Optional
+from fastapi import Depends
+from fastapi.security import OAuth2PasswordBearer
+from core.common.container import Container
+from dto.user_dto import UserResult
+from exception.exception import BaseAPIException
+from exception.exception_dict import ExceptionType
+from service.auth_service import AuthService
+
+# 缺少令牌时由 AuthService 统一返回身份验证失败
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+
+def get_auth_service() -> AuthService:
+    return Container.auth_service()
+
+
+async def get_current_user(token: Optional[str] = Depends(oauth2_scheme),
+                           auth_service: AuthService = Depends(get_auth_service)) -> Optional[UserResult]:
+    """
+    当前登录用户，可作为路由器或路由的依赖
+
+    令牌及用户记录命中缓存时不查询数据库。未启用认证（AUTH_ENABLED=false）时返回 None，不做校验。
+
+    Returns:
+        Optional[UserResult]: 当前用户。
+    """
+    if not auth_service.enabled:
+        return None
+    return await auth_service.authenticate(token)
+
+
+def ensure_user(current_user: Optional[UserResult], user_id: Optional[int]):
+    """
+    校验请求操作的用户（路径、请求体或资源所属的 user_id）是否为当前用户
+
+    Args:
+        current_user (Optional[UserResult]): 当前用户，未启用认证时为 None。
+        user_id (Optional[int]): 被操作的用户ID。
+    """
+    if current_user is not None and current_user.id != user_id:
+        raise BaseAPIException(
+            status_code=ExceptionType.AUTHORIZATION_FAILED.code,
+            detail=ExceptionType.AUTHORIZATION_FAILED.message
+        )
+
+
+async def authorize_user_id(user_id: int, current_user: Optional[UserResult] = Depends(get_current_user)):
+    """路径参数 user_id 须为当前用户"""
+    ensure_user(current_user, user_id)
+
+
+async def ensure_chat_window_owner(current_user: Optional[UserResult], chat_window_id: Optional[int]):
+    """
+    会话须属于当前用户，只查询会话所属的用户，不加载会话内容
+
+    会话不存在或属于其他用户时都返回资源未找到，不暴露其他用户的会话是否存在。
+    """
+    if current_user is None or chat_window_id is None:
+        return
+    user_id = await Container.chat_window_service().get_chat_window_user_id(chat_window_id)
+    if user_id is None or user_id != current_user.id:
+        raise BaseAPIException(
+            status_code=ExceptionType.RESOURCE_NOT_FOUND.code,
+            detail=ExceptionType.RESOURCE_NOT_FOUND.message
+        )
+
+
+async def ensure_mcp_server_owner(current_user: Optional[UserResult], server_id: Optional[int]):
+    """MCP 服务器须属于当前用户（对话时会以其命令及环境变量启动进程）；服务器不存在时返回资源未找到"""
+    if current_user is None or not server_id:
+        return
+    server = await Container.mcp_config_service().get_server(server_id)
+    ensure_user(current_user, server.user_id)
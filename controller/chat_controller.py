@@ -1,13 +1,28 @@
+from typing import Optional, TYPE_CHECKING
 from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
+from controller.auth_dependency import get_current_user, ensure_user, ensure_chat_window_owner, \
+    ensure_mcp_server_owner
 from core.common.container import Container
 from dto.chat_dto import ChatDTO
-from service.chat_service import ChatService
+from dto.user_dto import UserResult
+
+if TYPE_CHECKING:
+    # ChatService 依赖 langchain/langgraph 等导入较慢的模块，由容器在首次请求时加载
+    from service.chat_service import ChatService
+
+router = APIRouter(prefix="/chat", tags=["Chat"], dependencies=[Depends(get_current_user)])
+
+
+async def authorize_chat(chat_dto: ChatDTO, current_user: Optional[UserResult]):
+    """请求体中的 user_id 须为当前用户，指定的会话及 MCP 服务器须属于当前用户"""
+    ensure_user(current_user, chat_dto.user_id)
+    await ensure_chat_window_owner(current_user, chat_dto.chat_id)
+    await ensure_mcp_server_owner(current_user, chat_dto.server_id)
 
-router = APIRouter(prefix="/chat", tags=["Chat"])
 
 # 从容器中获取注册在容器中的 ChatService 实例
-def get_chat_service() -> ChatService:
+def get_chat_service() -> "ChatService":
     """
     获取 ChatService 实例
 
@@ -20,7 +35,8 @@ def get_chat_service() -> ChatService:
 
 
 @router.post("/stream_agent", summary="流式返回会话")
-async def stream_response(chat_dto: ChatDTO, chat_service: ChatService = Depends(get_chat_service)):
+async def stream_response(chat_dto: ChatDTO, chat_service: "ChatService" = Depends(get_chat_service),
+                          current_user: Optional[UserResult] = Depends(get_current_user)):
     """
     模型会话接口 - 返回流式响应
 
@@ -29,15 +45,19 @@ async def stream_response(chat_dto: ChatDTO, chat_service: ChatService = Depends
     Args:
         chat_dto (ChatDTO): 包含会话请求数据的对象
         chat_service (ChatService): 会话服务实例（通过依赖注入获取）
+        current_user (Optional[UserResult]): 当前用户（令牌及用户记录命中缓存时不查询数据库）
 
     Returns:
         StreamingResponse: 流式响应对象，媒体类型为 text/event-stream
     """
+    await authorize_chat(chat_dto, current_user)
     return StreamingResponse(
         chat_service.agent_stream(chat_dto),
         media_type="text/event-stream"
     )
 
 @router.post("/normal_chat", summary="普通会话")
-async def normal_chat(chat_dto: ChatDTO, chat_service: ChatService = Depends(get_chat_service)):
+async def normal_chat(chat_dto: ChatDTO, chat_service: "ChatService" = Depends(get_chat_service),
+                      current_user: Optional[UserResult] = Depends(get_current_user)):
+    await authorize_chat(chat_dto, current_user)
     return await chat_service.normal_chat(chat_dto)
\ No newline at end of file
@@ -1,18 +1,52 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request, Response
+from controller.auth_dependency import get_current_user, authorize_user_id, ensure_chat_window_owner
 from core.common.container import Container
 from dto.global_response import GlobalResponse
+from dto.user_dto import UserResult
 from service.chat_window_service import ChatWindowService
 from utils import result_utils
 
-router = APIRouter(prefix="/chat_window", tags=["ChatWindow"])
+router = APIRouter(prefix="/chat_window", tags=["ChatWindow"], dependencies=[Depends(get_current_user)])
 
 
 def get_chat_window_service():
     return Container.chat_window_service()
 
 
-@router.get("/chat_window_list/{user_id}", summary="用户会话列表")
-async def get_chat_window_list(user_id: int, chat_window_service: ChatWindowService = Depends(get_chat_window_service)) \
+@router.get("/chat_window_list/{user_id}", summary="用户会话列表", dependencies=[Depends(authorize_user_id)])
+async def get_chat_window_list(user_id: int, request: Request,
+                               chat_window_service: ChatWindowService = Depends(get_chat_window_service)) -> Response:
+    etag = await chat_window_service.get_user_chat_windows_etag(user_id)
+    if result_utils.is_not_modified(request, etag):
+        return result_utils.build_not_modified_response(etag)
+    response = await result_utils.build_stream_response(chat_window_service.stream_user_chat_windows(user_id))
+    return result_utils.set_cache_headers(response, etag)
+
+
+@router.get("/chat_window_page/{user_id}", summary="用户会话列表（分页，不含对话记录）",
+            dependencies=[Depends(authorize_user_id)])
+async def get_chat_window_page(user_id: int, before: Optional[int] = None, limit: int = Query(20, ge=1, le=100),
+                               chat_window_service: ChatWindowService = Depends(get_chat_window_service)) \
         -> GlobalResponse:
-    result = await chat_window_service.get_user_chat_windows(user_id)
+    result = await chat_window_service.get_user_chat_window_page(user_id, before, limit)
+    return result_utils.build_response(result)
+
+
+@router.get("/{chat_window_id}", summary="会话详情")
+async def get_chat_window(chat_window_id: int,
+                          chat_window_service: ChatWindowService = Depends(get_chat_window_service),
+                          current_user: Optional[UserResult] = Depends(get_current_user)) -> GlobalResponse:
+    await ensure_chat_window_owner(current_user, chat_window_id)
+    result = await chat_window_service.get_chat_window(chat_window_id)
+    return result_utils.build_response(result)
+
+
+@router.get("/{chat_window_id}/messages", summary="会话消息（按序号游标分页）")
+async def get_chat_messages(chat_window_id: int, before: Optional[int] = None, since: Optional[int] = None,
+                            limit: int = Query(50, ge=1, le=200),
+                            chat_window_service: ChatWindowService = Depends(get_chat_window_service),
+                            current_user: Optional[UserResult] = Depends(get_current_user)) -> GlobalResponse:
+    await ensure_chat_window_owner(current_user, chat_window_id)
+    result = await chat_window_service.get_chat_messages(chat_window_id, before, since, limit)
     return result_utils.build_response(result)
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, Request, Response
+from controller.auth_dependency import get_current_user, authorize_user_id, ensure_user
 from core.common.container import Container
 from dto.global_response import GlobalResponse
-from dto.mcp_server_dto import MCPServerDTO, CreateMCPServerDTO
+from dto.user_dto import UserResult
+from dto.mcp_server_dto import MCPServerDTO, CreateMCPServerDTO, MCPServersConfigDTO
 from service.mcp_config_service import MCPConfigService
 from utils import result_utils
 
-router = APIRouter(prefix="/mcp", tags=["MCPServer"])
+router = APIRouter(prefix="/mcp", tags=["MCPServer"], dependencies=[Depends(get_current_user)])
 
 
 def get_mcp_config_service() -> MCPConfigService:
@@ -13,27 +16,34 @@ def get_mcp_config_service() -> MCPConfigService:
     return mcp_config_service
 
 
-@router.get("/mcp_server_list/{user_id}")
-async def mcp_server_list(user_id: int, mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)) \
-        -> GlobalResponse:
-    mcp_servers = await mcp_config_service.get_user_servers(user_id)
-    return result_utils.build_response(mcp_servers)
+@router.get("/mcp_server_list/{user_id}", dependencies=[Depends(authorize_user_id)])
+async def mcp_server_list(user_id: int, request: Request,
+                          mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)) -> Response:
+    etag = await mcp_config_service.get_user_servers_etag(user_id)
+    if result_utils.is_not_modified(request, etag):
+        return result_utils.build_not_modified_response(etag)
+    response = await result_utils.build_stream_response(mcp_config_service.stream_user_servers(user_id))
+    return result_utils.set_cache_headers(response, etag)
 
 
 @router.get("/mcp_server/{_id}")
 async def get_server(
         _id: int,
-        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)
+        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service),
+        current_user: Optional[UserResult] = Depends(get_current_user)
 ) -> GlobalResponse:
     server = await mcp_config_service.get_server(_id)
+    ensure_user(current_user, server.user_id)
     return result_utils.build_response(server)
 
 
 @router.post("/mcp_server")
 async def add_server(
         server: CreateMCPServerDTO,
-        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)
+        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service),
+        current_user: Optional[UserResult] = Depends(get_current_user)
 ) -> GlobalResponse:
+    ensure_user(current_user, server.user_id)
     new_server = await mcp_config_service.add_server(server)
     return result_utils.build_response(new_server)
 
@@ -41,8 +51,12 @@ async def add_server(
 @router.put("/mcp_server")
 async def update_server(
         server: MCPServerDTO,
-        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)
+        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service),
+        current_user: Optional[UserResult] = Depends(get_current_user)
 ) -> GlobalResponse:
+    ensure_user(current_user, server.user_id)
+    if current_user is not None:
+        ensure_user(current_user, (await mcp_config_service.get_server(server.id)).user_id)
     updated_server = await mcp_config_service.update_server(server)
     return result_utils.build_response(updated_server)
 
@@ -50,7 +64,31 @@ async def update_server(
 @router.delete("/mcp_server/{_id}")
 async def delete_server(
         _id: int,
-        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)
+        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service),
+        current_user: Optional[UserResult] = Depends(get_current_user)
 ) -> GlobalResponse:
+    if current_user is not None:
+        ensure_user(current_user, (await mcp_config_service.get_server(_id)).user_id)
     await mcp_config_service.delete_server(_id)
     return result_utils.build_response(None)
+
+
+@router.post("/mcp_servers/import/{user_id}", summary="以 mcpServers 格式批量导入服务器",
+             dependencies=[Depends(authorize_user_id)])
+async def import_servers(
+        user_id: int,
+        config: MCPServersConfigDTO,
+        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)
+) -> GlobalResponse:
+    servers = await mcp_config_service.import_servers(user_id, config)
+    return result_utils.build_response(servers)
+
+
+@router.get("/mcp_servers/export/{user_id}", summary="以 mcpServers 格式导出服务器",
+            dependencies=[Depends(authorize_user_id)])
+async def export_servers(
+        user_id: int,
+        mcp_config_service: MCPConfigService = Depends(get_mcp_config_service)
+) -> GlobalResponse:
+    config = await mcp_config_service.export_servers(user_id)
+    return result_utils.build_response(config)
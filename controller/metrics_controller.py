@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends
+from controller.auth_dependency import get_current_user
+from core.common.container import Container
+from dto.global_response import GlobalResponse
+from extensions.ext_database import pool_stats
+from utils import result_utils
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"], dependencies=[Depends(get_current_user)])
+
+
+@router.get("/llm_scheduler", summary="模型请求调度指标")
+async def llm_scheduler_metrics() -> GlobalResponse:
+    """
+    获取各模型提供方的排队深度、并发数、剩余配额及平均排队耗时
+    """
+    return result_utils.build_response(Container.llm_scheduler().stats())
+
+
+@router.get("/response_cache", summary="模型响应缓存指标")
+async def response_cache_metrics() -> GlobalResponse:
+    """
+    获取普通会话响应缓存的命中率、淘汰次数及占用字节数
+    """
+    return result_utils.build_response(Container.response_cache().stats())
+
+
+@router.get("/singleflight", summary="相同请求合并指标")
+async def singleflight_metrics() -> GlobalResponse:
+    """
+    获取相同请求合并的上游调用次数及被合并次数
+    """
+    return result_utils.build_response(Container.singleflight().stats())
+
+
+@router.get("/persist_queue", summary="会话写入队列指标")
+async def persist_queue_metrics() -> GlobalResponse:
+    """
+    获取会话写入队列的长度、批量写入次数、重试及落盘情况
+    """
+    return result_utils.build_response(Container.chat_persist_queue().stats())
+
+
+@router.get("/database", summary="数据库连接池指标")
+async def database_metrics() -> GlobalResponse:
+    """
+    获取主库及只读副本连接池的使用率、取连接次数、等待耗时及超时次数
+    """
+    return result_utils.build_response(pool_stats())
+
+
+@router.get("/mcp_config_cache", summary="MCP 服务器配置缓存指标")
+async def mcp_config_cache_metrics() -> GlobalResponse:
+    """
+    获取 MCP 服务器启动参数缓存的命中率、失效次数及变更通知监听状态
+    """
+    return result_utils.build_response(Container.mcp_server_config_cache().stats())
+
+
+@router.get("/password_hasher", summary="密码哈希线程池指标")
+async def password_hasher_metrics() -> GlobalResponse:
+    """
+    获取密码哈希线程池的排队数、完成及拒绝次数、平均计算耗时
+    """
+    return result_utils.build_response(Container.password_hasher().stats())
+
+
+@router.get("/auth", summary="令牌认证缓存指标")
+async def auth_metrics() -> GlobalResponse:
+    """
+    获取已解码令牌及用户记录缓存的命中率及缓存数
+    """
+    return result_utils.build_response(Container.auth_service().stats())
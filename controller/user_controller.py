@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends
+from controller.auth_dependency import get_current_user
 from dto.user_dto import UserResult, UserInit
 from core.common.container import Container
 from service.user_service import UserService
@@ -19,7 +20,8 @@ def convert_to_user_result(users: List[User]) -> List[UserResult]:
     return [UserResult(id=user.id, name=user.name, email=user.email) for user in users]
 
 
-@router.get("/users", summary="用户列表", response_model=List[UserResult])
+@router.get("/users", summary="用户列表", response_model=List[UserResult],
+            dependencies=[Depends(get_current_user)])
 async def list_users(user_service: UserService = Depends(get_user_service)):
     """
     List all users 用户列表
@@ -0,0 +1,217 @@
+import os
+import zlib
+from typing import Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 加载环境变量
+load_dotenv()
+
+# 默认压缩的响应类型（前缀匹配）
+DEFAULT_COMPRESSIBLE_TYPES = ("application/json", "text/")
+# 默认不压缩的响应类型：逐 token 推送的事件流，压缩器缓冲会增加首字及每个 token 的延迟
+DEFAULT_EXCLUDED_TYPES = ("text/event-stream",)
+# 默认不压缩的路径
+DEFAULT_EXCLUDED_PATHS = ("/chat/stream_agent",)
+
+
+def _split(value: Optional[str], default: Tuple[str, ...]) -> Tuple[str, ...]:
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+def _load_brotli():
+    """brotli 为可选依赖，未安装时只使用 gzip"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+class _Encoder:
+    """增量压缩器"""
+
+    def __init__(self, encoding: str, level: int, brotli_module=None):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli_module.Compressor(quality=level)
+        else:
+            # wbits=31：带 gzip 头及校验
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self.encoding == "br" else self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件（brotli 优先，未安装时使用 gzip）
+
+    只压缩 JSON 及文本响应，且仅在客户端通过 Accept-Encoding 声明支持时压缩：
+    - 一次性返回的响应小于 min_size 时不压缩，压缩收益抵不上 CPU 开销；
+    - 分块返回的响应（如流式列表接口）逐块增量压缩，不缓冲整个响应体；
+    - 事件流（text/event-stream）及排除的路径（默认 /chat/stream_agent）原样透传，不影响逐 token 推送的延迟；
+    - 已设置 Content-Encoding 的响应不再压缩。
+
+    压缩后的响应体与原响应体字节不同，强 ETag 转为弱 ETag（与 nginx 的做法一致），条件请求按弱比较仍可命中。
+    """
+
+    def __init__(self, app: ASGIApp, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4,
+                 compressible_types: Iterable[str] = DEFAULT_COMPRESSIBLE_TYPES,
+                 excluded_types: Iterable[str] = DEFAULT_EXCLUDED_TYPES,
+                 excluded_paths: Iterable[str] = DEFAULT_EXCLUDED_PATHS,
+                 enable_brotli: bool = True):
+        """
+        初始化压缩中间件
+
+        Args:
+            app (ASGIApp): 下游应用。
+            min_size (int): 一次性返回的响应体达到该字节数才压缩。
+            gzip_level (int): gzip 压缩级别（1-9）。
+            brotli_quality (int): brotli 压缩质量（0-11），数值越大越慢。
+            compressible_types (Iterable[str]): 压缩的响应类型前缀。
+            excluded_types (Iterable[str]): 不压缩的响应类型前缀，优先于 compressible_types。
+            excluded_paths (Iterable[str]): 不压缩的请求路径。
+            enable_brotli (bool): 是否启用 brotli（需安装 brotli 包）。
+        """
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.compressible_types = tuple(compressible_types)
+        self.excluded_types = tuple(excluded_types)
+        self.excluded_paths = frozenset(excluded_paths)
+        self.brotli = _load_brotli() if enable_brotli else None
+
+    @classmethod
+    def options_from_env(cls) -> dict:
+        """从环境变量读取中间件参数，用于 app.add_middleware(CompressionMiddleware, **options)"""
+        return {
+            "min_size": int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+            "gzip_level": int(os.getenv("COMPRESSION_GZIP_LEVEL", 6)),
+            "brotli_quality": int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4)),
+            "excluded_paths": _split(os.getenv("COMPRESSION_EXCLUDED_PATHS"), DEFAULT_EXCLUDED_PATHS),
+            "enable_brotli": os.getenv("COMPRESSION_BROTLI_ENABLED", "true").lower() == "true",
+        }
+
+    def select_encoding(self, accept_encoding: str) -> Optional[str]:
+        """
+        根据 Accept-Encoding 选择编码，同等可用时优先 brotli
+
+        Args:
+            accept_encoding (str): 请求头 Accept-Encoding。
+
+        Returns:
+            Optional[str]: "br"、"gzip"，客户端都不支持时返回 None。
+        """
+        accepted: List[str] = []
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if quality > 0:
+                accepted.append(name.strip().lower())
+        if self.brotli is not None and ("br" in accepted or "*" in accepted):
+            return "br"
+        if "gzip" in accepted or "*" in accepted:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        encoding = self.select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self, encoding, send).run(self.app, scope, receive)
+
+    def compressible(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").lower()
+        if content_type.startswith(self.excluded_types):
+            return False
+        return content_type.startswith(self.compressible_types)
+
+    def encoder(self, encoding: str) -> _Encoder:
+        level = self.brotli_quality if encoding == "br" else self.gzip_level
+        return _Encoder(encoding, level, self.brotli)
+
+
+class _CompressionResponder:
+    """单个请求的压缩状态：收到第一个响应体消息后决定是否压缩"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        # None：尚未决定；False：透传；_Encoder：压缩
+        self.encoder = None
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive):
+        await app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if self.middleware.compressible(headers):
+                # 等到第一个响应体消息再决定是否压缩
+                self.start_message = message
+                return
+            self.encoder = False
+            await self.send(message)
+            return
+
+        if message_type != "http.response.body" or self.encoder is False:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.middleware.min_size:
+                # 小响应（包括 304 等无响应体的响应）不压缩
+                self.encoder = False
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            self.encoder = self.middleware.encoder(self.encoding)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            if not more_body:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            # 分块响应：长度未知，改为分块传输
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -1,39 +1,132 @@
+import importlib
+import os
 from dependency_injector import containers, providers
 
 from extensions.ext_database import DatabaseProvider
+from dao.base_dao import UnitOfWorkProvider
 from dao.user_dao import UserDAO
 from dao.chat_window_dao import ChatWindowDAO
+from dao.chat_message_dao import ChatMessageDAO
 from dao.mcp_server_dao import MCPServerDAO
-from service.chat_service import ChatService
 from service.chat_window_service import ChatWindowService
+from service.chat_summary_service import ChatSummaryService
+from service.chat_message_service import ChatMessageService
+from service.chat_persist_queue import ChatPersistQueue
+from service.chat_draft_service import ChatDraftService
 from service.mcp_config_service import MCPConfigService
 from service.user_service import UserService
-from core.llm.qwen_open_ai import QwenLlm
+from service.auth_service import AuthService
+from core.common.password_hasher import PasswordHasher
+from core.llm.llm_scheduler import LLMScheduler
+from core.llm.response_cache import ResponseCache
+from core.llm.singleflight import SingleFlight
+from core.llm.token_counter import TokenCounter
+from core.llm.agent_checkpointer import AgentCheckpointer
+from core.history.history_store import create_history_store
+from core.mcp.server_config_cache import MCPServerConfigCache
+
+
+def lazy(target: str):
+    """
+    延迟导入的工厂
+
+    模型、langchain/langgraph 及 MCP 客户端相关模块导入较慢，按 "模块:属性" 声明，
+    首次创建实例时才导入，import main 及 worker 启动时不加载。
+
+    Args:
+        target (str): "模块:属性"，属性可为类或类方法，如 "core.llm.context_builder:ContextBuilder.from_env"。
+
+    Returns:
+        Callable: 导入目标并以相同参数调用的工厂函数。
+    """
+    module_name, _, attribute = target.partition(":")
+
+    def factory(*args, **kwargs):
+        obj = importlib.import_module(module_name)
+        for name in attribute.split("."):
+            obj = getattr(obj, name)
+        return obj(*args, **kwargs)
+
+    factory.__qualname__ = factory.__name__ = f"lazy({target})"
+    return factory
 
 
 class Container(containers.DeclarativeContainer):
     # 注册数据库会话提供器
     database_provider = providers.Singleton(DatabaseProvider)
+    # 注册请求级工作单元
+    unit_of_work = providers.Singleton(UnitOfWorkProvider, session_factory=database_provider.provided.session_factory)
 
     # 注册 user DAO
     user_dao = providers.Singleton(UserDAO, session_factory=database_provider.provided.session_factory)
+    # 注册密码哈希线程池
+    password_hasher = providers.Singleton(PasswordHasher.from_env)
+    # 注册令牌认证 Service
+    auth_service = providers.Singleton(AuthService.from_config, user_dao=user_dao)
     # 注册 user Service
-    user_service = providers.Singleton(UserService, user_dao=user_dao)
+    user_service = providers.Singleton(UserService, user_dao=user_dao, password_hasher=password_hasher,
+                                       auth_service=auth_service)
 
+    # 注册 MCP 服务器启动参数缓存
+    mcp_server_config_cache = providers.Singleton(MCPServerConfigCache.from_env)
     # 注册 MCPServer DAO
-    mcp_server_dao = providers.Singleton(MCPServerDAO, session_factory=database_provider.provided.session_factory)
+    mcp_server_dao = providers.Singleton(MCPServerDAO, session_factory=database_provider.provided.session_factory,
+                                         change_channel=mcp_server_config_cache.provided.channel)
     # 注册 MCP Config Service
-    mcp_config_service = providers.Singleton(MCPConfigService, mcp_server_dao=mcp_server_dao)
+    mcp_config_service = providers.Singleton(MCPConfigService, mcp_server_dao=mcp_server_dao,
+                                             config_cache=mcp_server_config_cache)
 
     # 注册chat_window DAO
-    chat_window_dao = providers.Singleton(ChatWindowDAO, session_factory=database_provider.provided.session_factory)
-    # 注册chat_window Service
-    chat_window_service = providers.Singleton(ChatWindowService, chat_window_dao=chat_window_dao)
+    chat_window_dao = providers.Singleton(ChatWindowDAO, session_factory=database_provider.provided.session_factory,
+                                      read_session_factory=database_provider.provided.replica_session_factory)
+    # 注册chat_message DAO
+    chat_message_dao = providers.Singleton(ChatMessageDAO, session_factory=database_provider.provided.session_factory,
+                                       read_session_factory=database_provider.provided.replica_session_factory)
 
     # 注册模型
-    llm = providers.Singleton(QwenLlm)
+    llm = providers.Singleton(lazy("core.llm.qwen_open_ai:QwenLlm"))
+    # 注册摘要模型，SUMMARY_MODEL 可指定低成本模型，为空时与对话模型相同
+    summary_llm = providers.Singleton(lazy("core.llm.qwen_open_ai:QwenLlm"), model_name=os.getenv("SUMMARY_MODEL"))
+    # 注册模型请求调度器
+    llm_scheduler = providers.Singleton(LLMScheduler.from_env)
+    # 注册模型响应缓存
+    response_cache = providers.Singleton(ResponseCache.from_env)
+    # 注册相同请求合并器
+    singleflight = providers.Singleton(SingleFlight)
+    # 注册 token 计数器及上下文组装器
+    token_counter = providers.Singleton(TokenCounter.from_env)
+    context_builder = providers.Singleton(lazy("core.llm.context_builder:ContextBuilder.from_env"),
+                                          token_counter=token_counter)
+    # 注册会话消息存储 Service
+    chat_message_service = providers.Singleton(ChatMessageService, chat_window_dao=chat_window_dao,
+                                               chat_message_dao=chat_message_dao, token_counter=token_counter)
+    # 注册chat_window Service
+    chat_window_service = providers.Singleton(ChatWindowService, chat_window_dao=chat_window_dao,
+                                              chat_message_service=chat_message_service)
+    # 注册会话历史存储
+    history_store = providers.Singleton(create_history_store, chat_window_dao=chat_window_dao,
+                                        chat_message_service=chat_message_service)
+    # 注册会话摘要 Service
+    chat_summary_service = providers.Singleton(ChatSummaryService, summary_llm=summary_llm,
+                                               chat_window_dao=chat_window_dao, token_counter=token_counter,
+                                               history_store=history_store, chat_message_service=chat_message_service,
+                                               llm_scheduler=llm_scheduler)
+    # 注册会话写入队列
+    chat_persist_queue = providers.Singleton(ChatPersistQueue, chat_message_service=chat_message_service,
+                                             chat_summary_service=chat_summary_service, history_store=history_store)
+    # 注册回复草稿 Service
+    chat_draft_service = providers.Singleton(ChatDraftService, chat_window_dao=chat_window_dao,
+                                             token_counter=token_counter)
+    # 注册代理状态持久化
+    agent_checkpointer = providers.Singleton(AgentCheckpointer.from_env)
 
     # 注册 chat Service
-    chat_service = providers.Singleton(ChatService, llm=llm, mcp_config_service=mcp_config_service, chat_window_dao=chat_window_dao)
+    chat_service = providers.Singleton(lazy("service.chat_service:ChatService"), llm=llm, mcp_config_service=mcp_config_service,
+                                       chat_window_dao=chat_window_dao, llm_scheduler=llm_scheduler,
+                                       response_cache=response_cache, singleflight=singleflight,
+                                       context_builder=context_builder, chat_summary_service=chat_summary_service,
+                                       history_store=history_store, chat_message_service=chat_message_service,
+                                       chat_persist_queue=chat_persist_queue, chat_draft_service=chat_draft_service,
+                                       agent_checkpointer=agent_checkpointer, unit_of_work=unit_of_work)
 
 
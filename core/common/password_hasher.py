@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+# 加载环境变量
+load_dotenv()
+
+
+class PasswordHasherBusyError(Exception):
+    """等待计算的密码哈希任务已达上限时抛出的异常"""
+
+
+class PasswordHasher:
+    """
+    密码哈希及校验
+
+    bcrypt 每次计算耗时数十至数百毫秒，在事件循环中执行会阻塞同一 worker 上所有的流式对话。
+    计算放到专用的有界线程池中执行（bcrypt 计算期间释放 GIL，线程即可并行，无需进程池）；
+    排队及执行中的任务数达到 max_pending 时直接拒绝，登录风暴下不会无限堆积。
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 64):
+        """
+        初始化密码哈希器
+
+        Args:
+            max_workers (int): 线程池大小，即同时计算的哈希数，不宜超过 CPU 核数。
+            max_pending (int): 排队及执行中的最大任务数，超出时抛出 PasswordHasherBusyError。
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "PasswordHasher":
+        return cls(
+            max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+            max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64)),
+        )
+
+    async def hash(self, password: str) -> str:
+        """计算密码哈希"""
+        return await self._run(self._context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """校验密码与哈希是否匹配"""
+        return await self._run(self._context.verify, plain_password, hashed_password)
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise PasswordHasherBusyError(f"密码校验排队已满（{self.max_pending}），请稍后重试")
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        # 以线程池中任务的实际结束为准释放名额：等待方被取消时，已开始的计算仍会占用线程直到完成
+        future = self._executor.submit(self._timed, func, *args)
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        result, elapsed = await asyncio.wrap_future(future)
+        self._total_seconds += elapsed
+        return result
+
+    @staticmethod
+    def _timed(func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+    def _release(self):
+        self._pending -= 1
+        self._completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_ms": round(self._total_seconds * 1000 / self._completed, 2) if self._completed else 0.0,
+        }
+
+    def stop(self):
+        """关闭线程池，取消尚未开始的任务"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
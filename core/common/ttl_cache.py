@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    带过期时间的 LRU 缓存（进程内，非线程安全，仅在事件循环中使用）
+
+    超出 max_size 时淘汰最久未使用的项；过期项在读取时删除。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60):
+        """
+        初始化缓存
+
+        Args:
+            max_size (int): 最大缓存项数。
+            ttl (float): 默认有效秒数。
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (值, 过期时间)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存值，未命中或已过期时返回 None"""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self._entries.pop(key, None)
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        写入缓存
+
+        Args:
+            key (Hashable): 键。
+            value (Any): 值。
+            ttl (Optional[float]): 有效秒数，为空时使用默认值，不大于 0 时不缓存。
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else 0.0,
+        }
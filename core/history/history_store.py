@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ChatHistory:
+    """
+    单个会话的历史记录
+
+    Attributes:
+        turns (List[Dict[str, str]]): 最近若干轮对话，按时间正序，每项包含 user、assistant。
+        message_count (int): 会话中的消息总条数。
+        running_summary (Optional[str]): 早期对话的滚动摘要。
+        summarized_count (int): 已被摘要覆盖的消息条数。
+    """
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    message_count: int = 0
+    running_summary: Optional[str] = None
+    summarized_count: int = 0
+
+    @classmethod
+    def from_messages(cls, chat_window, messages: List[dict], message_count: int, max_turns: int) -> "ChatHistory":
+        """
+        由会话最近的消息构建历史记录，只保留最近 max_turns 轮
+
+        Args:
+            chat_window (ChatWindow): 会话，提供滚动摘要信息。
+            messages (List[dict]): 会话最近的消息，按时间正序。
+            message_count (int): 会话中的消息总条数。
+            max_turns (int): 保留的最大轮数。
+        """
+        turns = []
+        # 从末尾开始按（用户、助手）两两配对
+        for i in range(len(messages) % 2, len(messages) - 1, 2):
+            turns.append({"user": cls._text(messages[i]), "assistant": cls._text(messages[i + 1])})
+        return cls(
+            turns=turns[-max_turns:],
+            message_count=message_count,
+            running_summary=chat_window.running_summary,
+            summarized_count=chat_window.summarized_count or 0,
+        )
+
+    @staticmethod
+    def _text(message: dict) -> str:
+        return "".join(c.get("text") or "" for c in message.get("content", []))
+
+    def pending_turns(self) -> List[Dict[str, str]]:
+        """未被滚动摘要覆盖的最近几轮"""
+        if not self.running_summary:
+            return self.turns
+        pending = (self.message_count - self.summarized_count) // 2
+        return self.turns[-pending:] if pending > 0 else []
+
+
+# 按会话ID加载历史记录的回源函数，会话不存在时返回 None
+HistoryLoader = Callable[[int], Awaitable[Optional[ChatHistory]]]
+
+
+class HistoryStore(ABC):
+    """
+    会话历史存储
+
+    以 chat_id 为键，未命中时通过 loader 回源（读取 ChatWindow.content）。
+    同一会话的并发写入应在 lock(chat_id) 内进行。
+    """
+
+    def __init__(self, loader: HistoryLoader, max_turns: int = 50):
+        """
+        Args:
+            loader (HistoryLoader): 未命中时的回源函数。
+            max_turns (int): 每个会话保留的最大轮数。
+        """
+        self.loader = loader
+        self.max_turns = max_turns
+        # chat_id -> [锁, 持有及等待者数量]，无人使用时移除
+        self._locks: Dict[int, list] = {}
+
+    @asynccontextmanager
+    async def lock(self, chat_id: int) -> AsyncIterator[None]:
+        """获取会话级别的锁，串行化同一会话的更新"""
+        entry = self._locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[chat_id]
+
+    @abstractmethod
+    async def get(self, chat_id: int) -> ChatHistory:
+        """获取会话历史，会话不存在时返回空历史"""
+
+    @abstractmethod
+    async def append(self, chat_id: int, user: str, assistant: str):
+        """追加一轮对话（已持久化之后调用）"""
+
+    @abstractmethod
+    async def update_summary(self, chat_id: int, running_summary: str, summarized_count: int):
+        """更新滚动摘要"""
+
+    @abstractmethod
+    async def invalidate(self, chat_id: int):
+        """丢弃缓存，下次读取时重新回源"""
+
+    async def load(self, chat_id: int) -> ChatHistory:
+        history = await self.loader(chat_id)
+        return history or ChatHistory()
+
+
+class InMemoryHistoryStore(HistoryStore):
+    """
+    进程内 LRU 历史存储
+
+    按会话数量限制容量，条目超过 TTL 后重新回源。各 worker 的缓存相互独立：同一会话的请求落到不同 worker 时，
+    其他 worker 追加的对话在本 worker 的条目过期前不可见，因此默认 TTL 较短；多 worker 部署应使用 RedisHistoryStore。
+    """
+
+    def __init__(self, loader: HistoryLoader, max_turns: int = 50, max_chats: int = 1000, ttl_seconds: int = 30):
+        super().__init__(loader, max_turns)
+        self.max_chats = max_chats
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[float, ChatHistory]]" = OrderedDict()
+
+    async def get(self, chat_id: int) -> ChatHistory:
+        entry = self._entries.get(chat_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(chat_id)
+            return entry[1]
+        history = await self.load(chat_id)
+        self._put(chat_id, history)
+        return history
+
+    def _put(self, chat_id: int, history: ChatHistory):
+        self._entries[chat_id] = (time.monotonic() + self.ttl_seconds, history)
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_chats:
+            self._entries.popitem(last=False)
+
+    async def append(self, chat_id: int, user: str, assistant: str):
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return
+        history = entry[1]
+        history.turns.append({"user": user, "assistant": assistant})
+        del history.turns[:-self.max_turns]
+        history.message_count += 2
+
+    async def update_summary(self, chat_id: int, running_summary: str, summarized_count: int):
+        entry = self._entries.get(chat_id)
+        if entry is not None:
+            entry[1].running_summary = running_summary
+            entry[1].summarized_count = summarized_count
+
+    async def invalidate(self, chat_id: int):
+        self._entries.pop(chat_id, None)
+
+
+class RedisHistoryStore(HistoryStore):
+    """
+    基于 Redis 的跨 worker 历史存储（需安装 redis 包）
+
+    每个会话以 JSON 保存在一个键中并设置过期时间；追加通过 Lua 脚本在键存在时原子完成，
+    键不存在时不追加，下次读取会从数据库回源。
+
+    每个会话另有一个版本键，追加及丢弃时递增。回源前先读取版本，写入缓存时版本未变化才写入：
+    回源期间其他 worker 追加了对话时，回源读到的历史可能已过期，不写入缓存。
+    """
+
+    APPEND_SCRIPT = """
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    local raw = redis.call('GET', KEYS[1])
+    if not raw then return 0 end
+    local history = cjson.decode(raw)
+    table.insert(history['turns'], cjson.decode(ARGV[1]))
+    local max_turns = tonumber(ARGV[2])
+    while #history['turns'] > max_turns do table.remove(history['turns'], 1) end
+    history['message_count'] = history['message_count'] + 2
+    redis.call('SET', KEYS[1], cjson.encode(history), 'KEEPTTL')
+    return 1
+    """
+
+    FILL_SCRIPT = """
+    if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then return 0 end
+    return redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3], 'NX') and 1 or 0
+    """
+
+    def __init__(self, loader: HistoryLoader, redis_url: str, max_turns: int = 50, ttl_seconds: int = 3600):
+        super().__init__(loader, max_turns)
+        from redis.asyncio import Redis
+        self.redis = Redis.from_url(redis_url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self._append = self.redis.register_script(self.APPEND_SCRIPT)
+        self._fill = self.redis.register_script(self.FILL_SCRIPT)
+
+    @staticmethod
+    def _key(chat_id: int) -> str:
+        return f"efflux:history:{chat_id}"
+
+    @staticmethod
+    def _version_key(chat_id: int) -> str:
+        return f"efflux:history:{chat_id}:version"
+
+    async def get(self, chat_id: int) -> ChatHistory:
+        raw = await self.redis.get(self._key(chat_id))
+        if raw is not None:
+            data = json.loads(raw)
+            # cjson 会把空列表编码为空对象
+            data["turns"] = data.get("turns") or []
+            return ChatHistory(**data)
+        version = await self.redis.get(self._version_key(chat_id)) or "0"
+        history = await self.load(chat_id)
+        # 仅在键不存在且回源期间版本未变化时写入，避免覆盖其他 worker 的更新或缓存已过期的历史
+        await self._fill(keys=[self._key(chat_id), self._version_key(chat_id)],
+                         args=[version, json.dumps(asdict(history), ensure_ascii=False), self.ttl_seconds])
+        return history
+
+    async def append(self, chat_id: int, user: str, assistant: str):
+        turn = json.dumps({"user": user, "assistant": assistant}, ensure_ascii=False)
+        await self._append(keys=[self._key(chat_id), self._version_key(chat_id)],
+                           args=[turn, self.max_turns, self.ttl_seconds])
+
+    async def update_summary(self, chat_id: int, running_summary: str, summarized_count: int):
+        # 摘要变化不频繁，直接丢弃后重新回源
+        await self.invalidate(chat_id)
+
+    async def invalidate(self, chat_id: int):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(chat_id))
+            pipe.incr(self._version_key(chat_id))
+            pipe.expire(self._version_key(chat_id), self.ttl_seconds)
+            await pipe.execute()
+
+
+def create_history_store(chat_window_dao, chat_message_service) -> HistoryStore:
+    """
+    按环境变量创建历史存储
+
+    HISTORY_STORE_BACKEND=memory（默认）使用进程内 LRU；=redis 使用 HISTORY_STORE_REDIS_URL 指定的 Redis。
+
+    Args:
+        chat_window_dao (ChatWindowDAO): 会话记录DAO，用于回源读取 ChatWindow。
+        chat_message_service (ChatMessageService): 会话消息存储服务，用于回源读取最近的消息。
+
+    Returns:
+        HistoryStore: 历史存储实例。
+    """
+    max_turns = int(os.getenv("HISTORY_STORE_MAX_TURNS", 50))
+
+    async def loader(chat_id: int) -> Optional[ChatHistory]:
+        chat_window = await chat_window_dao.get_chat_window_by_id(chat_id)
+        if chat_window is None:
+            return None
+        messages = await chat_message_service.get_recent_messages(chat_window, max_turns * 2)
+        return ChatHistory.from_messages(chat_window, messages, chat_message_service.message_count(chat_window),
+                                         max_turns)
+
+    backend = os.getenv("HISTORY_STORE_BACKEND", "memory")
+    if backend == "redis":
+        logger.info("使用 Redis 会话历史存储")
+        return RedisHistoryStore(
+            loader,
+            redis_url=os.environ["HISTORY_STORE_REDIS_URL"],
+            max_turns=max_turns,
+            ttl_seconds=int(os.getenv("HISTORY_STORE_TTL", 3600)),
+        )
+    return InMemoryHistoryStore(
+        loader,
+        max_turns=max_turns,
+        max_chats=int(os.getenv("HISTORY_STORE_MAX_CHATS", 1000)),
+        ttl_seconds=int(os.getenv("HISTORY_STORE_TTL", 30)),
+    )
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, TYPE_CHECKING
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+
+if TYPE_CHECKING:
+    # langgraph 导入较慢，仅在启用持久化时导入
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+class AgentCheckpointer:
+    """
+    langgraph 代理状态持久化
+
+    以会话ID作为 thread_id 保存代理的完整消息状态（含工具调用、工具结果及中间 AI 消息），
+    后续轮次只需发送新问题，即可复用之前的工具结果而无需重复调用。
+
+    保留策略：
+    - 每个会话只保留最近 keep_checkpoints 个检查点（每个检查点都包含完整状态，旧检查点仅用于回溯）；
+    - 超过 thread_ttl 秒未使用的会话状态被整体删除，之后该会话从持久化的对话记录重新开始；
+    - memory 模式下最多保留 max_threads 个会话，超出时淘汰最久未使用的会话。
+
+    同一会话的多轮对话须在 lock(thread_id) 内完成读取状态、调用代理及清理旧检查点，
+    否则并发的两轮会从同一个检查点恢复并交错写入。
+    """
+
+    # postgres 模式下清理旧检查点的 SQL（表结构由 AsyncPostgresSaver.setup() 创建）
+    PRUNE_THREAD_SQL = [
+        """DELETE FROM checkpoint_writes w WHERE w.thread_id = %(thread_id)s AND w.checkpoint_id NOT IN (
+            SELECT checkpoint_id FROM checkpoints WHERE thread_id = %(thread_id)s AND checkpoint_ns = w.checkpoint_ns
+            ORDER BY checkpoint_id DESC LIMIT %(keep)s)""",
+        """DELETE FROM checkpoints c WHERE c.thread_id = %(thread_id)s AND c.checkpoint_id NOT IN (
+            SELECT checkpoint_id FROM checkpoints WHERE thread_id = %(thread_id)s AND checkpoint_ns = c.checkpoint_ns
+            ORDER BY checkpoint_id DESC LIMIT %(keep)s)""",
+        """DELETE FROM checkpoint_blobs b WHERE b.thread_id = %(thread_id)s AND NOT EXISTS (
+            SELECT 1 FROM checkpoints c WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)""",
+    ]
+    EXPIRE_SQL = [
+        """CREATE TEMP TABLE IF NOT EXISTS expired_threads (thread_id TEXT) ON COMMIT DELETE ROWS""",
+        """INSERT INTO expired_threads SELECT thread_id FROM checkpoints GROUP BY thread_id
+            HAVING max((checkpoint ->> 'ts')::timestamptz) < now() - make_interval(secs => %(ttl)s)""",
+        """DELETE FROM checkpoint_writes WHERE thread_id IN (SELECT thread_id FROM expired_threads)""",
+        """DELETE FROM checkpoint_blobs WHERE thread_id IN (SELECT thread_id FROM expired_threads)""",
+        """DELETE FROM checkpoints WHERE thread_id IN (SELECT thread_id FROM expired_threads)""",
+    ]
+
+    def __init__(self, backend: str = "memory", postgres_url: Optional[str] = None, keep_checkpoints: int = 2,
+                 thread_ttl: int = 7 * 24 * 3600, max_threads: int = 1000, prune_interval: int = 3600):
+        """
+        初始化代理状态持久化
+
+        Args:
+            backend (str): none（不持久化）、memory（进程内）或 postgres（需安装可选依赖 postgres-checkpointer）。
+            postgres_url (Optional[str]): postgres 模式的连接串（psycopg 格式）。
+            keep_checkpoints (int): 每个会话保留的检查点数量。
+            thread_ttl (int): 会话状态的最长闲置秒数。
+            max_threads (int): memory 模式下保留的最大会话数。
+            prune_interval (int): 清理过期会话的间隔秒数。
+        """
+        self.backend = backend
+        self.postgres_url = postgres_url
+        self.keep_checkpoints = keep_checkpoints
+        self.thread_ttl = thread_ttl
+        self.max_threads = max_threads
+        self.prune_interval = prune_interval
+        self.saver: Optional["BaseCheckpointSaver"] = None
+        if backend == "memory":
+            from langgraph.checkpoint.memory import MemorySaver
+            self.saver = MemorySaver()
+        self._pool = None
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        self._prune_task: Optional[asyncio.Task] = None
+        self._locks: Dict[str, list] = {}
+
+    @classmethod
+    def from_env(cls) -> "AgentCheckpointer":
+        """
+        从环境变量构建代理状态持久化
+
+        LANGGRAPH_CHECKPOINTER 指定 none | memory | postgres，postgres 模式的连接串为 LANGGRAPH_CHECKPOINTER_URL，
+        未配置时使用 DATABASE_* 构建。
+        """
+        postgres_url = os.getenv("LANGGRAPH_CHECKPOINTER_URL") or (
+            f"postgresql://{os.getenv('DATABASE_USERNAME')}:{os.getenv('DATABASE_PASSWORD')}"
+            f"@{os.getenv('DATABASE_HOST')}:{os.getenv('DATABASE_PORT')}/{os.getenv('DATABASE_NAME')}"
+        )
+        return cls(
+            backend=os.getenv("LANGGRAPH_CHECKPOINTER", "none"),
+            postgres_url=postgres_url,
+            keep_checkpoints=int(os.getenv("LANGGRAPH_CHECKPOINT_KEEP", 2)),
+            thread_ttl=int(os.getenv("LANGGRAPH_THREAD_TTL", 7 * 24 * 3600)),
+            max_threads=int(os.getenv("LANGGRAPH_MAX_THREADS", 1000)),
+            prune_interval=int(os.getenv("LANGGRAPH_PRUNE_INTERVAL", 3600)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.saver is not None
+
+    async def start(self):
+        """初始化 postgres 连接池及表结构，并启动过期会话的定期清理"""
+        if self.backend == "postgres" and self.saver is None:
+            try:
+                from psycopg.rows import dict_row
+                from psycopg_pool import AsyncConnectionPool
+                from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+            except ImportError as e:
+                raise RuntimeError("LANGGRAPH_CHECKPOINTER=postgres 需要安装可选依赖：uv sync --extra postgres-checkpointer") from e
+
+            self._pool = AsyncConnectionPool(self.postgres_url, open=False,
+                                             kwargs={"autocommit": True, "prepare_threshold": 0,
+                                                     "row_factory": dict_row})
+            await self._pool.open()
+            self.saver = AsyncPostgresSaver(self._pool)
+            await self.saver.setup()
+            logger.info("使用 postgres 保存代理状态")
+        if self.enabled and self._prune_task is None:
+            self._prune_task = asyncio.create_task(self._prune_loop())
+
+    async def stop(self):
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            self._prune_task = None
+        if self._pool is not None:
+            await self._pool.close()
+
+    @asynccontextmanager
+    async def lock(self, thread_id: str) -> AsyncIterator[None]:
+        """获取会话级别的锁（进程内），串行化同一会话的代理状态读取、写入及清理"""
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[thread_id]
+
+    @staticmethod
+    def config(thread_id: str) -> dict:
+        return {"configurable": {"thread_id": thread_id}}
+
+    async def has_state(self, thread_id: str) -> bool:
+        """会话是否已有保存的代理状态"""
+        return await self.saver.aget_tuple(self.config(thread_id)) is not None
+
+    async def prune(self, thread_id: str):
+        """
+        一轮对话结束后清理该会话的旧检查点，并在 memory 模式下淘汰超出数量的会话
+
+        Args:
+            thread_id (str): 会话的 thread_id。
+        """
+        try:
+            if self.backend == "memory":
+                self._prune_memory_thread(thread_id)
+                self._last_used[thread_id] = time.monotonic()
+                self._last_used.move_to_end(thread_id)
+                while len(self._last_used) > self.max_threads:
+                    evicted, _ = self._last_used.popitem(last=False)
+                    self._delete_memory_thread(evicted)
+            elif self._pool is not None:
+                async with self._pool.connection() as conn:
+                    for sql in self.PRUNE_THREAD_SQL:
+                        await conn.execute(sql, {"thread_id": thread_id, "keep": self.keep_checkpoints})
+        except Exception as e:
+            logger.warning(f"清理会话 {thread_id} 的代理状态失败: {e}")
+
+    def _prune_memory_thread(self, thread_id: str):
+        saver = self.saver
+        for checkpoint_ns, checkpoints in saver.storage[thread_id].items():
+            for checkpoint_id in sorted(checkpoints.keys())[:-self.keep_checkpoints]:
+                del checkpoints[checkpoint_id]
+                saver.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _delete_memory_thread(self, thread_id: str):
+        saver = self.saver
+        for checkpoint_ns in saver.storage.pop(thread_id, {}):
+            for key in [k for k in saver.writes if k[0] == thread_id and k[1] == checkpoint_ns]:
+                del saver.writes[key]
+
+    async def expire(self):
+        """删除闲置超过 thread_ttl 的会话状态"""
+        if self.backend == "memory":
+            deadline = time.monotonic() - self.thread_ttl
+            while self._last_used and next(iter(self._last_used.values())) < deadline:
+                thread_id, _ = self._last_used.popitem(last=False)
+                self._delete_memory_thread(thread_id)
+        elif self._pool is not None:
+            async with self._pool.connection() as conn:
+                async with conn.transaction():
+                    for sql in self.EXPIRE_SQL:
+                        await conn.execute(sql, {"ttl": self.thread_ttl})
+
+    async def _prune_loop(self):
+        while True:
+            try:
+                await self.expire()
+            except Exception as e:
+                logger.warning(f"清理过期的代理状态失败: {e}")
+            await asyncio.sleep(self.prune_interval)
@@ -0,0 +1,186 @@
+import json
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage, trim_messages
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from core.common.logger import get_logger
+from core.llm.token_counter import TokenCounter
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+class ContextBuilder:
+    """
+    按 token 预算组装模型输入
+
+    固定部分（系统提示词、滚动摘要、工具定义、当前问题）必定发送，剩余预算从最新一轮开始
+    向前装入历史对话，直到装不下为止，保证发送的历史是连续的最近若干轮。
+    """
+
+    def __init__(self, token_counter: TokenCounter, default_budget: int = 8000,
+                 model_budgets: Optional[Dict[str, int]] = None):
+        """
+        初始化上下文组装器
+
+        Args:
+            token_counter (TokenCounter): token 计数器。
+            default_budget (int): 未单独配置的模型使用的输入 token 预算。
+            model_budgets (Dict[str, int], optional): 按模型名称（或提供方名称）的输入 token 预算。
+        """
+        self.token_counter = token_counter
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets or {}
+        self._tool_tokens: Dict[Tuple[str, str], int] = {}
+
+    @classmethod
+    def from_env(cls, token_counter: TokenCounter) -> "ContextBuilder":
+        """
+        从环境变量构建上下文组装器
+
+        LLM_CONTEXT_BUDGET 为默认预算，LLM_CONTEXT_BUDGETS 可按模型覆盖，如 {"qwen-max": 30000}。
+        """
+        return cls(
+            token_counter,
+            default_budget=int(os.getenv("LLM_CONTEXT_BUDGET", 8000)),
+            model_budgets={k: int(v) for k, v in json.loads(os.getenv("LLM_CONTEXT_BUDGETS", "{}")).items()},
+        )
+
+    def budget_for(self, *model_names: Optional[str]) -> int:
+        """依次按给定名称查找预算配置，均未配置时返回默认预算"""
+        for name in model_names:
+            if name and name in self.model_budgets:
+                return self.model_budgets[name]
+        return self.default_budget
+
+    def count_tools(self, tools: List[BaseTool]) -> int:
+        """计算工具定义的 token 数量，按工具名称及描述缓存"""
+        total = 0
+        for tool in tools:
+            key = (tool.name, tool.description)
+            if key not in self._tool_tokens:
+                self._tool_tokens[key] = self.token_counter.count_json(convert_to_openai_tool(tool))
+            total += self._tool_tokens[key]
+        return total
+
+    def build(self, budget: int, query: str, history: List[Dict[str, str]],
+              system_prompt: Optional[str] = None, tools: Optional[List[BaseTool]] = None,
+              summary: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        组装模型输入消息
+
+        Args:
+            budget (int): 输入 token 预算。
+            query (str): 当前用户问题。
+            history (List[Dict[str, str]]): 历史对话，按时间正序，每项包含 user、assistant。
+            system_prompt (Optional[str]): 系统提示词。
+            tools (Optional[List[BaseTool]]): 本轮可用的工具，其定义同样占用输入 token。
+            summary (Optional[str]): 早期对话的滚动摘要，作为系统消息发送。
+
+        Returns:
+            List[Tuple[str, str]]: (role, content) 消息列表。
+        """
+        counter = self.token_counter
+        summary_message = f"此前对话的摘要：\n{summary}" if summary else None
+        used = counter.count_message(query) + self.count_tools(tools or [])
+        for fixed in (system_prompt, summary_message):
+            if fixed:
+                used += counter.count_message(fixed)
+        if used > budget:
+            logger.warning(f"系统提示词、摘要、工具定义及问题共 {used} tokens，已超出预算 {budget}")
+
+        # 从最新一轮开始向前装入历史
+        selected = []
+        for record in reversed(history):
+            cost = counter.count_message(record["user"]) + counter.count_message(record["assistant"])
+            if used + cost > budget:
+                break
+            used += cost
+            selected.append(record)
+
+        messages = []
+        if system_prompt:
+            messages.append(("system", system_prompt))
+        if summary_message:
+            messages.append(("system", summary_message))
+        for record in reversed(selected):
+            messages.append(("user", record["user"]))
+            messages.append(("assistant", record["assistant"]))
+        messages.append(("user", query))
+        logger.debug(f"上下文组装完成：{len(selected)}/{len(history)} 轮历史，共 {used} tokens，预算 {budget}")
+        return messages
+
+    def count_base_messages(self, messages: Sequence[BaseMessage]) -> int:
+        """计算 langchain 消息列表的 token 数量（含工具调用参数）"""
+        total = 0
+        for message in messages:
+            content = message.content if isinstance(message.content, str) \
+                else json.dumps(message.content, ensure_ascii=False)
+            total += self.token_counter.count_message(content)
+            if isinstance(message, AIMessage) and message.tool_calls:
+                total += self.token_counter.count_json(message.tool_calls)
+        return total
+
+    def build_state_modifier(self, budget: int, system_prompt: Optional[str] = None,
+                             tools: Optional[List[BaseTool]] = None,
+                             summary: Optional[str] = None) -> Callable[[dict], List[BaseMessage]]:
+        """
+        构建代理的 state_modifier：在每次调用模型前按 token 预算裁剪持久化的代理状态
+
+        代理状态（含工具调用及结果）完整保存在 checkpointer 中，发送给模型时只保留最近的、
+        以用户消息开头的若干条，并在前面加上系统提示词及滚动摘要。
+
+        Args:
+            budget (int): 输入 token 预算。
+            system_prompt (Optional[str]): 系统提示词。
+            tools (Optional[List[BaseTool]]): 本轮可用的工具。
+            summary (Optional[str]): 早期对话的滚动摘要。
+
+        Returns:
+            Callable[[dict], List[BaseMessage]]: state_modifier。
+        """
+        prefix = []
+        if system_prompt:
+            prefix.append(SystemMessage(content=system_prompt))
+        if summary:
+            prefix.append(SystemMessage(content=f"此前对话的摘要：\n{summary}"))
+        available = budget - self.count_base_messages(prefix) - self.count_tools(tools or [])
+
+        def state_modifier(state: dict) -> List[BaseMessage]:
+            messages = self.drop_dangling_tool_calls(state["messages"])
+            trimmed = trim_messages(
+                messages,
+                max_tokens=max(available, 0),
+                token_counter=self.count_base_messages,
+                strategy="last",
+                start_on="human",
+                allow_partial=False,
+            )
+            # 预算不足以容纳最新的用户消息时，至少保留最新一轮
+            if not trimmed:
+                last_human = max((i for i, m in enumerate(messages) if m.type == "human"), default=0)
+                trimmed = list(messages[last_human:])
+            return prefix + trimmed
+
+        return state_modifier
+
+    @staticmethod
+    def drop_dangling_tool_calls(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """
+        移除没有对应工具结果的工具调用消息（如上一轮在工具执行中被中断），及这些消息中已有结果的工具调用的结果，
+        否则模型会拒绝请求（工具调用缺少结果，或工具结果没有对应的工具调用）
+        """
+        answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+        dropped_calls = set()
+        for m in messages:
+            if isinstance(m, AIMessage) and m.tool_calls and any(tc["id"] not in answered for tc in m.tool_calls):
+                dropped_calls.update(tc["id"] for tc in m.tool_calls)
+        return [
+            m for m in messages
+            if not (isinstance(m, AIMessage) and m.tool_calls and any(tc["id"] in dropped_calls for tc in m.tool_calls))
+            and not (isinstance(m, ToolMessage) and m.tool_call_id in dropped_calls)
+        ]
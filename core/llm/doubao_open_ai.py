@@ -48,6 +48,6 @@ class DoubaoLlm(LLMChat):
         return ChatOpenAI(
             api_key=os.environ['DOUBAO_API_KEY'],      # 豆包 API 密钥
             base_url=os.environ['DOUBAO_BASE_URL'],    # 豆包服务的基础 URL
-            model=os.environ['DOUBAO_MODEL'],          # 使用的模型名称
+            model=self.model_name or os.environ['DOUBAO_MODEL'],  # 使用的模型名称
             streaming=True,                            # 启用流式响应
         )
@@ -1,10 +1,12 @@
+import json
 from abc import ABC, abstractmethod
-from typing import Union, AsyncGenerator, Any, List, Optional
+from typing import Union, AsyncGenerator, Any, Callable, List, Optional
 from langchain_core.language_models import LanguageModelLike
 from core.llm.llm_message import LLMMessage
 from langchain_core.tools import BaseTool
 from langgraph.prebuilt import create_react_agent
-from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
 from core.common.logger import get_logger
 
 logger = get_logger(__name__)
@@ -15,16 +17,28 @@ class LLMChat(ABC):
     抽象类用于定义与语言模型进行对话的基础接口。
 
     Attributes:
+        model_name (Optional[str]): 指定的模型名称，为空时使用环境变量中配置的模型。
         llm_model (LanguageModelLike): 语言模型实例。
     """
 
-    def __init__(self):
+    def __init__(self, model_name: Optional[str] = None):
         """
         初始化LLMChat类并设置语言模型。
 
-        创建一个新实例时会调用此构造函数来初始化语言模型。
+        语言模型实例在首次使用时才创建，不在构造时连接模型服务。
+
+        Args:
+            model_name (Optional[str]): 指定的模型名称，如用于摘要等场景的低成本模型。
         """
-        self.llm_model = self.get_llm_model()
+        self.model_name = model_name
+        self._llm_model = None
+
+    @property
+    def llm_model(self) -> Union[LanguageModelLike, None]:
+        """语言模型实例，首次使用时创建"""
+        if self._llm_model is None:
+            self._llm_model = self.get_llm_model()
+        return self._llm_model
 
     @abstractmethod
     def is_enable(self) -> bool:
@@ -53,8 +67,21 @@ class LLMChat(ABC):
             Union[LanguageModelLike, None]: 语言模型实例或None如果未指定。
         """
 
-    async def stream_chat(self, inputs: Union[dict[str, Any], Any], tools: List[BaseTool], callback=None) -> \
-            AsyncGenerator[LLMMessage, None]:
+    def model_params(self) -> dict:
+        """
+        获取影响模型输出的参数，用于区分缓存等场景下的不同模型配置。
+
+        Returns:
+            dict: 模型名称及采样参数。
+        """
+        return {
+            "model": getattr(self.llm_model, "model_name", None),
+            "temperature": getattr(self.llm_model, "temperature", None),
+        }
+
+    async def stream_chat(self, inputs: Union[dict[str, Any], Any], tools: List[BaseTool], callback=None,
+                          checkpointer: Optional[BaseCheckpointSaver] = None, thread_id: Optional[str] = None,
+                          state_modifier: Optional[Callable] = None) -> AsyncGenerator[LLMMessage, None]:
         """
         异步流式处理用户输入并与语言模型交互。
 
@@ -62,6 +89,9 @@ class LLMChat(ABC):
             inputs (Union[dict[str, Any], Any]): 用户输入的数据。
             tools (List[BaseTool]): 工具列表，可以被语言模型使用。
             callback (callable, optional): 完成后的回调函数。
+            checkpointer (Optional[BaseCheckpointSaver]): 代理状态持久化，指定时 inputs 只需包含新消息。
+            thread_id (Optional[str]): 代理状态的 thread_id（会话ID）。
+            state_modifier (Optional[Callable]): 调用模型前对代理状态的裁剪。
 
         Yields:
             LLMMessage: 包含从语言模型获得的消息或工具调用信息。
@@ -70,12 +100,15 @@ class LLMChat(ABC):
         collected_data = {
             "messages": [],  # 存储接收到的消息内容
             "tool_calls": [],  # 存储工具调用记录
-            "tool_errors": []  # 存储工具调用错误
+            "tool_errors": [],  # 存储工具调用错误
+            "tool_results": []  # 存储工具调用结果
         }
 
-        graph = create_react_agent(model=self.llm_model, tools=tools)
+        graph = create_react_agent(model=self.llm_model, tools=tools, state_modifier=state_modifier,
+                                   checkpointer=checkpointer)
+        config = {"configurable": {"thread_id": thread_id}} if checkpointer is not None else None
 
-        async for chunk in graph.astream(inputs, stream_mode=["messages", "values"]):
+        async for chunk in graph.astream(inputs, config=config, stream_mode=["messages", "values"]):
             # chat消息获取
             if isinstance(chunk, tuple) and chunk[0] == "messages":
                 message_chunk = chunk[1][0]  # Get the message content
@@ -84,6 +117,16 @@ class LLMChat(ABC):
                         # chat结果收集
                         collected_data["messages"].append(message_chunk.content)
                         yield LLMMessage(content=message_chunk.content, type="message")
+                elif isinstance(message_chunk, ToolMessage):
+                    # 工具调用结果收集，仅供服务端使用（如保存草稿），不转发给客户端
+                    tool_result = {
+                        "tool_call_id": message_chunk.tool_call_id,
+                        "name": message_chunk.name,
+                        "content": message_chunk.content if isinstance(message_chunk.content, str)
+                        else json.dumps(message_chunk.content, ensure_ascii=False)
+                    }
+                    collected_data["tool_results"].append(tool_result)
+                    yield LLMMessage(content=json.dumps(tool_result, ensure_ascii=False), type="tool_result")
             elif isinstance(chunk, dict) and "messages" in chunk:
                 # Print a newline after the complete message
                 print("newline\n", flush=True)
@@ -116,5 +159,5 @@ class LLMChat(ABC):
             await callback(collected_data)
 
     async def normal_chat(self, model_id: int, inputs: str) -> str:
-        result = self.llm_model.invoke([HumanMessage(content=inputs)])
+        result = await self.llm_model.ainvoke([HumanMessage(content=inputs)])
         return result.content
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 
 class LLMMessage(BaseModel):
+    # message | tool_call | tool_result（工具调用结果 JSON，仅服务端使用） | queue（排队耗时，毫秒） | error
     type: str
     content: str
\ No newline at end of file
@@ -0,0 +1,326 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+class QueueFullError(Exception):
+    """调度队列已满时抛出的异常"""
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    按固定速率补充令牌，容量为每分钟的配额。允许结算时出现负余额（欠账），
+    欠账会在后续补充时先被抵扣。
+
+    Attributes:
+        capacity (float): 桶容量，即每分钟配额；为 0 表示不限制。
+        tokens (float): 当前可用令牌数。
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        计算获得指定数量令牌所需等待的秒数，0 表示可立即获取。
+
+        单次请求超过桶容量时按容量计算，避免请求永远无法被调度。
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """结算实际用量与预扣用量的差额，delta 为正表示需要补扣"""
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+@dataclass
+class ProviderLimits:
+    """单个模型提供方的限流配置，取值为 0 表示不限制"""
+    rpm: int = 0
+    tpm: int = 0
+    max_concurrency: int = 0
+    max_queue_depth: int = 100
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish_tag: float
+    seq: int
+    start_tag: float = field(compare=False)
+    user_id: int = field(compare=False)
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+@dataclass
+class SchedulerTicket:
+    """调度凭证，记录排队耗时，并在请求结束后结算实际 token 用量"""
+    provider: str
+    user_id: int
+    tokens: int
+    wait_ms: int
+    _state: "_ProviderState" = field(repr=False)
+
+    def settle(self, actual_tokens: int):
+        """
+        按实际用量结算 TPM 令牌桶。
+
+        Args:
+            actual_tokens (int): 请求实际消耗的 token 数（输入 + 输出）。
+        """
+        delta = actual_tokens - self.tokens
+        if delta:
+            self._state.tpm_bucket.adjust(delta)
+            self.tokens = actual_tokens
+
+
+class _ProviderState:
+    """单个提供方的令牌桶、等待队列及加权公平队列的虚拟时钟"""
+
+    def __init__(self, name: str, limits: ProviderLimits):
+        self.name = name
+        self.limits = limits
+        self.rpm_bucket = TokenBucket(limits.rpm)
+        self.tpm_bucket = TokenBucket(limits.tpm)
+        self.queue: List[_Waiter] = []
+        # 队列中仍在等待的请求数（已取消的等待者在到达堆顶前仍留在 queue 中）
+        self.waiting = 0
+        self.in_flight = 0
+        self.virtual_time = 0.0
+        self.last_finish: Dict[int, float] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # 统计指标
+        self.dispatched = 0
+        self.rejected = 0
+        self.shared = 0
+        self.total_wait_ms = 0
+
+
+class LLMScheduler:
+    """
+    LLM 请求调度器
+
+    位于 LLMChat.stream_chat / normal_chat 之前，按提供方维护 RPM、TPM 两个令牌桶和并发上限，
+    等待中的请求按用户做加权公平排队（WFQ）：每个请求以预估 token 数为代价，
+    按 `代价 / 用户权重` 推进该用户的虚拟完成时间，完成时间最小者优先被调度，
+    从而避免单个重度用户占满提供方配额。队列超过上限时直接拒绝。
+    """
+
+    def __init__(self, default_limits: Optional[ProviderLimits] = None,
+                 provider_limits: Optional[Dict[str, ProviderLimits]] = None,
+                 user_weights: Optional[Dict[int, float]] = None):
+        """
+        初始化调度器
+
+        Args:
+            default_limits (ProviderLimits, optional): 未单独配置的提供方使用的默认限流配置。
+            provider_limits (Dict[str, ProviderLimits], optional): 按提供方名称（LLMChat.name()）的限流配置。
+            user_weights (Dict[int, float], optional): 用户权重，未配置的用户权重为 1。
+        """
+        self.default_limits = default_limits or ProviderLimits()
+        self.provider_limits = provider_limits or {}
+        self.user_weights = user_weights or {}
+        self._providers: Dict[str, _ProviderState] = {}
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        """
+        从环境变量构建调度器
+
+        LLM_RPM_LIMIT / LLM_TPM_LIMIT / LLM_MAX_CONCURRENCY / LLM_MAX_QUEUE_DEPTH 为默认配置，
+        LLM_RATE_LIMITS 可按提供方覆盖，如 {"QwenLlm": {"rpm": 60, "tpm": 100000}}，
+        LLM_USER_WEIGHTS 可配置用户权重，如 {"1": 2}。
+        """
+        default_limits = ProviderLimits(
+            rpm=int(os.getenv("LLM_RPM_LIMIT", 0)),
+            tpm=int(os.getenv("LLM_TPM_LIMIT", 0)),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 0)),
+            max_queue_depth=int(os.getenv("LLM_MAX_QUEUE_DEPTH", 100)),
+        )
+        provider_limits = {
+            name: ProviderLimits(**{**default_limits.__dict__, **limits})
+            for name, limits in json.loads(os.getenv("LLM_RATE_LIMITS", "{}")).items()
+        }
+        user_weights = {int(k): float(v) for k, v in json.loads(os.getenv("LLM_USER_WEIGHTS", "{}")).items()}
+        return cls(default_limits, provider_limits, user_weights)
+
+    def _get_state(self, provider: str) -> _ProviderState:
+        state = self._providers.get(provider)
+        if state is None:
+            limits = self.provider_limits.get(provider, self.default_limits)
+            state = self._providers[provider] = _ProviderState(provider, limits)
+        return state
+
+    @asynccontextmanager
+    async def acquire(self, provider: str, user_id: int, tokens: int) -> AsyncIterator[SchedulerTicket]:
+        """
+        申请一次模型调用的执行许可，退出上下文时释放并发名额。
+
+        Args:
+            provider (str): 提供方名称。
+            user_id (int): 用户 ID，用于公平排队。
+            tokens (int): 预估 token 数，用于 TPM 预扣及排队代价。
+
+        Yields:
+            SchedulerTicket: 调度凭证，包含排队耗时。
+
+        Raises:
+            QueueFullError: 该提供方等待队列已满。
+        """
+        state = self._get_state(provider)
+        enqueued_at = time.monotonic()
+        if state.limits.max_queue_depth and state.waiting >= state.limits.max_queue_depth:
+            state.rejected += 1
+            logger.warning(f"{provider} 调度队列已满，拒绝用户 {user_id} 的请求")
+            raise QueueFullError(f"{provider} 调度队列已满（{state.limits.max_queue_depth}）")
+
+        # 计算加权公平队列的虚拟完成时间
+        weight = self.user_weights.get(user_id, 1.0)
+        start_tag = max(state.virtual_time, state.last_finish.get(user_id, 0.0))
+        finish_tag = start_tag + max(tokens, 1) / weight
+        state.last_finish[user_id] = finish_tag
+
+        waiter = _Waiter(finish_tag, next(self._seq), start_tag, user_id, tokens,
+                         asyncio.get_running_loop().create_future(), enqueued_at)
+        heapq.heappush(state.queue, waiter)
+        state.waiting += 1
+        self._dispatch(state)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # 排队期间客户端断开：未被调度时不再计入等待数，已被调度则归还并发名额
+            if waiter.future.cancelled():
+                state.waiting -= 1
+            else:
+                self._release(state)
+            raise
+
+        wait_ms = int((time.monotonic() - enqueued_at) * 1000)
+        state.total_wait_ms += wait_ms
+        try:
+            yield SchedulerTicket(provider, user_id, tokens, wait_ms, state)
+        finally:
+            self._release(state)
+
+    def charge(self, provider: str, user_id: int, tokens: int):
+        """
+        记录一次未实际调用模型、而是合并到其他请求（可能属于其他用户）的请求代价。
+
+        不占用并发名额及 RPM/TPM 令牌（提供方并未收到该请求），只按 `代价 / 用户权重`
+        推进该用户的虚拟完成时间，使其后续请求在公平队列中的排序与实际发起调用时一致，
+        避免通过请求合并绕过自己的公平份额。
+
+        Args:
+            provider (str): 提供方名称。
+            user_id (int): 用户 ID。
+            tokens (int): 预估 token 数。
+        """
+        state = self._get_state(provider)
+        weight = self.user_weights.get(user_id, 1.0)
+        start_tag = max(state.virtual_time, state.last_finish.get(user_id, 0.0))
+        state.last_finish[user_id] = start_tag + max(tokens, 1) / weight
+        state.shared += 1
+
+    def _release(self, state: _ProviderState):
+        state.in_flight -= 1
+        self._dispatch(state)
+
+    def _dispatch(self, state: _ProviderState):
+        """按虚拟完成时间依次放行队首请求，受限时按令牌桶缺口设置定时器重试"""
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+
+        while state.queue:
+            head = state.queue[0]
+            if head.future.done():
+                # 已取消的等待者
+                heapq.heappop(state.queue)
+                continue
+            if state.limits.max_concurrency and state.in_flight >= state.limits.max_concurrency:
+                return
+            delay = max(state.rpm_bucket.wait_time(1), state.tpm_bucket.wait_time(head.tokens))
+            if delay > 0:
+                state.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, state)
+                return
+
+            heapq.heappop(state.queue)
+            state.waiting -= 1
+            state.rpm_bucket.consume(1)
+            state.tpm_bucket.consume(head.tokens)
+            state.in_flight += 1
+            state.dispatched += 1
+            state.virtual_time = max(state.virtual_time, head.start_tag)
+            head.future.set_result(None)
+
+        # 队列清空后，丢弃已不影响排序的虚拟完成时间（不晚于当前虚拟时间）；
+        # 仍超前的记录（如 charge() 记入的合并请求代价）保留到下次排序
+        state.last_finish = {user_id: finish for user_id, finish in state.last_finish.items()
+                             if finish > state.virtual_time}
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        获取各提供方的调度指标
+
+        Returns:
+            Dict[str, dict]: 按提供方名称的队列深度、并发数、剩余配额、放行/拒绝/合并次数及平均排队耗时。
+        """
+        result = {}
+        for name, state in self._providers.items():
+            state.rpm_bucket.wait_time(0)
+            state.tpm_bucket.wait_time(0)
+            result[name] = {
+                "queue_depth": state.waiting,
+                "in_flight": state.in_flight,
+                "rpm_available": None if state.rpm_bucket.unlimited else int(state.rpm_bucket.tokens),
+                "tpm_available": None if state.tpm_bucket.unlimited else int(state.tpm_bucket.tokens),
+                "dispatched": state.dispatched,
+                "rejected": state.rejected,
+                "shared": state.shared,
+                "avg_wait_ms": state.total_wait_ms // state.dispatched if state.dispatched else 0,
+            }
+        return result
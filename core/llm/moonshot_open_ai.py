@@ -53,7 +53,7 @@ class MoonshotLlm(LLMChat):
         return ChatOpenAI(
             api_key=os.environ['MOONSHOT_API_KEY'],
             base_url=os.environ['MOONSHOT_BASE_URL'],
-            model=os.environ['MOONSHOT_MODEL'],
+            model=self.model_name or os.environ['MOONSHOT_MODEL'],
             streaming=True,
         )
 
@@ -50,7 +50,7 @@ class QwenLlm(LLMChat):
         return ChatOpenAI(
             api_key=os.environ['DASHSCOPE_API_KEY'],
             base_url=os.environ['QWEN_BASE_URL'],
-            model=os.environ['QWEN_MODEL'],
+            model=self.model_name or os.environ['QWEN_MODEL'],
             streaming=True,
         )
 
@@ -0,0 +1,332 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 每条缓存记录除文本外的估算固定开销（字节）
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def _shingle_hashes(text: str) -> List[int]:
+    """
+    计算文本字符二元组、三元组的 32 位哈希，供向量编码及分桶共用
+
+    Args:
+        text (str): 待编码文本。
+
+    Returns:
+        List[int]: 每个字符组的哈希。
+    """
+    normalized = " ".join(text.lower().split())
+    hashes = []
+    for n in (2, 3):
+        for i in range(len(normalized) - n + 1):
+            digest = hashlib.blake2b(normalized[i:i + n].encode(), digest_size=4).digest()
+            hashes.append(int.from_bytes(digest, "little"))
+    return hashes
+
+
+def _embed(hashes: List[int], dim: int = 1024) -> Dict[int, float]:
+    """
+    将文本编码为本地稀疏向量
+
+    以字符二元组、三元组做特征哈希并做 L2 归一化，不依赖外部模型，
+    中英文均适用，足以识别仅有标点、空白或个别字词差异的重复请求。
+
+    Args:
+        hashes (List[int]): _shingle_hashes 的结果。
+        dim (int): 哈希空间维度。
+
+    Returns:
+        Dict[int, float]: 稀疏向量，键为维度下标。
+    """
+    vector: Dict[int, float] = {}
+    for h in hashes:
+        index = h % dim
+        vector[index] = vector.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else vector
+
+
+def _lsh_bands(hashes: List[int], bands: int = 8, rows: int = 4) -> List[Tuple[int, ...]]:
+    """
+    局部敏感哈希分桶（单次排列 MinHash）
+
+    将字符组哈希按低位分到 bands * rows 个槽，每个槽取最小值作为签名，每 rows 个槽组成一个桶键。
+    字符组集合高度重合的文本至少有一个桶键相同的概率很高，检索时只需比较同桶的记录。
+
+    Args:
+        hashes (List[int]): _shingle_hashes 的结果。
+        bands (int): 桶键数量。
+        rows (int): 每个桶键包含的槽数，越大同桶的记录越少。
+
+    Returns:
+        List[Tuple[int, ...]]: 桶键列表，第一个元素为桶序号。
+    """
+    slots = bands * rows
+    signature = [-1] * slots
+    for h in hashes:
+        slot, value = h % slots, h // slots
+        if signature[slot] < 0 or value < signature[slot]:
+            signature[slot] = value
+    return [(band, *signature[band * rows:(band + 1) * rows]) for band in range(bands)]
+
+
+# 数字（含小数、千分位）
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,:/-]\d+)*")
+# 引号内的内容
+_QUOTED_PATTERN = re.compile(r"[\"“”「」『』《》‘’](.+?)[\"“”「」『』《》‘’]")
+# 英文单词
+_WORD_PATTERN = re.compile(r"[A-Za-z][\w'-]*")
+
+
+def _anchors(text: str) -> Tuple[str, ...]:
+    """
+    提取提示词中必须完全一致才能复用回复的部分：数字、引号内容及英文专有名词
+
+    "退款订单 1234" 与 "退款订单 1235" 的向量几乎相同，但回复不能互相复用。
+    专有名词按句中大写开头或含大写字母的英文单词识别（如 Alice、iPhone），句首单词除外；
+    中文人名、地名等无法可靠识别，依赖相似度阈值。
+
+    Args:
+        text (str): 提示词。
+
+    Returns:
+        Tuple[str, ...]: 排序后的锚点。
+    """
+    anchors = _NUMBER_PATTERN.findall(text)
+    anchors += [quoted.strip().lower() for quoted in _QUOTED_PATTERN.findall(text)]
+    for match in _WORD_PATTERN.finditer(text):
+        word = match.group()
+        preceding = text[:match.start()].rstrip()
+        sentence_start = not preceding or preceding[-1] in ".!?。！？\n"
+        if any(ch.isupper() for ch in word[1:]) or (word[0].isupper() and not sentence_start):
+            anchors.append(word)
+    return tuple(sorted(anchors))
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class _CacheEntry:
+    value: str
+    size: int
+    expires_at: float
+    namespace: str
+    embedding: Optional[Dict[int, float]] = field(default=None, repr=False)
+    anchors: Tuple[str, ...] = ()
+    # 相似匹配层的桶键（含 namespace）
+    buckets: List[tuple] = field(default_factory=list, repr=False)
+
+
+class ResponseCache:
+    """
+    模型响应缓存
+
+    两级缓存：
+    - 精确匹配层：键为 namespace（模型 + 参数 + 用户）+ 提示词 的哈希；
+    - 相似匹配层（可选）：同一 namespace 下，按提示词的局部敏感哈希分桶，只对同桶的候选记录
+      （不超过 max_candidates 条）计算本地向量的余弦相似度，超过阈值且数字、引号内容、英文专有名词
+      完全一致时视为命中。
+
+    namespace 包含用户，不同用户之间不共享缓存的回复。
+
+    所有记录共享同一个按字节数限制的 LRU 淘汰队列，并带有 TTL 过期。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: int = 3600,
+                 semantic_enabled: bool = False, similarity_threshold: float = 0.95, max_candidates: int = 32):
+        """
+        初始化响应缓存
+
+        Args:
+            max_bytes (int): 缓存占用的最大字节数，超出后按 LRU 淘汰。
+            ttl_seconds (int): 缓存记录的有效期（秒）。
+            semantic_enabled (bool): 是否启用相似匹配层。
+            similarity_threshold (float): 相似匹配层的命中阈值（余弦相似度）。
+            max_candidates (int): 相似匹配层每次查询最多比较的候选记录数。
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.semantic_enabled = semantic_enabled
+        self.similarity_threshold = similarity_threshold
+        self.max_candidates = max_candidates
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # 桶键 -> 缓存键
+        self._buckets: Dict[tuple, Set[str]] = {}
+        self._bytes = 0
+        # 统计指标
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """从 RESPONSE_CACHE_* 环境变量构建响应缓存"""
+        return cls(
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", 3600)),
+            semantic_enabled=os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true",
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95)),
+            max_candidates=int(os.getenv("RESPONSE_CACHE_MAX_CANDIDATES", 32)),
+        )
+
+    @staticmethod
+    def make_namespace(model: str, params: Optional[Dict[str, Any]] = None, scope: Optional[Any] = None) -> str:
+        """
+        模型、参数及作用域相同的请求属于同一 namespace，匹配只在 namespace 内进行
+
+        Args:
+            model (str): 模型名称。
+            params (Optional[Dict[str, Any]]): 模型参数。
+            scope (Optional[Any]): 作用域（如用户ID），不同作用域之间不共享缓存。
+        """
+        return json.dumps({"model": model, "params": params or {}, "scope": scope}, sort_keys=True,
+                          ensure_ascii=False)
+
+    @staticmethod
+    def make_key(namespace: str, prompt: str) -> str:
+        """精确匹配层的缓存键"""
+        return hashlib.sha256(f"{namespace}\n{prompt}".encode()).hexdigest()
+
+    def get(self, namespace: str, prompt: str) -> Optional[str]:
+        """
+        查询缓存，先查精确匹配层，未命中且启用相似匹配时再查相似匹配层。
+
+        Args:
+            namespace (str): 由 make_namespace 生成的模型及参数标识。
+            prompt (str): 提示词。
+
+        Returns:
+            Optional[str]: 命中时返回缓存的响应，否则返回 None。
+        """
+        now = time.monotonic()
+        key = self.make_key(namespace, prompt)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                return entry.value
+            self._remove(key)
+            self._expirations += 1
+
+        if self.semantic_enabled:
+            value = self._semantic_get(namespace, prompt, now)
+            if value is not None:
+                self._semantic_hits += 1
+                return value
+
+        self._misses += 1
+        return None
+
+    def _semantic_get(self, namespace: str, prompt: str, now: float) -> Optional[str]:
+        hashes = _shingle_hashes(prompt)
+        # 只比较同桶的候选记录，不遍历全部缓存；同桶次数越多越相似，优先比较
+        candidates: Dict[str, int] = {}
+        for bucket in _lsh_bands(hashes):
+            for key in self._buckets.get((namespace, *bucket), ()):
+                candidates[key] = candidates.get(key, 0) + 1
+        if not candidates:
+            return None
+
+        query, anchors = _embed(hashes), _anchors(prompt)
+        best_key, best_score = None, self.similarity_threshold
+        for key in heapq.nlargest(self.max_candidates, candidates, key=candidates.get):
+            entry = self._entries[key]
+            if entry.expires_at <= now:
+                self._remove(key)
+                self._expirations += 1
+                continue
+            # 数字、名称等不同的提示词即使向量相近也不复用
+            if entry.anchors != anchors:
+                continue
+            score = _cosine(query, entry.embedding)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key].value
+
+    def put(self, namespace: str, prompt: str, value: str):
+        """
+        写入缓存，超出字节上限时按 LRU 淘汰最久未使用的记录。
+
+        Args:
+            namespace (str): 由 make_namespace 生成的模型及参数标识。
+            prompt (str): 提示词。
+            value (str): 模型响应。
+        """
+        key = self.make_key(namespace, prompt)
+        size = len(value.encode()) + len(prompt.encode()) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+
+        entry = _CacheEntry(value, size, time.monotonic() + self.ttl_seconds, namespace)
+        if self.semantic_enabled:
+            hashes = _shingle_hashes(prompt)
+            entry.embedding = _embed(hashes)
+            entry.anchors = _anchors(prompt)
+            entry.buckets = [(namespace, *bucket) for bucket in _lsh_bands(hashes)]
+            for bucket in entry.buckets:
+                self._buckets.setdefault(bucket, set()).add(key)
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for bucket in entry.buckets:
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        获取缓存指标
+
+        Returns:
+            dict: 命中次数、未命中次数、命中率、淘汰及过期次数、记录数与占用字节数。
+        """
+        lookups = self._exact_hits + self._semantic_hits + self._misses
+        return {
+            "exact_hits": self._exact_hits,
+            "semantic_hits": self._semantic_hits,
+            "misses": self._misses,
+            "hit_rate": round((self._exact_hits + self._semantic_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
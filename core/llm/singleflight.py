@@ -0,0 +1,153 @@
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class FlightCancelledError(Exception):
+    """共享的上游调用在结束前被取消（如服务停止），仍在订阅的请求收到该异常"""
+
+
+class _StreamFlight(Generic[T]):
+    """一次共享的流式上游调用：缓存已产生的数据块，并通知所有订阅者"""
+
+    def __init__(self):
+        self.chunks: List[T] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        # 替换事件对象，保证每个订阅者等待的都是“下一次”变化
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """
+    相同请求合并（singleflight）
+
+    同一时刻键相同的并发请求只触发一次上游调用：
+    - do()：协程调用，所有调用方共享同一个结果或异常；
+    - stream()：流式调用，上游数据块由单一来源扇出给每个订阅者，
+      晚加入的订阅者会先补齐已产生的数据块。
+    上游完成后键即被移除，之后的新请求会重新发起调用。
+
+    合并的请求不会各自经过调度器排队，需要按调用方计费时通过 on_follow 回调记录。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        # 统计指标
+        self._leaders = 0
+        self._followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]],
+                 on_follow: Optional[Callable[[], None]] = None) -> T:
+        """
+        执行协程调用，键相同的并发调用共享同一次执行。
+
+        Args:
+            key (str): 请求键。
+            fn (Callable[[], Awaitable[T]]): 实际执行上游调用的协程工厂。
+            on_follow (Callable[[], None], optional): 本次调用合并到进行中的调用时执行的回调。
+
+        Returns:
+            T: 上游调用结果。
+        """
+        future = self._calls.get(key)
+        if future is None:
+            self._leaders += 1
+            future = asyncio.ensure_future(fn())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self._followers += 1
+            if on_follow is not None:
+                on_follow()
+        # shield：单个调用方取消不影响其他共享该结果的调用方
+        return await asyncio.shield(future)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[T]],
+                     on_follow: Optional[Callable[[], None]] = None) -> AsyncIterator[T]:
+        """
+        订阅流式调用，键相同的并发订阅共享同一个上游数据流。
+
+        所有订阅者都退出后，尚未结束的上游调用会被取消。
+
+        Args:
+            key (str): 请求键。
+            factory (Callable[[], AsyncIterator[T]]): 创建上游数据流的工厂。
+            on_follow (Callable[[], None], optional): 本次订阅合并到进行中的数据流时执行的回调。
+
+        Yields:
+            T: 上游产生的数据块。
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            self._leaders += 1
+            flight = self._streams[key] = _StreamFlight()
+            flight.task = asyncio.create_task(self._pump(key, flight, factory))
+        else:
+            self._followers += 1
+            if on_follow is not None:
+                on_follow()
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                changed = flight.changed
+                if index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                    continue
+                if flight.done:
+                    if flight.cancelled:
+                        raise FlightCancelledError(f"请求 {key} 的上游调用已取消")
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 立即移除键：取消到 _pump 结束之间到达的新请求发起新的调用，而不是加入正在取消的调用
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+                flight.task.cancel()
+
+    async def _pump(self, key: str, flight: _StreamFlight, factory: Callable[[], AsyncIterator[T]]):
+        try:
+            async with aclosing(factory()) as source:
+                async for chunk in source:
+                    flight.chunks.append(chunk)
+                    flight.notify()
+        except asyncio.CancelledError:
+            flight.cancelled = True
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            flight.notify()
+
+    def stats(self) -> dict:
+        """
+        获取合并指标
+
+        Returns:
+            dict: 发起上游调用的次数（leaders）、被合并的次数（followers）及当前进行中的调用数。
+        """
+        return {
+            "leaders": self._leaders,
+            "followers": self._followers,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
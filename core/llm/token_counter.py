@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# 每条消息的格式开销（角色、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    粗略估算文本的 token 数量，在本地分词器不可用时使用。
+
+    非 ASCII 字符（如中文）按 1 个 token 计，ASCII 字符按 4 个字符 1 个 token 计。
+
+    Args:
+        text (Optional[str]): 待估算的文本。
+
+    Returns:
+        int: 估算的 token 数量。
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + math.ceil((len(text) - non_ascii) / 4)
+
+
+class TokenCounter:
+    """
+    本地 token 计数器
+
+    使用 tiktoken 分词，分词表无法加载时（如离线环境）退化为 estimate_tokens 估算。
+    首次加载分词表可能需要下载或读取 BPE 文件，应在启动时通过 warm_up 在线程中预先加载，
+    加载完成前按估算方式计数（不缓存）。
+
+    count 的结果按文本哈希做 LRU 缓存，用于历史消息等每轮都会重复计数的文本；
+    流式输出的消息块、模型回复等只计数一次的文本使用 count_text，不占用缓存。
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", cache_size: int = 10000):
+        """
+        初始化 token 计数器
+
+        Args:
+            encoding_name (str): tiktoken 分词表名称。
+            cache_size (int): 计数缓存的最大条数。
+        """
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoding = None
+        self._encoding_loaded = False
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "TokenCounter":
+        """从 TOKENIZER_ENCODING 环境变量构建 token 计数器"""
+        return cls(encoding_name=os.getenv("TOKENIZER_ENCODING", "cl100k_base"))
+
+    def _load_encoding(self):
+        with self._load_lock:
+            if not self._encoding_loaded:
+                try:
+                    import tiktoken
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+                except Exception as e:
+                    logger.warning(f"分词表 {self.encoding_name} 加载失败，使用估算方式计数: {e}")
+                self._encoding_loaded = True
+        return self._encoding
+
+    def _get_encoding(self):
+        if self._encoding_loaded:
+            return self._encoding
+        if self._load_lock.locked():
+            # 正在后台加载，暂时按估算方式计数
+            return None
+        # 未预先加载（如脚本中直接使用）时同步加载
+        return self._load_encoding()
+
+    async def warm_up(self):
+        """在线程中加载分词表，不阻塞事件循环"""
+        await asyncio.to_thread(self._load_encoding)
+
+    def count_text(self, text: Optional[str]) -> int:
+        """
+        计算文本的 token 数量，不读写缓存
+
+        Args:
+            text (Optional[str]): 待计数的文本。
+
+        Returns:
+            int: token 数量。
+        """
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        return len(encoding.encode(text, disallowed_special=())) if encoding else estimate_tokens(text)
+
+    def count(self, text: Optional[str]) -> int:
+        """
+        计算文本的 token 数量
+
+        Args:
+            text (Optional[str]): 待计数的文本。
+
+        Returns:
+            int: token 数量。
+        """
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        count = self._cache.get(key)
+        if count is not None:
+            self._cache.move_to_end(key)
+            return count
+
+        count = self.count_text(text)
+        if not self._encoding_loaded:
+            # 分词表加载完成前的估算结果不缓存
+            return count
+        self._cache[key] = count
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return count
+
+    def count_message(self, content: Optional[str]) -> int:
+        """计算单条消息的 token 数量（含格式开销）"""
+        return self.count(content) + MESSAGE_OVERHEAD_TOKENS
+
+    def count_messages(self, messages: Iterable[Tuple[str, str]]) -> int:
+        """
+        计算 (role, content) 消息列表的 token 总数
+
+        Args:
+            messages (Iterable[Tuple[str, str]]): 消息列表。
+
+        Returns:
+            int: token 总数。
+        """
+        return sum(self.count_message(content) for _, content in messages)
+
+    def count_json(self, value: Any) -> int:
+        """计算可 JSON 序列化对象（如工具定义）的 token 数量"""
+        return self.count(json.dumps(value, ensure_ascii=False, sort_keys=True))
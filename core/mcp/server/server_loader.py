@@ -1,8 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List, Tuple
+import asyncio
+import copy
 import json
+import os
+import tempfile
+import time
+from dotenv import load_dotenv
 from core.common.logger import get_logger
 
+# 加载环境变量
+load_dotenv()
 
 logger = get_logger(__name__)
 config_path = "./server_config.json"
@@ -15,29 +23,135 @@ class StdioServerParameters(BaseModel):
     env: Optional[Dict[str, str]] = None
 
 
+class ServerConfigRegistry:
+    """
+    server_config.json 的内存注册表
+
+    首次使用时加载一次，之后的查询直接读内存；每隔 poll_interval 秒检查一次文件的修改时间、大小及 inode，
+    文件被外部修改时重新加载。写入时先写同目录下的临时文件再 os.replace 原子替换，读写文件均在线程池中执行，
+    不阻塞事件循环；写入串行执行，并基于最新的文件内容修改，不会覆盖外部的修改。
+    """
+
+    def __init__(self, path: str, poll_interval: float = 2.0):
+        """
+        初始化注册表
+
+        Args:
+            path (str): 配置文件路径。
+            poll_interval (float): 检查文件变化的最小间隔秒数。
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self._config: Optional[dict] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._last_check = 0.0
+        self._write_lock = asyncio.Lock()
+
+    def _stat(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _read(self) -> Tuple[dict, Tuple[int, int, int]]:
+        signature = self._stat()
+        with open(self.path, "r") as config_file:
+            config = json.load(config_file)
+        config.setdefault("mcpServers", {})
+        return config, signature
+
+    def _write(self, config: dict) -> Tuple[int, int, int]:
+        content = json.dumps(config, indent=2, ensure_ascii=False)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".server_config.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as tmp_file:
+                tmp_file.write(content)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            # 保留原文件的权限
+            if os.path.exists(self.path):
+                os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return self._stat()
+
+    async def _refresh(self, force: bool = False):
+        """未加载或文件已变化时重新加载"""
+        now = time.monotonic()
+        if self._config is not None and not force and now - self._last_check < self.poll_interval:
+            return
+        self._last_check = now
+        if self._config is not None:
+            try:
+                signature = await asyncio.to_thread(self._stat)
+            except FileNotFoundError:
+                signature = None
+            if signature == self._signature:
+                return
+            logger.info(f"Configuration file changed, reloading: {self.path}")
+        self._config, self._signature = await asyncio.to_thread(self._read)
+
+    async def config(self) -> dict:
+        """获取当前配置（只读）"""
+        await self._refresh()
+        return self._config
+
+    async def update(self, mutator: Callable[[dict], bool]) -> bool:
+        """
+        修改配置并原子写回文件
+
+        Args:
+            mutator (Callable[[dict], bool]): 修改配置副本的函数，返回 False 时不写入。
+
+        Returns:
+            bool: 是否写入。
+        """
+        async with self._write_lock:
+            # 基于最新的文件内容修改
+            await self._refresh(force=True)
+            config = copy.deepcopy(self._config)
+            if not mutator(config):
+                return False
+            self._signature = await asyncio.to_thread(self._write, config)
+            self._config = config
+            self._last_check = time.monotonic()
+            return True
+
+
+registry = ServerConfigRegistry(
+    os.getenv("MCP_SERVER_CONFIG_PATH", config_path),
+    poll_interval=float(os.getenv("MCP_SERVER_CONFIG_POLL_SECONDS", 2))
+)
+
+
+def _to_parameters(server_name: str, server_config: dict) -> StdioServerParameters:
+    return StdioServerParameters(
+        name=server_name,
+        command=server_config["command"],
+        args=server_config.get("args", []),
+        env=server_config.get("env"),
+    )
+
+
 async def load_config_from_file(server_name: str) -> StdioServerParameters:
-    """ Load the server configuration from a JSON file. """
+    """ Load the server configuration from the in-memory registry of the JSON file. """
     try:
         # debug
-        logger.debug(f"Loading config from {config_path}")
+        logger.debug(f"Loading config from {registry.path}")
 
-        # Read the configuration file
-        with open(config_path, "r") as config_file:
-            config = json.load(config_file)
+        config = await registry.config()
 
         # Retrieve the server configuration
-        server_config = config.get("mcpServers", {}).get(server_name)
+        server_config = config["mcpServers"].get(server_name)
         if not server_config:
             error_msg = f"Server '{server_name}' not found in configuration file."
             logger.error(error_msg)
             raise ValueError(error_msg)
 
         # Construct the server parameters
-        result = StdioServerParameters(
-            command=server_config["command"],
-            args=server_config.get("args", []),
-            env=server_config.get("env"),
-        )
+        result = _to_parameters(server_name, server_config)
 
         # debug
         logger.debug(f"Loaded config from file: command='{result.command}', args={result.args}, env={result.env}")
@@ -47,7 +161,7 @@ async def load_config_from_file(server_name: str) -> StdioServerParameters:
 
     except FileNotFoundError:
         # error
-        error_msg = f"Configuration file not found: {config_path}"
+        error_msg = f"Configuration file not found: {registry.path}"
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     except json.JSONDecodeError as e:
@@ -62,31 +176,21 @@ async def load_config_from_file(server_name: str) -> StdioServerParameters:
 
 
 async def load_all_config() -> List[StdioServerParameters]:
-    """ Load all the server configuration from a JSON file. """
+    """ Load all the server configuration from the in-memory registry of the JSON file. """
     try:
         # debug
-        logger.debug(f"Loading config from {config_path}")
+        logger.debug(f"Loading config from {registry.path}")
 
-        # Read the configuration file
-        with open(config_path, "r") as config_file:
-            config = json.load(config_file)
+        config = await registry.config()
 
         # Retrieve the server configuration
-        server_configs = config.get("mcpServers", {})
-        result = []
-        for server_name, server_config in server_configs.items():
-            result.append(
-                StdioServerParameters(
-                    name=server_name,
-                    command=server_config["command"],
-                    args=server_config.get("args", []),
-                    env=server_config.get("env"),
-                )
-            )
-        return result
+        return [
+            _to_parameters(server_name, server_config)
+            for server_name, server_config in config["mcpServers"].items()
+        ]
     except FileNotFoundError:
         # error
-        error_msg = f"Configuration file not found: {config_path}"
+        error_msg = f"Configuration file not found: {registry.path}"
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     except json.JSONDecodeError as e:
@@ -104,22 +208,24 @@ async def add_config(server: StdioServerParameters) -> StdioServerParameters:
     """ add a server configuration to a JSON file. """
     try:
         # debug
-        logger.debug(f"Adding config to {config_path}")
+        logger.debug(f"Adding config to {registry.path}")
 
-        with open(config_path, "r") as config_file:
-            config = json.load(config_file)
+        if not server.name:
+            raise ValueError("Server name is required.")
 
-        server_param = {"command":server.command, "args":server.args}
-        config["mcpServers"][server.server_name] = server_param
-        config = json.dumps(config, indent=2, ensure_ascii=False)
+        def mutator(config: dict) -> bool:
+            server_param = {"command": server.command, "args": server.args}
+            if server.env:
+                server_param["env"] = server.env
+            config["mcpServers"][server.name] = server_param
+            return True
 
-        with open(config_path, "w") as config_file:
-            config_file.write(config)
+        await registry.update(mutator)
         return server
 
     except FileNotFoundError:
         # error
-        error_msg = f"Configuration file not found: {config_path}"
+        error_msg = f"Configuration file not found: {registry.path}"
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     except json.JSONDecodeError as e:
@@ -137,30 +243,27 @@ async def edit_config(server: StdioServerParameters) -> Optional[StdioServerPara
     """ edit a server configuration to a JSON file. """
     try:
         # debug
-        logger.debug(f"Updating config to {config_path}")
-
-        with open(config_path, "r") as config_file:
-            config = json.load(config_file)
-
-        if server.server_name not in config["mcpServers"].keys():
+        logger.debug(f"Updating config to {registry.path}")
+
+        def mutator(config: dict) -> bool:
+            server_config = config["mcpServers"].get(server.name)
+            if server_config is None:
+                return False
+            if "command" in server_config:
+                server_config["command"] = server.command
+            if "args" in server_config:
+                server_config["args"] = server.args
+            if "env" in server_config:
+                server_config["env"] = server.env
+            return True
+
+        if not await registry.update(mutator):
             return None
-
-        if "command" in config["mcpServers"][server.server_name].keys():
-            config["mcpServers"][server.server_name]["command"] = server.command
-        if "args" in config["mcpServers"][server.server_name].keys():
-            config["mcpServers"][server.server_name]["args"] = server.args
-        if "env" in config["mcpServers"][server.server_name].keys():
-            config["mcpServers"][server.server_name]["env"] = server.env
-
-        config = json.dumps(config, indent=2, ensure_ascii=False)
-        with open(config_path, "w") as config_file:
-            config_file.write(config)
-
         return server
 
     except FileNotFoundError:
         # error
-        error_msg = f"Configuration file not found: {config_path}"
+        error_msg = f"Configuration file not found: {registry.path}"
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     except json.JSONDecodeError as e:
@@ -178,24 +281,18 @@ async def delete_config(server_name: str) -> Optional[str]:
     """ delete a server configuration in a JSON file. """
     try:
         # debug
-        logger.debug(f"Deleting a config in {config_path}")
+        logger.debug(f"Deleting a config in {registry.path}")
 
-        with open(config_path, "r") as config_file:
-            config = json.load(config_file)
+        def mutator(config: dict) -> bool:
+            return config["mcpServers"].pop(server_name, None) is not None
 
-        removed_config = config["mcpServers"].pop(server_name, None)
-        if not removed_config:
+        if not await registry.update(mutator):
             return None
-
-        config = json.dumps(config, indent=2, ensure_ascii=False)
-        with open(config_path, "w") as config_file:
-            config_file.write(config)
-
         return server_name
 
     except FileNotFoundError:
         # error
-        error_msg = f"Configuration file not found: {config_path}"
+        error_msg = f"Configuration file not found: {registry.path}"
         logger.error(error_msg)
         raise FileNotFoundError(error_msg)
     except json.JSONDecodeError as e:
@@ -207,4 +304,3 @@ async def delete_config(server_name: str) -> Optional[str]:
         # error
         logger.error(str(e))
         raise
-
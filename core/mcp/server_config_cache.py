@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+from core.mcp.server.server_loader import StdioServerParameters
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+class MCPServerConfigCache:
+    """
+    MCP 服务器启动参数的读穿透缓存
+
+    按服务器ID缓存解析好的 StdioServerParameters 及其版本（updated_at）。服务器被修改或删除时，
+    DAO 在同一事务中通过 pg_notify 广播变更，事务提交后所有 worker 及节点的监听连接收到通知并删除旧缓存。
+    监听断开期间可能漏掉通知，因此重连后清空缓存；另设 TTL 兜底。
+
+    加载期间若收到同一服务器的失效通知，加载结果不会写入缓存（按失效代数判断），避免旧数据覆盖。
+    """
+
+    def __init__(self, enabled: bool = True, ttl: float = 300, max_size: int = 1000,
+                 channel: str = "mcp_server_changed", dsn: Optional[str] = None):
+        """
+        初始化缓存
+
+        Args:
+            enabled (bool): 是否启用缓存。
+            ttl (float): 缓存项的最长有效秒数。
+            max_size (int): 最多缓存的服务器数，超出时淘汰最久未使用的。
+            channel (str): LISTEN/NOTIFY 通道名。
+            dsn (Optional[str]): 监听连接的 postgres 连接串，为空时不监听（仅本进程内失效）。
+        """
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_size = max_size
+        self.channel = channel
+        self.dsn = dsn
+        # server_id -> (启动参数, 版本, 过期时间)
+        self._entries: "OrderedDict[int, Tuple[StdioServerParameters, Optional[str], float]]" = OrderedDict()
+        # server_id -> 失效代数，每次失效加一；清空缓存时整体代数加一
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._listen_task: Optional[asyncio.Task] = None
+        self._listening = False
+
+    @classmethod
+    def from_env(cls) -> "MCPServerConfigCache":
+        """从环境变量构建缓存，监听连接使用 DATABASE_* 配置"""
+        dsn = (
+            f"postgresql://{os.getenv('DATABASE_USERNAME')}:{os.getenv('DATABASE_PASSWORD')}"
+            f"@{os.getenv('DATABASE_HOST')}:{os.getenv('DATABASE_PORT')}/{os.getenv('DATABASE_NAME')}"
+        )
+        return cls(
+            enabled=os.getenv("MCP_CONFIG_CACHE_ENABLED", "true").lower() == "true",
+            ttl=float(os.getenv("MCP_CONFIG_CACHE_TTL", 300)),
+            max_size=int(os.getenv("MCP_CONFIG_CACHE_MAX_SIZE", 1000)),
+            channel=os.getenv("MCP_CONFIG_CACHE_CHANNEL", "mcp_server_changed"),
+            dsn=dsn if os.getenv("MCP_CONFIG_CACHE_LISTEN", "true").lower() == "true" else None,
+        )
+
+    def generation(self, server_id: int) -> Tuple[int, int]:
+        """获取服务器当前的失效代数，加载前调用，写入缓存时校验"""
+        return self._epoch, self._generations.get(server_id, 0)
+
+    def get(self, server_id: int) -> Optional[StdioServerParameters]:
+        """
+        获取缓存的启动参数
+
+        Args:
+            server_id (int): 服务器ID。
+
+        Returns:
+            Optional[StdioServerParameters]: 启动参数的副本，未命中或已过期时返回 None。
+        """
+        # 配置了监听但监听连接未建立时，无法及时收到其他 worker 的变更通知，不使用缓存
+        if not self.enabled or (self.dsn and not self._listening):
+            return None
+        entry = self._entries.get(server_id)
+        if entry is None or entry[2] < time.monotonic():
+            self._entries.pop(server_id, None)
+            self._misses += 1
+            return None
+        self._entries.move_to_end(server_id)
+        self._hits += 1
+        # 返回副本，调用方修改不会影响缓存
+        return entry[0].model_copy(deep=True)
+
+    def put(self, server_id: int, params: StdioServerParameters, version: Optional[str],
+            generation: Tuple[int, int]):
+        """
+        写入缓存，加载期间已失效时丢弃
+
+        Args:
+            server_id (int): 服务器ID。
+            params (StdioServerParameters): 启动参数。
+            version (Optional[str]): 服务器版本（updated_at）。
+            generation (Tuple[int, int]): 加载前获取的失效代数。
+        """
+        if not self.enabled or generation != self.generation(server_id):
+            return
+        self._entries[server_id] = (params.model_copy(deep=True), version, time.monotonic() + self.ttl)
+        self._entries.move_to_end(server_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, server_id: int, version: Optional[str] = None):
+        """
+        删除服务器的缓存
+
+        Args:
+            server_id (int): 服务器ID。
+            version (Optional[str]): 变更后的版本，缓存已是该版本时保留（删除时为空）。
+        """
+        entry = self._entries.get(server_id)
+        if version is not None and entry is not None and entry[1] == version:
+            return
+        self._generations[server_id] = self._generations.get(server_id, 0) + 1
+        if self._entries.pop(server_id, None) is not None:
+            self._invalidations += 1
+
+    def clear(self):
+        self._epoch += 1
+        self._invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "listening": self._listening,
+            "size": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else 0.0,
+            "invalidations": self._invalidations,
+        }
+
+    def on_notify(self, payload: str):
+        """处理变更通知，payload 为 {"id": 服务器ID, "version": 变更后的版本}"""
+        try:
+            data = json.loads(payload)
+            self.invalidate(int(data["id"]), data.get("version"))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"无法解析 MCP 服务器变更通知 {payload!r}: {e}")
+
+    async def start(self):
+        """启动变更通知监听"""
+        if self.enabled and self.dsn and self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen_loop())
+
+    async def stop(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+
+    async def _listen_loop(self):
+        import asyncpg
+
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(self.channel, lambda _conn, _pid, _channel, payload: self.on_notify(payload))
+                # 断开期间可能漏掉通知，重新监听后清空缓存
+                self.clear()
+                self._listening = True
+                backoff = 1.0
+                logger.info(f"开始监听 MCP 服务器变更通知：{self.channel}")
+                await closed.wait()
+                logger.warning("MCP 服务器变更通知的监听连接已断开")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"监听 MCP 服务器变更通知失败: {e}")
+            finally:
+                self._listening = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
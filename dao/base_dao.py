@@ -0,0 +1,160 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class UnitOfWork:
+    """
+    工作单元
+
+    在一个请求（或一段业务逻辑）内共享同一个 AsyncSession：只取一次连接，所有 DAO 调用处于同一事务，
+    DAO 写入时只 flush，由工作单元在结束时统一提交，出错时整体回滚。
+
+    工作单元只对开启它的 asyncio 任务生效。请求内创建的后台任务（如草稿保存）以及在请求返回后
+    才执行的流式响应不在该任务中，仍由 DAO 各自使用独立的会话，避免并发使用同一个 AsyncSession。
+    """
+
+    _current: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.owner = asyncio.current_task()
+        self.active = True
+
+    @classmethod
+    def current(cls) -> Optional["UnitOfWork"]:
+        """获取当前任务中进行中的工作单元"""
+        uow = cls._current.get()
+        if uow is not None and uow.active and uow.owner is asyncio.current_task():
+            return uow
+        return None
+
+    @classmethod
+    @asynccontextmanager
+    async def begin(cls, session_factory) -> AsyncIterator["UnitOfWork"]:
+        """
+        开启工作单元，正常结束时提交，抛出异常时回滚；已处于工作单元中时复用外层工作单元
+
+        Args:
+            session_factory: Session 工厂。
+
+        Yields:
+            UnitOfWork: 工作单元。
+        """
+        outer = cls.current()
+        if outer is not None:
+            yield outer
+            return
+
+        async with session_factory() as session:
+            uow = cls(session)
+            token = cls._current.set(uow)
+            try:
+                yield uow
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                uow.active = False
+                cls._current.reset(token)
+
+
+class UnitOfWorkProvider:
+    """
+    请求级工作单元依赖
+
+    用法：FastAPI(dependencies=[Depends(unit_of_work)])，请求处理函数返回前提交事务并释放连接。
+    """
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+
+    def begin(self):
+        return UnitOfWork.begin(self._session_factory)
+
+    async def __call__(self) -> AsyncIterator[UnitOfWork]:
+        async with self.begin() as uow:
+            yield uow
+
+
+class BaseDAO:
+    """
+    DAO 基类
+
+    处于工作单元中时使用工作单元的会话（包括只读查询），否则每次调用使用独立的会话并立即提交。
+    """
+
+    def __init__(self, session_factory, read_session_factory=None):
+        """
+        Args:
+            session_factory: 主库 Session 工厂。
+            read_session_factory: 只读副本 Session 工厂，用于可容忍复制延迟的列表查询，为空时使用主库。
+        """
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory or session_factory
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """获取主库会话"""
+        uow = UnitOfWork.current()
+        if uow is not None:
+            yield uow.session
+        else:
+            async with self._session_factory() as session:
+                yield session
+
+    @asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        获取只读会话
+
+        处于工作单元中时复用工作单元的会话：同一事务内先写后读能读到刚写入的数据（只读副本有复制延迟），
+        且不再额外占用副本连接。不在工作单元中时使用只读副本，未配置只读副本时与 session() 相同。
+        """
+        uow = UnitOfWork.current()
+        if uow is not None:
+            yield uow.session
+        else:
+            async with self._read_session_factory() as session:
+                yield session
+
+    @asynccontextmanager
+    async def replica_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        获取独立的只读副本会话（未配置只读副本时为独立的主库会话），不复用工作单元的会话
+
+        与 stream_scalars() 读取同一数据源，用于需要与流式读取结果保持一致的查询（如列表的 ETag 版本信息）。
+        """
+        async with self._read_session_factory() as session:
+            yield session
+
+    async def stream_scalars(self, stmt: Select, batch_size: int = 500) -> AsyncIterator[List]:
+        """
+        通过服务端游标分批读取查询结果，内存占用与结果总数无关
+
+        游标需要在整个迭代期间持有连接，而流式响应在请求任务之外执行，因此始终使用独立的只读会话，
+        不复用工作单元的会话。迭代结束或生成器关闭时释放连接。
+
+        Args:
+            stmt (Select): 查询语句。
+            batch_size (int): 每批从游标读取的行数。
+
+        Yields:
+            List: 一批 ORM 对象。
+        """
+        async with self.replica_session() as session:
+            result = await session.stream_scalars(stmt, execution_options={"yield_per": batch_size})
+            async for partition in result.partitions():
+                yield partition
+
+    @staticmethod
+    async def commit(session: AsyncSession):
+        """提交写入；处于工作单元中时只 flush（生成主键等），由工作单元统一提交"""
+        if UnitOfWork.current() is not None:
+            await session.flush()
+        else:
+            await session.commit()
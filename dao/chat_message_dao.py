@@ -0,0 +1,161 @@
+from typing import Dict, List, Optional
+from sqlalchemy import insert, update, values, column, BigInteger, Integer
+from sqlalchemy.future import select
+from datetime import datetime
+from model.chat_message import ChatMessage
+from model.chat_window import ChatWindow
+from dao.base_dao import BaseDAO
+
+
+# 会话消息DAO
+class ChatMessageDAO(BaseDAO):
+    async def append_messages(self, chat_window_id: int, messages: List[dict]) -> Optional[int]:
+        """
+        追加会话消息
+
+        在同一事务内先通过 UPDATE ... RETURNING 递增会话的 message_count 分配序号（同时锁定会话行，
+        串行化同一会话的并发追加）并清空回复草稿，再插入新消息，不读取或重写已有消息。
+
+        Args:
+            chat_window_id (int): 会话ID。
+            messages (List[dict]): 新消息，每项包含 role、content，可选 token_count。
+
+        Returns:
+            Optional[int]: 追加后的消息总条数，会话不存在时返回 None。
+        """
+        now = datetime.now()
+        async with self.session() as session:
+            result = await session.execute(
+                update(ChatWindow)
+                .where(ChatWindow.id == chat_window_id)
+                .values(message_count=ChatWindow.message_count + len(messages), draft=None, updated_at=now)
+                .returning(ChatWindow.message_count)
+            )
+            message_count = result.scalar_one_or_none()
+            if message_count is None:
+                return None
+
+            first_seq = message_count - len(messages) + 1
+            await session.execute(insert(ChatMessage), [
+                {
+                    "chat_window_id": chat_window_id,
+                    "seq": first_seq + i,
+                    "role": message["role"],
+                    "content": message["content"],
+                    "token_count": message.get("token_count"),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for i, message in enumerate(messages)
+            ])
+            await self.commit(session)
+            return message_count
+
+    async def append_messages_batch(self, messages_by_window: Dict[int, List[dict]]) -> Dict[int, int]:
+        """
+        批量追加多个会话的消息
+
+        一条 UPDATE ... FROM (VALUES ...) RETURNING 为所有会话分配序号，再以一条多行 INSERT 插入全部消息，
+        整批在同一事务内完成。
+
+        Args:
+            messages_by_window (Dict[int, List[dict]]): 会话ID -> 按顺序追加的新消息。
+
+        Returns:
+            Dict[int, int]: 会话ID -> 追加后的消息总条数，不存在的会话不会出现在结果中。
+        """
+        if not messages_by_window:
+            return {}
+        now = datetime.now()
+        counts = values(column("id", BigInteger), column("n", Integer), name="v").data(
+            [(chat_window_id, len(messages)) for chat_window_id, messages in sorted(messages_by_window.items())]
+        )
+        async with self.session() as session:
+            result = await session.execute(
+                update(ChatWindow)
+                .where(ChatWindow.id == counts.c.id)
+                .values(message_count=ChatWindow.message_count + counts.c.n, draft=None, updated_at=now)
+                .returning(ChatWindow.id, ChatWindow.message_count)
+            )
+            message_counts = {row.id: row.message_count for row in result}
+
+            rows = []
+            for chat_window_id, message_count in message_counts.items():
+                messages = messages_by_window[chat_window_id]
+                first_seq = message_count - len(messages) + 1
+                rows.extend({
+                    "chat_window_id": chat_window_id,
+                    "seq": first_seq + i,
+                    "role": message["role"],
+                    "content": message["content"],
+                    "token_count": message.get("token_count"),
+                    "created_at": now,
+                    "updated_at": now,
+                } for i, message in enumerate(messages))
+            if rows:
+                await session.execute(insert(ChatMessage), rows)
+            await self.commit(session)
+            return message_counts
+
+    async def get_messages(self, chat_window_id: int, after_seq: int = 0) -> List[ChatMessage]:
+        """获取会话中序号大于 after_seq 的消息，按序号正序"""
+        async with self.session() as session:
+            result = await session.execute(
+                select(ChatMessage)
+                .where(ChatMessage.chat_window_id == chat_window_id, ChatMessage.seq > after_seq)
+                .order_by(ChatMessage.seq)
+            )
+            return result.scalars().all()
+
+    async def get_recent_messages(self, chat_window_id: int, limit: int) -> List[ChatMessage]:
+        """获取会话最近的 limit 条消息，按序号正序"""
+        async with self.session() as session:
+            result = await session.execute(
+                select(ChatMessage)
+                .where(ChatMessage.chat_window_id == chat_window_id)
+                .order_by(ChatMessage.seq.desc())
+                .limit(limit)
+            )
+            return list(reversed(result.scalars().all()))
+
+    async def get_message_page(self, chat_window_id: int, before_seq: Optional[int] = None,
+                               since_seq: Optional[int] = None, limit: int = 50) -> List[ChatMessage]:
+        """
+        按序号游标分页获取会话消息，结果按序号正序
+
+        Args:
+            chat_window_id (int): 会话ID。
+            before_seq (Optional[int]): 返回序号小于该值的最近 limit 条，为空时返回最新的 limit 条。
+            since_seq (Optional[int]): 增量模式，返回序号大于该值的最早 limit 条，优先于 before_seq。
+            limit (int): 最大条数。
+
+        Returns:
+            List[ChatMessage]: 消息列表。
+        """
+        async with self.session() as session:
+            query = select(ChatMessage).where(ChatMessage.chat_window_id == chat_window_id)
+            if since_seq is not None:
+                result = await session.execute(
+                    query.where(ChatMessage.seq > since_seq).order_by(ChatMessage.seq).limit(limit)
+                )
+                return result.scalars().all()
+            if before_seq is not None:
+                query = query.where(ChatMessage.seq < before_seq)
+            result = await session.execute(query.order_by(ChatMessage.seq.desc()).limit(limit))
+            return list(reversed(result.scalars().all()))
+
+    async def get_messages_by_window_ids(self, chat_window_ids: List[int]) -> Dict[int, List[ChatMessage]]:
+        """一次查询获取多个会话的全部消息，按会话ID分组（用于会话列表，读取只读副本）"""
+        grouped: Dict[int, List[ChatMessage]] = {chat_window_id: [] for chat_window_id in chat_window_ids}
+        if not chat_window_ids:
+            return grouped
+        async with self.read_session() as session:
+            result = await session.execute(
+                select(ChatMessage)
+                .where(ChatMessage.chat_window_id.in_(chat_window_ids))
+                .order_by(ChatMessage.chat_window_id, ChatMessage.seq)
+            )
+            for message in result.scalars():
+                grouped[message.chat_window_id].append(message)
+        return grouped
+
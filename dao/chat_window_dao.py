@@ -1,16 +1,16 @@
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from sqlalchemy.future import select
+from sqlalchemy import update, bindparam, cast, func, literal, values, column, BigInteger
+from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP
 from datetime import datetime
 from model.chat_window import ChatWindow
+from dao.base_dao import BaseDAO
 
 
 # 会话记录DAO
-class ChatWindowDAO:
-    def __init__(self, session_factory):
-        self._session_factory = session_factory
-
+class ChatWindowDAO(BaseDAO):
     async def create_chat_window(self, user_id, summary, content: Optional[str] = None):
-        async with self._session_factory() as session:
+        async with self.session() as session:
             new_chat_window = ChatWindow(
                 user_id=user_id,
                 summary=summary,
@@ -18,20 +18,20 @@ class ChatWindowDAO:
                 created_at=datetime.now(),
                 updated_at=datetime.now()
             )
-        session.add(new_chat_window)
-        await session.commit()
-        return new_chat_window
+            session.add(new_chat_window)
+            await self.commit(session)
+            return new_chat_window
 
     async def delete_chat_window(self, chat_window_id):
-        async with self._session_factory() as session:
-            chat_window = session.query(ChatWindow).get(chat_window_id)
+        async with self.session() as session:
+            chat_window = await session.get(ChatWindow, chat_window_id)
             if chat_window:
-                session.delete(chat_window)
-                await session.commit()
+                await session.delete(chat_window)
+                await self.commit(session)
                 return chat_window_id
 
     async def update_chat_window(self, chat_window_id, summary, content):
-        async with self._session_factory() as session:
+        async with self.session() as session:
             result = await session.execute(
                 select(ChatWindow).where(ChatWindow.id == chat_window_id)
             )
@@ -42,18 +42,174 @@ class ChatWindowDAO:
                     chat_window.summary = summary
                 chat_window.content = content
                 chat_window.updated_at = datetime.now()
-                await session.commit()
+                await self.commit(session)
                 return chat_window_id
 
+    async def append_chat_window_content(self, chat_window_id: int, new_content: List[dict]) -> Optional[int]:
+        """
+        在数据库端原子追加会话内容
+
+        单条 UPDATE ... SET content = content || :new RETURNING id 完成追加，
+        无需先读取已有内容，并发追加也不会互相覆盖。
+
+        Args:
+            chat_window_id (int): 会话ID。
+            new_content (List[dict]): 追加的消息列表。
+
+        Returns:
+            Optional[int]: 会话ID，会话不存在时返回 None。
+        """
+        async with self.session() as session:
+            result = await session.execute(
+                update(ChatWindow)
+                .where(ChatWindow.id == chat_window_id)
+                .values(
+                    content=func.coalesce(ChatWindow.content, cast(literal("[]"), JSONB))
+                    .op("||")(bindparam("new_content", new_content, type_=JSONB)),
+                    draft=None,
+                    updated_at=datetime.now()
+                )
+                .returning(ChatWindow.id)
+            )
+            await self.commit(session)
+            return result.scalar_one_or_none()
+
+    async def append_chat_window_content_batch(self, content_by_window: Dict[int, List[dict]]) -> List[int]:
+        """
+        批量原子追加多个会话的内容，一条 UPDATE ... FROM (VALUES ...) 完成
+
+        Args:
+            content_by_window (Dict[int, List[dict]]): 会话ID -> 追加的消息列表。
+
+        Returns:
+            List[int]: 已更新的会话ID。
+        """
+        if not content_by_window:
+            return []
+        new_content = values(column("id", BigInteger), column("new_content", JSONB), name="v").data(
+            sorted(content_by_window.items())
+        )
+        async with self.session() as session:
+            result = await session.execute(
+                update(ChatWindow)
+                .where(ChatWindow.id == new_content.c.id)
+                .values(
+                    content=func.coalesce(ChatWindow.content, cast(literal("[]"), JSONB)).op("||")(new_content.c.new_content),
+                    draft=None,
+                    updated_at=datetime.now()
+                )
+                .returning(ChatWindow.id)
+            )
+            await self.commit(session)
+            return list(result.scalars())
+
+    async def update_draft(self, chat_window_id: int, draft: Optional[dict]):
+        """保存会话的回复草稿，只更新 draft 列（不改变会话的更新时间）"""
+        async with self.session() as session:
+            await session.execute(
+                update(ChatWindow).where(ChatWindow.id == chat_window_id).values(draft=draft, updated_at=ChatWindow.updated_at)
+            )
+            await self.commit(session)
+
+    async def mark_stale_drafts_interrupted(self, stale_seconds: int) -> int:
+        """
+        将超过 stale_seconds 未更新且仍处于 streaming 状态的草稿标记为 interrupted
+
+        Args:
+            stale_seconds (int): 草稿最近一次保存距今的秒数阈值。
+
+        Returns:
+            int: 标记的会话数。
+        """
+        async with self.session() as session:
+            result = await session.execute(
+                update(ChatWindow)
+                .where(
+                    ChatWindow.draft["status"].astext == "streaming",
+                    ChatWindow.draft["updated_at"].astext.cast(TIMESTAMP(timezone=True))
+                    < func.now() - func.make_interval(0, 0, 0, 0, 0, 0, stale_seconds)
+                )
+                .values(draft=ChatWindow.draft.op("||")(cast(literal('{"status": "interrupted"}'), JSONB)),
+                        updated_at=ChatWindow.updated_at)
+                .returning(ChatWindow.id)
+            )
+            await self.commit(session)
+            return len(result.all())
+
     async def get_user_chat_windows(self, user_id) -> List[ChatWindow]:
-        async with self._session_factory() as session:
+        async with self.read_session() as session:
             result = await session.execute(
                 select(ChatWindow).where(ChatWindow.user_id == user_id).order_by(ChatWindow.id.desc()))
             return result.scalars().all()
 
+    async def get_user_chat_windows_version(self, user_id: int) -> Tuple:
+        """
+        一次聚合查询获取用户会话列表的版本信息，用于生成 ETag，不读取会话内容
+
+        草稿保存不改变会话的 updated_at，因此另取草稿的最后保存时间及被中断的草稿数（启动时标记中断不改变草稿保存时间）。
+        与 stream_user_chat_windows() 一样读取只读副本，ETag 与列表内容来自同一数据源。
+
+        Args:
+            user_id (int): 用户ID。
+
+        Returns:
+            Tuple: (会话数, 最大 updated_at, 草稿最后保存时间, 中断的草稿数)。
+        """
+        async with self.replica_session() as session:
+            result = await session.execute(
+                select(
+                    func.count(),
+                    func.max(ChatWindow.updated_at),
+                    func.max(ChatWindow.draft["updated_at"].astext),
+                    func.count().filter(ChatWindow.draft["status"].astext == "interrupted"),
+                ).where(ChatWindow.user_id == user_id)
+            )
+            return tuple(result.one())
+
+    def stream_user_chat_windows(self, user_id: int, batch_size: int = 500) -> AsyncIterator[List[ChatWindow]]:
+        """按ID倒序分批读取用户的全部会话（服务端游标）"""
+        return self.stream_scalars(
+            select(ChatWindow).where(ChatWindow.user_id == user_id).order_by(ChatWindow.id.desc()), batch_size)
+
+    async def get_user_chat_window_page(self, user_id: int, before_id: Optional[int] = None, limit: int = 20):
+        """
+        按 (user_id, id DESC) keyset 分页获取用户会话，只查询列表展示需要的列
+
+        Args:
+            user_id (int): 用户ID。
+            before_id (Optional[int]): 上一页最后一个会话的ID，为空时从最新的会话开始。
+            limit (int): 每页条数。
+
+        Returns:
+            List[Row]: 包含 id、summary、created_at、updated_at 的行，最多 limit 条。
+        """
+        async with self.read_session() as session:
+            query = select(ChatWindow.id, ChatWindow.summary, ChatWindow.created_at, ChatWindow.updated_at) \
+                .where(ChatWindow.user_id == user_id)
+            if before_id is not None:
+                query = query.where(ChatWindow.id < before_id)
+            result = await session.execute(query.order_by(ChatWindow.id.desc()).limit(limit))
+            return result.all()
+
     async def get_chat_window_by_id(self, chat_window_id: int) -> ChatWindow:
-        async with self._session_factory() as session:
+        async with self.session() as session:
             result = await session.execute(
                 select(ChatWindow).where(ChatWindow.id == chat_window_id)
             )
             return result.scalar_one_or_none()
+
+    async def get_chat_window_user_id(self, chat_window_id: int) -> Optional[int]:
+        """只查询会话所属的用户ID（用于鉴权，不读取会话内容），会话不存在时返回 None"""
+        async with self.session() as session:
+            result = await session.execute(select(ChatWindow.user_id).where(ChatWindow.id == chat_window_id))
+            return result.scalar_one_or_none()
+
+    async def update_running_summary(self, chat_window_id: int, running_summary: str, summarized_count: int):
+        """更新会话的滚动摘要及其覆盖的消息条数，不修改会话内容"""
+        async with self.session() as session:
+            await session.execute(
+                update(ChatWindow)
+                .where(ChatWindow.id == chat_window_id)
+                .values(running_summary=running_summary, summarized_count=summarized_count)
+            )
+            await self.commit(session)
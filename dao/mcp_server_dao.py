@@ -1,23 +1,51 @@
+import json
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import update, delete, func, bindparam, null, TEXT
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from model.mcp_server import McpServer
-from typing import Optional, List, Dict, Any
+from typing import AsyncIterator, Optional, List, Dict, Any, Tuple
 from datetime import datetime
+from dao.base_dao import BaseDAO
 
-class MCPServerDAO:
-    def __init__(self, session_factory):
-        self._session_factory = session_factory
+# 同一用户下服务器名称唯一
+UNIQUE_USER_SERVER_NAME = 'uq_mcp_servers_user_id_server_name'
+
+
+class MCPServerDAO(BaseDAO):
+    def __init__(self, session_factory, change_channel: Optional[str] = None):
+        """
+        Args:
+            session_factory: Session 工厂。
+            change_channel (Optional[str]): 服务器修改或删除时 NOTIFY 的通道名，为空时不通知。
+        """
+        super().__init__(session_factory)
+        self._change_channel = change_channel
         print('mcp server dao init')
 
+    async def _notify_changed(self, session, changes: List[Tuple[int, Optional[datetime]]]):
+        """
+        在当前事务中发送变更通知，事务提交后才会送达监听方；多个服务器的通知由一条语句发送
+
+        Args:
+            session: 当前会话。
+            changes (List[Tuple[int, Optional[datetime]]]): (服务器ID, 变更后的 updated_at，删除时为空) 列表。
+        """
+        if not self._change_channel or not changes:
+            return
+        payloads = [json.dumps({"id": server_id, "version": version.isoformat() if version else None})
+                    for server_id, version in changes]
+        payload = func.unnest(bindparam("payloads", payloads, type_=ARRAY(TEXT))).column_valued("payload")
+        await session.execute(select(func.pg_notify(self._change_channel, payload)))
+
     async def get_all_servers(self) -> List[McpServer]:
         """获取所有 MCP 服务器"""
-        async with self._session_factory() as session:
+        async with self.session() as session:
             result = await session.execute(select(McpServer))
             return result.scalars().all()
 
     async def get_server_by_id(self, id: int) -> Optional[McpServer]:
         """根据服务器ID获取 MCP 服务器"""
-        async with self._session_factory() as session:
+        async with self.session() as session:
             result = await session.execute(
                 select(McpServer).where(McpServer.id == id)
             )
@@ -25,33 +53,93 @@ class MCPServerDAO:
 
     async def get_servers_by_user_id(self, user_id: int) -> List[McpServer]:
         """根据用户ID获取该用户的所有 MCP 服务器"""
-        async with self._session_factory() as session:
+        async with self.session() as session:
             result = await session.execute(
                 select(McpServer).where(McpServer.user_id == user_id)
             )
             return result.scalars().all()
 
+    async def get_servers_version(self, user_id: int) -> Tuple[int, Optional[datetime]]:
+        """
+        一次聚合查询获取用户服务器列表的版本信息（服务器数, 最大 updated_at），用于生成 ETag
+
+        与 stream_servers_by_user_id() 一样读取只读副本，ETag 与列表内容来自同一数据源。
+        """
+        async with self.replica_session() as session:
+            result = await session.execute(
+                select(func.count(), func.max(McpServer.updated_at)).where(McpServer.user_id == user_id)
+            )
+            count, updated_at = result.one()
+            return count, updated_at
+
+    def stream_servers_by_user_id(self, user_id: int, batch_size: int = 500) -> AsyncIterator[List[McpServer]]:
+        """分批读取用户的所有 MCP 服务器（服务端游标）"""
+        return self.stream_scalars(select(McpServer).where(McpServer.user_id == user_id), batch_size)
+
     async def create_server(self, 
                           user_id: int,
                           server_name: str, 
                           command: str, 
                           args: List[str], 
-                          env: Optional[Dict[str, Any]] = None) -> McpServer:
-        """创建新的 MCP 服务器"""
-        async with self._session_factory() as session:
-            new_server = McpServer(
-                user_id=user_id,
-                server_name=server_name,
-                command=command,
-                args=args,
-                env=env,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
+                          env: Optional[Dict[str, Any]] = None) -> Optional[McpServer]:
+        """创建新的 MCP 服务器，同一用户下名称已存在时不插入并返回 None"""
+        now = datetime.now()
+        async with self.session() as session:
+            result = await session.execute(
+                insert(McpServer)
+                .values(user_id=user_id, server_name=server_name, command=command, args=args,
+                        env=env if env is not None else null(), created_at=now, updated_at=now)
+                .on_conflict_do_nothing(constraint=UNIQUE_USER_SERVER_NAME)
+                .returning(McpServer)
             )
-            session.add(new_server)
-            await session.commit()
+            new_server = result.scalar_one_or_none()
+            await self.commit(session)
             return new_server
 
+    async def upsert_servers(self, user_id: int, servers: List[Dict[str, Any]]) -> List[McpServer]:
+        """
+        批量导入用户的 MCP 服务器
+
+        单条 INSERT ... ON CONFLICT (user_id, server_name) DO UPDATE 完成，同名服务器覆盖启动参数。
+
+        Args:
+            user_id (int): 用户ID。
+            servers (List[Dict[str, Any]]): 服务器列表，每项包含 server_name、command、args、env，名称不能重复。
+
+        Returns:
+            List[McpServer]: 新增及更新后的服务器。
+        """
+        if not servers:
+            return []
+        now = datetime.now()
+        stmt = insert(McpServer).values([
+            {
+                "user_id": user_id,
+                "server_name": server["server_name"],
+                "command": server["command"],
+                "args": server.get("args") or [],
+                "env": server.get("env") or null(),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for server in servers
+        ])
+        stmt = stmt.on_conflict_do_update(
+            constraint=UNIQUE_USER_SERVER_NAME,
+            set_={
+                "command": stmt.excluded.command,
+                "args": stmt.excluded.args,
+                "env": stmt.excluded.env,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        ).returning(McpServer)
+        async with self.session() as session:
+            result = await session.execute(stmt, execution_options={"populate_existing": True})
+            upserted = result.scalars().all()
+            await self._notify_changed(session, [(server.id, server.updated_at) for server in upserted])
+            await self.commit(session)
+            return upserted
+
     async def update_server(self,
                           id: int,
                           server_name: Optional[str] = None,
@@ -59,7 +147,7 @@ class MCPServerDAO:
                           args: Optional[List[str]] = None,
                           env: Optional[Dict[str, Any]] = None) -> Optional[McpServer]:
         """更新 MCP 服务器信息"""
-        async with self._session_factory() as session:
+        async with self.session() as session:
             update_data = {}
             if server_name is not None:
                 update_data['server_name'] = server_name
@@ -72,21 +160,28 @@ class MCPServerDAO:
             
             if update_data:
                 update_data['updated_at'] = datetime.now()
-                result = await session.execute(
-                    update(McpServer)
-                    .where(McpServer.id == id)
-                    .values(**update_data)
-                    .returning(McpServer)
-                )
-                await session.commit()
-                return result.scalar_one_or_none()
+                # 改名与同一用户下其他服务器冲突时由唯一约束抛出 IntegrityError，使用保存点使外层事务仍可用
+                async with session.begin_nested():
+                    result = await session.execute(
+                        update(McpServer)
+                        .where(McpServer.id == id)
+                        .values(**update_data)
+                        .returning(McpServer)
+                    )
+                server = result.scalar_one_or_none()
+                if server is not None:
+                    await self._notify_changed(session, [(id, server.updated_at)])
+                await self.commit(session)
+                return server
             return None
 
     async def delete_server(self, id: int) -> bool:
         """删除 MCP 服务器"""
-        async with self._session_factory() as session:
+        async with self.session() as session:
             result = await session.execute(
                 delete(McpServer).where(McpServer.id == id)
             )
-            await session.commit()
+            if result.rowcount > 0:
+                await self._notify_changed(session, [(id, None)])
+            await self.commit(session)
             return result.rowcount > 0
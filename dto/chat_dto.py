@@ -15,4 +15,6 @@ class ChatDTO(BaseModel):
     history: Optional[dict] = None
     api: Optional[str] = None
     card: Optional[str] = None
-    user_id: int = 1
\ No newline at end of file
+    user_id: int = 1
+    # 是否读取响应缓存，False 时跳过缓存直接请求模型（结果仍会刷新缓存）
+    use_cache: bool = True
\ No newline at end of file
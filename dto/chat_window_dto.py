@@ -7,24 +7,11 @@ class ContentDTO(BaseModel):
     type: str  # text | image
     text: Optional[str] = None
     image: Optional[str] = None
-    
-    def model_dump(self, **kwargs):
-        return {
-            "type": self.type,
-            "text": self.text,
-            "image": self.image
-        }
 
 # 对话信息记录
 class ChatMessageDTO(BaseModel):
     role: str # user | assistant
     content: List[ContentDTO]
-    
-    def model_dump(self, **kwargs):
-        return {
-            "role": self.role,
-            "content": [c.model_dump() for c in self.content]
-        }
 
 # 会话DTO
 class ChatWindowDTO(BaseModel):
@@ -36,21 +23,39 @@ class ChatWindowDTO(BaseModel):
     summary: Optional[str] = None
     # 对话信息记录
     chat_messages: List[ChatMessageDTO] = []
+    # 未完成或被中断的助手回复草稿
+    draft: Optional[dict] = None
     created_at: datetime
     updated_at: datetime
-    
-    def model_dump(self, **kwargs):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "summary": self.summary,
-            "chat_messages": [m.model_dump() for m in self.chat_messages],
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None
-        }
-
-
-
-
 
 
+# 会话列表项DTO（不含对话信息记录）
+class ChatWindowSummaryDTO(BaseModel):
+    # 主键
+    id: int
+    # 概要
+    summary: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+# 会话分页DTO
+class ChatWindowPageDTO(BaseModel):
+    items: List[ChatWindowSummaryDTO] = []
+    # 下一页的游标（传入 before），没有更多数据时为空
+    next_before: Optional[int] = None
+
+
+# 带序号的对话信息记录
+class ChatMessageItemDTO(ChatMessageDTO):
+    # 会话内序号，从 1 开始
+    seq: int
+
+# 会话消息分页DTO
+class ChatMessagePageDTO(BaseModel):
+    chat_messages: List[ChatMessageItemDTO] = []
+    # 未完成或被中断的助手回复草稿
+    draft: Optional[dict] = None
+    # 加载更早消息的游标（传入 before），没有更早的消息时为空
+    next_before: Optional[int] = None
+    # 会话当前的最大序号，客户端可作为下次增量同步的 since
+    last_seq: int = 0
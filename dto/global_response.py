@@ -1,6 +1,11 @@
-from typing import Optional, Any, Type
-from fastapi.responses import JSONResponse
+from contextlib import aclosing
+from typing import Optional, Any, AsyncIterator, List, Type
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic_core import to_json
 import json
+from core.common.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 # 接口统一返回体
@@ -36,9 +41,73 @@ class GlobalResponse(JSONResponse):
             "data": data,
             # "timestamp": timestamp,
         }
-        
-        # 如果提供了自定义的 JSON 编码器，使用它来序列化内容
-        if json_encoder:
-            content = json.loads(json_encoder().encode(content))
-            
+
+        # 自定义 JSON 编码器仅用于 pydantic 无法序列化的类型
+        self._fallback = json_encoder().default if json_encoder else None
+
         super().__init__(content=content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        """
+        一次序列化为 bytes
+
+        pydantic_core 直接序列化 DTO（BaseModel）、datetime 等类型，无需先转换为字典或经过 json.loads 往返。
+        """
+        # 其他无法序列化的类型（如参数校验错误中的异常对象）输出为字符串
+        return to_json(content, fallback=self._fallback, serialize_unknown=True)
+
+
+# 统一返回体的流式版本
+class GlobalStreamingResponse(StreamingResponse):
+    """
+    data 为数组的统一返回体，逐项序列化并分块发送
+
+    响应体与 GlobalResponse 逐字节一致，但不在内存中构建完整的列表及 JSON 文档：先发送信封的开头
+    （到 "data":[ 为止），再从异步迭代器中逐项取出元素序列化，累积到 chunk_size 后发送，最后发送 ]}。
+
+    响应头发送后无法再修改状态码，迭代中途出错时中断连接（分块传输不完整），客户端不会收到被截断却看似完整的 JSON。
+    """
+
+    def __init__(self, items: AsyncIterator[Any], head: Optional[List[Any]] = None, chunk_size: int = 64 * 1024,
+                 **kwargs):
+        """
+        Args:
+            items (AsyncIterator[Any]): 数组元素的异步迭代器（DTO、dict 等）。
+            head (Optional[List[Any]]): 已预先取出的元素，先于 items 发送。
+            chunk_size (int): 每次发送的最小字节数。
+        """
+        envelope = GlobalResponse(code=200, sub_code=200, sub_message="success", data=[]).body
+        # 信封以 "data":[]} 结尾，拆分为开头和结尾
+        self._prefix, self._suffix = envelope[:-2], envelope[-2:]
+        self._items = items
+        self._head = head or []
+        self._chunk_size = chunk_size
+        kwargs.setdefault("media_type", "application/json")
+        super().__init__(self._encode(), **kwargs)
+
+    async def _encode(self) -> AsyncIterator[bytes]:
+        buffer = bytearray(self._prefix)
+        first = True
+
+        def append(item: Any):
+            nonlocal first
+            if not first:
+                buffer.extend(b",")
+            first = False
+            buffer.extend(to_json(item, serialize_unknown=True))
+
+        # 客户端断开时关闭迭代器，及时释放其持有的数据库连接
+        async with aclosing(self._items) as items:
+            try:
+                for item in self._head:
+                    append(item)
+                async for item in items:
+                    append(item)
+                    if len(buffer) >= self._chunk_size:
+                        yield bytes(buffer)
+                        buffer.clear()
+            except Exception:
+                logger.exception("流式响应生成失败，中断连接")
+                raise
+        buffer.extend(self._suffix)
+        yield bytes(buffer)
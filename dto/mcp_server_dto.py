@@ -17,4 +17,15 @@ class CreateMCPServerDTO(BaseModel):
     server_name: str
     command: str
     args: List[str] = Field(default_factory=list)
-    env: Optional[Dict[str, str]] = None
\ No newline at end of file
+    env: Optional[Dict[str, str]] = None
+
+class MCPServerConfigDTO(BaseModel):
+    """标准 mcpServers 格式中单个服务器的启动参数"""
+    command: str
+    args: List[str] = Field(default_factory=list)
+    env: Optional[Dict[str, str]] = None
+
+
+class MCPServersConfigDTO(BaseModel):
+    """标准 mcpServers 格式，用于批量导入导出：{"mcpServers": {"server_name": {"command": ..., "args": [...]}}}"""
+    mcpServers: Dict[str, MCPServerConfigDTO] = Field(default_factory=dict)
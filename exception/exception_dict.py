@@ -10,6 +10,7 @@ class ExceptionType(Enum):
     SERVER_UPDATE_FAILED = (7, "服务器更新失败")
     SERVER_DELETE_FAILED = (8, "服务器删除失败")
     DUPLICATE_SERVER_NAME = (9, "服务器名称已存在")
+    TOO_MANY_REQUESTS = (10, "请求过多，请稍后重试")
     # 追加自定义异常
 
 
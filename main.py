@@ -1,9 +1,16 @@
-from fastapi import FastAPI, Request
+import asyncio
+import importlib
+import os
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from core.common.compression import CompressionMiddleware
 from exception.exception import global_exception_handlers
-from controller import chat_controller, user_controller, login_controller, mcp_controller, chat_window_controller
+from core.common.container import Container
+from controller import chat_controller, user_controller, login_controller, mcp_controller, chat_window_controller, \
+    metrics_controller
 
-app = FastAPI(exception_handlers=global_exception_handlers)
+# 每个请求共享一个数据库会话（工作单元），处理函数返回前统一提交
+app = FastAPI(exception_handlers=global_exception_handlers, dependencies=[Depends(Container.unit_of_work())])
 
 # @app.middleware("http")
 # async def middleware(request: Request, call_next):
@@ -22,24 +29,55 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有头
 )
 
+# 响应压缩（JSON 列表等大响应），流式对话接口不压缩
+if os.getenv("COMPRESSION_ENABLED", "true").lower() == "true":
+    app.add_middleware(CompressionMiddleware, **CompressionMiddleware.options_from_env())
+
 app.include_router(chat_controller.router)
 app.include_router(user_controller.router)
 app.include_router(login_controller.router)
 app.include_router(mcp_controller.router)
 app.include_router(chat_window_controller.router)
+app.include_router(metrics_controller.router)
 
 # 在应用程序启动时初始化资源
 # container = Container()
 
+# 容器中延迟导入的对话相关模块
+CHAT_MODULES = ("service.chat_service", "core.llm.qwen_open_ai", "core.llm.context_builder")
+
+
+def preload_chat_modules():
+    for module_name in CHAT_MODULES:
+        importlib.import_module(module_name)
+
 # 初始化数据库表
 @app.on_event("startup")
 async def init():
     print("init app")
     # await container.init_resources()
+    # 启动会话写入队列
+    await Container.chat_persist_queue().start()
+    # 将上次退出时未完成的回复草稿标记为中断
+    await Container.chat_draft_service().mark_stale_drafts()
+    # 初始化代理状态持久化
+    await Container.agent_checkpointer().start()
+    # 监听 MCP 服务器变更通知
+    await Container.mcp_server_config_cache().start()
+    # 在线程中加载分词表（可能需要下载 BPE 文件），完成前按估算方式计数
+    app.state.tokenizer_task = asyncio.create_task(Container.token_counter().warm_up())
+    # 对话相关模块（langchain、langgraph、MCP 客户端等）延迟导入；启动后在后台线程预先导入，不阻塞启动及事件循环
+    if os.getenv("CHAT_MODULES_PRELOAD", "true").lower() == "true":
+        app.state.preload_task = asyncio.create_task(asyncio.to_thread(preload_chat_modules))
 
-# @app.on_event("shutdown")
-# async def shutdown_event():
+@app.on_event("shutdown")
+async def shutdown_event():
     # await container.shutdown_resources()
+    # 等待会话写入队列中的数据写入完成
+    await Container.chat_persist_queue().stop()
+    await Container.agent_checkpointer().stop()
+    await Container.mcp_server_config_cache().stop()
+    Container.password_hasher().stop()
 
 
 @app.get("/")
@@ -0,0 +1,34 @@
+from extensions.ext_database import Base
+from sqlalchemy import Column, JSON, TIMESTAMP, BigInteger, String, Integer, UniqueConstraint, ForeignKey
+from datetime import datetime
+
+class ChatMessage(Base):
+    __tablename__ = 'chat_message'
+    __table_args__ = (
+        # 会话内按序号唯一，同时作为按会话分页读取的索引
+        UniqueConstraint('chat_window_id', 'seq', name='uq_chat_message_window_seq'),
+    )
+
+    # 主键
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # 会话id，删除会话时由数据库级联删除其消息
+    chat_window_id = Column(BigInteger, ForeignKey('chat_window.id', ondelete='CASCADE'), nullable=False)
+    # 会话内序号，从 1 开始连续递增
+    seq = Column(Integer, nullable=False)
+    # 角色：user | assistant
+    role = Column(String(20), nullable=False)
+    # 消息内容，格式同 ContentDTO 列表
+    content = Column(JSON, nullable=False)
+    # 消息的 token 数量（历史数据迁移的消息为空）
+    token_count = Column(Integer, nullable=True)
+    # 创建时间
+    created_at = Column(TIMESTAMP(timezone=True), nullable=True, default=datetime.now)
+    # 更新时间
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=True, default=datetime.now, onupdate=datetime.now)
+
+    def model_dump(self) -> dict:
+        """序列化为与 ChatWindow.content 中单条消息相同的格式"""
+        return {
+            "role": self.role,
+            "content": self.content
+        }
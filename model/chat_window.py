@@ -1,5 +1,6 @@
 from extensions.ext_database import Base
-from sqlalchemy import Column, JSON, TIMESTAMP, BigInteger, String
+from sqlalchemy import Column, TIMESTAMP, BigInteger, String, Text, Integer, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
 class ChatWindow(Base):
@@ -8,12 +9,24 @@ class ChatWindow(Base):
     # 主键
     id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
     # 用户id
-    user_id = Column(BigInteger, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False)
     # 会话概要
     summary = Column(String(100), nullable=False)
-    # 会话内容
-    content = Column(JSON, nullable=True)
+    # 会话内容（CHAT_MESSAGE_STORAGE=json 时使用，table 模式下消息保存在 chat_message 表）
+    content = Column(JSONB, nullable=True)
+    # 消息总条数，table 模式下用于分配 chat_message 的序号
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # 早期对话的滚动摘要
+    running_summary = Column(Text, nullable=True)
+    # 已被摘要覆盖的消息条数（content 中的前 N 条）
+    summarized_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # 生成中的助手回复草稿（定期保存），本轮对话写入后清空，中断时标记为 interrupted
+    draft = Column(JSONB, nullable=True)
     # 创建时间
     created_at = Column(TIMESTAMP(timezone=True), nullable=True, default=datetime.now)
     # 更新时间
     updated_at = Column(TIMESTAMP(timezone=True), nullable=True, default=datetime.now, onupdate=datetime.now)
+
+
+# 用户会话列表按 (user_id, id DESC) 做 keyset 分页
+Index('ix_chat_window_user_id_id', ChatWindow.user_id, ChatWindow.id.desc())
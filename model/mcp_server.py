@@ -1,12 +1,16 @@
-from sqlalchemy import Column, String, JSON, TIMESTAMP, TEXT, ARRAY, BigInteger
+from sqlalchemy import Column, String, JSON, TIMESTAMP, TEXT, ARRAY, BigInteger, UniqueConstraint
 from extensions.ext_database import Base
 from datetime import datetime
 
 class McpServer(Base):
     __tablename__ = 'mcp_servers'
+    __table_args__ = (
+        # 同一用户下服务器名称唯一，同时作为按用户查询的索引
+        UniqueConstraint('user_id', 'server_name', name='uq_mcp_servers_user_id_server_name'),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True, index=True)
-    user_id = Column(BigInteger, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False)
     server_name = Column(String(100), nullable=False)
     command = Column(String(100), nullable=False)
     args = Column(ARRAY(TEXT), nullable=False)
@@ -0,0 +1,101 @@
+"""
+会话内容追加基准测试
+
+对比两种追加会话内容的方式在每轮对话中的数据库往返次数、传输字节数及耗时：
+- legacy：先读取整个会话（get_chat_window_by_id），在 Python 中追加后整体写回（update_chat_window）；
+- atomic：单条 UPDATE ... SET content = content || :new RETURNING id（append_chat_window_content）。
+
+使用 .env 中配置的数据库，需先执行 alembic upgrade head。测试会创建临时会话并在结束后删除。
+
+用法：
+    python scripts/bench_chat_window_append.py --history 200 --turns 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, event  # noqa: E402
+from extensions.ext_database import engine, async_session_factory  # noqa: E402
+from dao.chat_window_dao import ChatWindowDAO  # noqa: E402
+from model.chat_window import ChatWindow  # noqa: E402
+
+
+class WireStats:
+    """通过游标事件统计语句数（往返次数）及发送的字节数"""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.round_trips += 1
+        self.bytes_sent += len(statement.encode()) + len(json.dumps(parameters, default=str).encode())
+
+
+def make_turn(i: int) -> list:
+    return [
+        {"role": "user", "content": [{"type": "text", "text": f"第 {i} 个问题：" + "问" * 50, "image": None}]},
+        {"role": "assistant", "content": [{"type": "text", "text": f"第 {i} 个回答：" + "答" * 300, "image": None}]},
+    ]
+
+
+async def legacy_append(dao: ChatWindowDAO, chat_window_id: int, new_content: list, stats: WireStats):
+    chat_window = await dao.get_chat_window_by_id(chat_window_id)
+    # 读取的会话内容即接收的主要字节数
+    stats.bytes_received += len(json.dumps(chat_window.content, ensure_ascii=False).encode())
+    await dao.update_chat_window(chat_window_id, summary=None, content=(chat_window.content or []) + new_content)
+
+
+async def atomic_append(dao: ChatWindowDAO, chat_window_id: int, new_content: list, stats: WireStats):
+    await dao.append_chat_window_content(chat_window_id, new_content)
+    # 仅返回会话ID
+    stats.bytes_received += 8
+
+
+async def run(mode: str, history: int, turns: int) -> dict:
+    dao = ChatWindowDAO(async_session_factory)
+    seed = [m for i in range(history) for m in make_turn(i)]
+    chat_window = await dao.create_chat_window(user_id=0, summary=f"bench-{mode}", content=seed)
+
+    stats = WireStats()
+    event.listen(engine.sync_engine, "before_cursor_execute", stats.before_cursor_execute)
+    append = legacy_append if mode == "legacy" else atomic_append
+    start = time.perf_counter()
+    try:
+        for i in range(turns):
+            await append(dao, chat_window.id, make_turn(history + i), stats)
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(engine.sync_engine, "before_cursor_execute", stats.before_cursor_execute)
+        async with async_session_factory() as session:
+            await session.execute(delete(ChatWindow).where(ChatWindow.id == chat_window.id))
+            await session.commit()
+
+    return {
+        "mode": mode,
+        "round_trips_per_turn": stats.round_trips / turns,
+        "bytes_sent_per_turn": stats.bytes_sent // turns,
+        "bytes_received_per_turn": stats.bytes_received // turns,
+        "ms_per_turn": round(elapsed * 1000 / turns, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="会话内容追加基准测试")
+    parser.add_argument("--history", type=int, default=200, help="会话中已有的轮数")
+    parser.add_argument("--turns", type=int, default=20, help="追加的轮数")
+    args = parser.parse_args()
+
+    for mode in ("legacy", "atomic"):
+        print(json.dumps(await run(mode, args.history, args.turns), ensure_ascii=False))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
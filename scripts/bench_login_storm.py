@@ -0,0 +1,106 @@
+"""
+登录风暴下的流式对话延迟基准测试
+
+同一事件循环中同时运行：
+- 若干条模拟的流式对话，每隔 --token-interval 毫秒推送一个 token，记录相邻 token 的实际间隔；
+- 持续的并发登录，每次登录校验一次 bcrypt 密码。
+
+对比两种密码校验方式下的登录吞吐及 token 间隔（p50 / p99 / max）：
+- inline：在事件循环中直接调用 passlib 校验（原实现）；
+- pool：通过 PasswordHasher 在有界线程池中校验。
+
+不需要数据库，密码哈希在启动时生成。
+
+用法：
+    python scripts/bench_login_storm.py --seconds 5 --logins 16 --streams 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.context import CryptContext  # noqa: E402
+from core.common.password_hasher import PasswordHasher, PasswordHasherBusyError  # noqa: E402
+
+PASSWORD = "efflux-bench-password"
+
+
+async def stream(interval: float, deadline: float, gaps: list):
+    """模拟流式对话：按固定间隔推送 token，记录实际间隔"""
+    last = time.perf_counter()
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def login_worker(verify, hashed: str, deadline: float, counters: dict):
+    while time.perf_counter() < deadline:
+        try:
+            await verify(PASSWORD, hashed)
+            counters["logins"] += 1
+        except PasswordHasherBusyError:
+            counters["rejected"] += 1
+            await asyncio.sleep(0.01)
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def run(mode: str, args, hashed: str) -> dict:
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    hasher = PasswordHasher(max_workers=args.workers, max_pending=args.max_pending)
+
+    async def inline_verify(plain, hashed_password):
+        return context.verify(plain, hashed_password)
+
+    verify = {"inline": inline_verify, "pool": hasher.verify, "idle": None}[mode]
+    interval = args.token_interval / 1000
+    deadline = time.perf_counter() + args.seconds
+    gaps = []
+    counters = {"logins": 0, "rejected": 0}
+
+    tasks = [asyncio.create_task(stream(interval, deadline, gaps)) for _ in range(args.streams)]
+    if verify is not None:
+        tasks += [asyncio.create_task(login_worker(verify, hashed, deadline, counters)) for _ in range(args.logins)]
+    await asyncio.gather(*tasks)
+    hasher.stop()
+
+    gaps_ms = [gap * 1000 for gap in gaps]
+    return {
+        "mode": mode,
+        "logins_per_second": round(counters["logins"] / args.seconds, 1),
+        "rejected": counters["rejected"],
+        "token_gap_ms": {
+            "p50": round(statistics.median(gaps_ms), 2),
+            "p99": round(percentile(gaps_ms, 0.99), 2),
+            "max": round(max(gaps_ms), 2),
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="登录风暴下的流式对话延迟基准测试")
+    parser.add_argument("--seconds", type=float, default=5, help="每种方式的运行秒数")
+    parser.add_argument("--logins", type=int, default=16, help="并发登录数")
+    parser.add_argument("--streams", type=int, default=20, help="并发流式对话数")
+    parser.add_argument("--token-interval", type=float, default=20, help="token 推送间隔（毫秒）")
+    parser.add_argument("--workers", type=int, default=2, help="密码哈希线程数")
+    parser.add_argument("--max-pending", type=int, default=64, help="密码哈希最大排队数")
+    args = parser.parse_args()
+
+    hashed = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(PASSWORD)
+    for mode in ("idle", "inline", "pool"):
+        print(json.dumps(await run(mode, args, hashed), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""
+响应压缩基准测试
+
+在进程内构建与各接口相同格式的响应，经 CompressionMiddleware 返回，统计每个接口在不同编码下的
+传输字节数及每个请求的 CPU 耗时（与不压缩相比的增量即为压缩开销）：
+- chat_window_list：流式返回的会话列表（含对话记录）；
+- mcp_server_list：流式返回的 MCP 服务器列表；
+- chat_window_page：一次性返回的分页会话列表（不含对话记录）；
+- stream_agent：逐 token 推送的流式对话，中间件原样透传；另给出逐块 flush 压缩时的字节数作为对比。
+
+不需要数据库及模型，数据在内存中生成；安装 brotli 包后同时测试 br。
+
+用法：
+    python scripts/bench_response_compression.py --windows 200 --messages 20 --rounds 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from core.common.compression import CompressionMiddleware  # noqa: E402
+from dto.chat_window_dto import ChatWindowDTO, ChatWindowSummaryDTO, ChatWindowPageDTO  # noqa: E402
+from dto.mcp_server_dto import MCPServerDTO  # noqa: E402
+from utils import result_utils  # noqa: E402
+
+
+def make_app(args) -> FastAPI:
+    now = datetime.now(timezone.utc)
+    chat_windows = [
+        ChatWindowDTO(
+            id=i,
+            user_id=1,
+            summary=f"会话 {i}",
+            chat_messages=[
+                {"role": "user" if j % 2 == 0 else "assistant",
+                 "content": [{"type": "text", "text": f"第 {j} 条消息：请帮我查询北京明天的天气，并给出出行建议。"}]}
+                for j in range(args.messages)
+            ],
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(args.windows)
+    ]
+    servers = [
+        MCPServerDTO(id=i, user_id=1, server_name=f"server-{i}", command="npx",
+                     args=["-y", f"@modelcontextprotocol/server-{i}"], env={"API_KEY": "xxxxxxxx"})
+        for i in range(args.servers)
+    ]
+    page = ChatWindowPageDTO(
+        items=[ChatWindowSummaryDTO(id=i, summary=f"会话 {i}", created_at=now, updated_at=now) for i in range(100)],
+        next_before=None,
+    )
+    tokens = [json.dumps({"content": token, "type": "text"}) + "\n" for token in ["北京", "明天", "晴", "，"] * args.tokens]
+
+    async def iterate(items):
+        for item in items:
+            yield item
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **CompressionMiddleware.options_from_env())
+
+    @app.get("/chat_window/chat_window_list/1")
+    async def chat_window_list():
+        return await result_utils.build_stream_response(iterate(chat_windows))
+
+    @app.get("/mcp/mcp_server_list/1")
+    async def mcp_server_list():
+        return await result_utils.build_stream_response(iterate(servers))
+
+    @app.get("/chat_window/chat_window_page/1")
+    async def chat_window_page():
+        return result_utils.build_response(page)
+
+    @app.post("/chat/stream_agent")
+    async def stream_agent():
+        return StreamingResponse(iterate(tokens), media_type="text/event-stream")
+
+    app.state.tokens = tokens
+    return app
+
+
+def measure(client: TestClient, method: str, path: str, encoding: str, rounds: int) -> dict:
+    headers = {"Accept-Encoding": encoding}
+    # 预热
+    client.request(method, path, headers=headers)
+    wire = 0
+    start = time.process_time()
+    for _ in range(rounds):
+        response = client.request(method, path, headers=headers)
+        wire = response.num_bytes_downloaded
+    cpu = time.process_time() - start
+    return {
+        "accept_encoding": encoding,
+        "encoding": response.headers.get("content-encoding", "identity"),
+        "bytes": wire,
+        "cpu_ms": round(cpu * 1000 / rounds, 3),
+    }
+
+
+def flushed_per_chunk(tokens) -> int:
+    """逐块 Z_SYNC_FLUSH 的 gzip 字节数（不透传而是逐块压缩时的传输量）"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    size = 0
+    for token in tokens:
+        size += len(compressor.compress(token.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH))
+    return size + len(compressor.flush())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应压缩基准测试")
+    parser.add_argument("--windows", type=int, default=200, help="会话数量")
+    parser.add_argument("--messages", type=int, default=20, help="每个会话的消息数")
+    parser.add_argument("--servers", type=int, default=50, help="MCP 服务器数量")
+    parser.add_argument("--tokens", type=int, default=250, help="流式对话的 token 数（x4）")
+    parser.add_argument("--rounds", type=int, default=20, help="每种编码的请求次数")
+    args = parser.parse_args()
+
+    app = make_app(args)
+    client = TestClient(app)
+    encodings = ["identity", "gzip"]
+    if CompressionMiddleware(app).brotli is not None:
+        encodings.append("br")
+
+    endpoints = [
+        ("GET", "/chat_window/chat_window_list/1"),
+        ("GET", "/mcp/mcp_server_list/1"),
+        ("GET", "/chat_window/chat_window_page/1"),
+        ("POST", "/chat/stream_agent"),
+    ]
+    for method, path in endpoints:
+        results = [measure(client, method, path, encoding, args.rounds) for encoding in encodings]
+        baseline = results[0]
+        for result in results:
+            result["ratio"] = round(result["bytes"] / baseline["bytes"], 4) if baseline["bytes"] else None
+            result["cpu_ms_overhead"] = round(result["cpu_ms"] - baseline["cpu_ms"], 3)
+        line = {"endpoint": path, "results": results}
+        if path == "/chat/stream_agent":
+            line["gzip_flush_per_chunk_bytes"] = flushed_per_chunk(app.state.tokens)
+        print(json.dumps(line, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
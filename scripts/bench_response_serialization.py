@@ -0,0 +1,117 @@
+"""
+接口响应序列化基准测试
+
+以 /chat_window/chat_window_list 的返回数据为例，对比不同会话数量下两种序列化方式的耗时及内存分配：
+- legacy：DTO 手写 model_dump 转为字典，DateTimeEncoder 编码后 json.loads 还原，再由 JSONResponse 编码；
+- fast：GlobalResponse 通过 pydantic_core 一次序列化为 bytes。
+
+不需要数据库，会话数据在内存中生成。
+
+用法：
+    python scripts/bench_response_serialization.py --sizes 10 100 1000 --messages 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from dto.chat_window_dto import ChatWindowDTO  # noqa: E402
+from utils import result_utils  # noqa: E402
+
+
+class DateTimeEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def legacy_dump(chat_window: ChatWindowDTO) -> dict:
+    """原 DTO 中手写的 model_dump"""
+    return {
+        "id": chat_window.id,
+        "user_id": chat_window.user_id,
+        "summary": chat_window.summary,
+        "chat_messages": [
+            {
+                "role": m.role,
+                "content": [{"type": c.type, "text": c.text, "image": c.image} for c in m.content]
+            }
+            for m in chat_window.chat_messages
+        ],
+        "draft": chat_window.draft,
+        "created_at": chat_window.created_at.isoformat() if chat_window.created_at else None,
+        "updated_at": chat_window.updated_at.isoformat() if chat_window.updated_at else None
+    }
+
+
+def legacy_render(chat_windows) -> bytes:
+    data = [legacy_dump(chat_window) for chat_window in chat_windows]
+    content = {"code": 200, "message": "success", "sub_code": 200, "sub_message": "success", "data": data}
+    content = json.loads(DateTimeEncoder().encode(content))
+    return JSONResponse(content=content).body
+
+
+def fast_render(chat_windows) -> bytes:
+    return result_utils.build_response(chat_windows).body
+
+
+def make_chat_windows(size: int, messages: int):
+    now = datetime.now(timezone.utc)
+    return [
+        ChatWindowDTO(
+            id=i,
+            user_id=1,
+            summary=f"会话 {i}",
+            chat_messages=[
+                {"role": "user" if j % 2 == 0 else "assistant",
+                 "content": [{"type": "text", "text": f"第 {j} 条消息：" + "内容" * 100}]}
+                for j in range(messages)
+            ],
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(size)
+    ]
+
+
+def measure(render, chat_windows, rounds: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        body = render(chat_windows)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    render(chat_windows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": round(elapsed * 1000 / rounds, 3), "peak_kb": peak // 1024, "bytes": len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口响应序列化基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="会话数量")
+    parser.add_argument("--messages", type=int, default=20, help="每个会话的消息数")
+    parser.add_argument("--rounds", type=int, default=5, help="每种方式重复次数")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        chat_windows = make_chat_windows(size, args.messages)
+        legacy = measure(legacy_render, chat_windows, args.rounds)
+        fast = measure(fast_render, chat_windows, args.rounds)
+        print(json.dumps({
+            "chat_windows": size,
+            "legacy": legacy,
+            "fast": fast,
+            "speedup": round(legacy["ms"] / fast["ms"], 2) if fast["ms"] else None,
+        }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+每请求连接取用次数基准测试
+
+模拟一轮对话在调用模型前后的数据库操作（创建会话、读取 MCP 配置、加载会话及最近消息、追加本轮消息），
+对比两种会话使用方式下每个请求的连接取用次数、语句数及耗时：
+- per_call：每个 DAO 方法各自打开会话并提交；
+- unit_of_work：同一请求内的 DAO 调用共享一个会话，结束时统一提交。
+
+使用 .env 中配置的数据库，需先执行 alembic upgrade head。测试会创建临时会话并在结束后删除。
+
+用法：
+    python scripts/bench_session_checkouts.py --requests 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, event  # noqa: E402
+from extensions.ext_database import engine, async_session_factory  # noqa: E402
+from dao.base_dao import UnitOfWork  # noqa: E402
+from dao.chat_window_dao import ChatWindowDAO  # noqa: E402
+from dao.chat_message_dao import ChatMessageDAO  # noqa: E402
+from dao.mcp_server_dao import MCPServerDAO  # noqa: E402
+from model.chat_window import ChatWindow  # noqa: E402
+from model.chat_message import ChatMessage  # noqa: E402
+
+BENCH_USER_ID = 0
+
+
+async def chat_turn(chat_window_dao: ChatWindowDAO, chat_message_dao: ChatMessageDAO,
+                    mcp_server_dao: MCPServerDAO, i: int) -> int:
+    chat_window = await chat_window_dao.create_chat_window(user_id=BENCH_USER_ID, summary=f"bench-{i}")
+    await mcp_server_dao.get_servers_by_user_id(BENCH_USER_ID)
+    await chat_window_dao.get_chat_window_by_id(chat_window.id)
+    await chat_message_dao.get_recent_messages(chat_window.id, 20)
+    await chat_message_dao.append_messages(chat_window.id, [
+        {"role": "user", "content": [{"type": "text", "text": f"第 {i} 个问题", "image": None}]},
+        {"role": "assistant", "content": [{"type": "text", "text": f"第 {i} 个回答", "image": None}]},
+    ])
+    return chat_window.id
+
+
+async def run(mode: str, requests: int) -> dict:
+    chat_window_dao = ChatWindowDAO(async_session_factory)
+    chat_message_dao = ChatMessageDAO(async_session_factory)
+    mcp_server_dao = MCPServerDAO(async_session_factory)
+
+    statements = 0
+
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    checkouts_before = engine.pool.stats()["checkouts"]
+    chat_window_ids = []
+    start = time.perf_counter()
+    try:
+        for i in range(requests):
+            if mode == "unit_of_work":
+                async with UnitOfWork.begin(async_session_factory):
+                    chat_window_ids.append(await chat_turn(chat_window_dao, chat_message_dao, mcp_server_dao, i))
+            else:
+                chat_window_ids.append(await chat_turn(chat_window_dao, chat_message_dao, mcp_server_dao, i))
+    finally:
+        elapsed = time.perf_counter() - start
+        checkouts = engine.pool.stats()["checkouts"] - checkouts_before
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+        async with async_session_factory() as session:
+            await session.execute(delete(ChatMessage).where(ChatMessage.chat_window_id.in_(chat_window_ids)))
+            await session.execute(delete(ChatWindow).where(ChatWindow.id.in_(chat_window_ids)))
+            await session.commit()
+
+    return {
+        "mode": mode,
+        "checkouts_per_request": checkouts / requests,
+        "statements_per_request": statements / requests,
+        "ms_per_request": round(elapsed * 1000 / requests, 2),
+        "pool": engine.pool.stats(),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="每请求连接取用次数基准测试")
+    parser.add_argument("--requests", type=int, default=50, help="模拟的请求数")
+    args = parser.parse_args()
+
+    for mode in ("per_call", "unit_of_work"):
+        print(json.dumps(await run(mode, args.requests), ensure_ascii=False))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
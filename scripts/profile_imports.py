@@ -0,0 +1,106 @@
+"""
+应用冷启动导入耗时分析及启动预算检查
+
+在新的 Python 进程中以 -X importtime 导入应用模块（默认 main），汇总：
+- 冷启动导入总耗时（多次运行取最小值，减少系统抖动的影响）；
+- 累计耗时（含子模块）及自身耗时最高的模块；
+- 不应在导入时加载的模块（默认 langchain、langgraph、openai、mcp 等，由容器延迟导入）是否被加载。
+
+指定 --budget-ms 时作为启动预算检查：总耗时超出预算或加载了不应加载的模块时以非零状态码退出。
+tests/test_startup_budget.py 在测试中执行同样的检查（预算由 STARTUP_IMPORT_BUDGET_MS 指定）。
+
+用法：
+    python scripts/profile_imports.py --top 20
+    python scripts/profile_imports.py --runs 3 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 由容器延迟导入，不应在导入应用时加载的顶层包
+DEFAULT_FORBIDDEN = ("langchain", "langchain_core", "langchain_openai", "langgraph", "openai", "mcp",
+                     "jsonschema_pydantic")
+
+
+def profile(module: str) -> List[Tuple[str, int, int]]:
+    """
+    在新进程中导入模块，解析 -X importtime 的输出
+
+    Returns:
+        List[Tuple[str, int, int]]: (模块名, 自身耗时微秒, 累计耗时微秒) 列表，按导入完成顺序排列。
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.getenv("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：\n{result.stderr[-2000:]}")
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        records.append((name.strip(), int(self_us), int(cumulative_us)))
+    return records
+
+
+def summarize(records: List[Tuple[str, int, int]], module: str, top: int) -> Dict:
+    total_us = next((cumulative for name, _, cumulative in records if name == module), 0)
+    by_cumulative = sorted(records, key=lambda record: record[2], reverse=True)[:top]
+    by_self = sorted(records, key=lambda record: record[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "modules": len(records),
+        "top_cumulative": [{"module": name, "ms": round(cumulative / 1000, 1)} for name, _, cumulative in by_cumulative],
+        "top_self": [{"module": name, "ms": round(self_us / 1000, 1)} for name, self_us, _ in by_self],
+    }
+
+
+def check(module: str, runs: int, top: int, budget_ms: Optional[float], forbid: Sequence[str]) -> Tuple[Dict, List[str]]:
+    """
+    多次冷启动导入模块，按总耗时最小的一次生成报告并检查启动预算
+
+    Returns:
+        Tuple[Dict, List[str]]: 报告，及未通过的检查项（为空表示通过）。
+    """
+    results = [profile(module) for _ in range(runs)]
+    best = min(results, key=lambda records: summarize(records, module, 0)["total_ms"])
+    report = summarize(best, module, top)
+
+    loaded = {name.split(".")[0] for name, _, _ in best}
+    report["forbidden_loaded"] = sorted(loaded & set(forbid))
+    failures = []
+    if report["forbidden_loaded"]:
+        failures.append(f"导入时加载了应延迟导入的包：{', '.join(report['forbidden_loaded'])}")
+    if budget_ms is not None:
+        report["budget_ms"] = budget_ms
+        if report["total_ms"] > budget_ms:
+            failures.append(f"冷启动导入耗时 {report['total_ms']}ms 超出预算 {budget_ms}ms")
+    report["ok"] = not failures
+    return report, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用冷启动导入耗时分析及启动预算检查")
+    parser.add_argument("--module", default="main", help="导入的模块")
+    parser.add_argument("--runs", type=int, default=3, help="运行次数，取总耗时最小的一次")
+    parser.add_argument("--top", type=int, default=15, help="列出的模块数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="冷启动导入的预算（毫秒），超出时以非零状态码退出")
+    parser.add_argument("--forbid", nargs="*", default=list(DEFAULT_FORBIDDEN),
+                        help="导入应用时不应加载的顶层包，传入空列表时不检查")
+    args = parser.parse_args()
+
+    report, failures = check(args.module, args.runs, args.top, args.budget_ms, args.forbid)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import configparser
+import os
+import time
+from typing import Optional
+import jwt
+from dotenv import load_dotenv
+from core.common.ttl_cache import TTLCache
+from dao.user_dao import UserDAO
+from dto.user_dto import UserResult
+from exception.exception import BaseAPIException
+from exception.exception_dict import ExceptionType
+
+# 加载环境变量
+load_dotenv()
+
+
+class AuthService:
+    """
+    令牌认证
+
+    校验 Bearer 令牌并返回当前用户。解码后的令牌（令牌 -> 用户名，不超过令牌的过期时间）及用户记录
+    （用户名 -> 用户信息）分别缓存在进程内的 TTL LRU 缓存中，命中时不解码、不查询数据库。
+
+    用户变更时由 UserService 调用 invalidate_user 删除本进程的缓存；其他 worker 的缓存在 user_ttl 内过期。
+    """
+
+    def __init__(self, user_dao: UserDAO, secret_key: str, algorithm: str, enabled: bool = True,
+                 token_ttl: float = 300, user_ttl: float = 60, max_size: int = 10000):
+        """
+        初始化认证服务
+
+        Args:
+            user_dao (UserDAO): 用户DAO。
+            secret_key (str): JWT 签名密钥。
+            algorithm (str): JWT 签名算法。
+            enabled (bool): 是否启用认证，关闭时不校验令牌（仅用于本地开发）。
+            token_ttl (float): 解码后的令牌的最长缓存秒数。
+            user_ttl (float): 用户记录的缓存秒数。
+            max_size (int): 每个缓存的最大项数。
+        """
+        self.user_dao = user_dao
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.enabled = enabled
+        self._tokens = TTLCache(max_size=max_size, ttl=token_ttl)
+        self._users = TTLCache(max_size=max_size, ttl=user_ttl)
+        # 用户缓存的失效次数，查询期间发生失效时不写入查询结果，避免旧数据覆盖
+        self._user_generation = 0
+
+    @classmethod
+    def from_config(cls, user_dao: UserDAO, config_file: str = "config.ini") -> "AuthService":
+        """签名密钥及算法读取 config.ini 的 SECURITY 配置（与登录签发令牌一致），缓存参数读取环境变量"""
+        config = configparser.ConfigParser()
+        config.read(config_file)
+        return cls(
+            user_dao=user_dao,
+            secret_key=config['SECURITY']['SECRET_KEY'].strip('"'),
+            algorithm=config['SECURITY']['ALGORITHM'].strip('"'),
+            enabled=os.getenv("AUTH_ENABLED", "true").lower() == "true",
+            token_ttl=float(os.getenv("AUTH_TOKEN_CACHE_TTL", 300)),
+            user_ttl=float(os.getenv("AUTH_USER_CACHE_TTL", 60)),
+            max_size=int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000)),
+        )
+
+    def decode_token(self, token: str) -> Optional[str]:
+        """
+        解码令牌，返回用户名
+
+        Args:
+            token (str): JWT 令牌。
+
+        Returns:
+            Optional[str]: 用户名，令牌无效或已过期时返回 None。
+        """
+        username = self._tokens.get(token)
+        if username is not None:
+            return username
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.InvalidTokenError:
+            return None
+        username = payload.get("sub")
+        if username is None:
+            return None
+        # 缓存时间不超过令牌的剩余有效期
+        exp = payload.get("exp")
+        self._tokens.put(token, username, ttl=exp - time.time() if exp is not None else None)
+        return username
+
+    async def get_user(self, username: str) -> Optional[UserResult]:
+        """
+        根据用户名获取用户，优先读取缓存
+
+        Args:
+            username (str): 用户名。
+
+        Returns:
+            Optional[UserResult]: 用户信息，用户不存在时返回 None（不缓存）。
+        """
+        user = self._users.get(username)
+        if user is not None:
+            return user
+        generation = self._user_generation
+        model = await self.user_dao.get_user_by_name(username)
+        if model is None:
+            return None
+        user = UserResult(id=model.id, name=model.name, email=model.email)
+        if generation == self._user_generation:
+            self._users.put(username, user)
+        return user
+
+    async def authenticate(self, token: Optional[str]) -> UserResult:
+        """
+        校验令牌并返回当前用户
+
+        Args:
+            token (Optional[str]): Bearer 令牌。
+
+        Returns:
+            UserResult: 当前用户。
+
+        Raises:
+            BaseAPIException: 缺少令牌、令牌无效或用户不存在时抛出。
+        """
+        username = self.decode_token(token) if token else None
+        user = await self.get_user(username) if username else None
+        if user is None:
+            raise BaseAPIException(
+                status_code=ExceptionType.AUTHENTICATION_FAILED.code,
+                detail=ExceptionType.AUTHENTICATION_FAILED.message
+            )
+        return user
+
+    def invalidate_user(self, username: str):
+        """用户信息变更或删除后删除缓存"""
+        self._user_generation += 1
+        self._users.pop(username)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "tokens": self._tokens.stats(),
+            "users": self._users.stats(),
+        }
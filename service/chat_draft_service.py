@@ -0,0 +1,161 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+from core.llm.llm_message import LLMMessage
+from core.llm.token_counter import TokenCounter
+from dao.chat_window_dao import ChatWindowDAO
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+class DraftCheckpoint:
+    """
+    单轮对话的回复草稿
+
+    在内存中累积模型回复及工具调用结果，每生成 N 个 token 或间隔 T 秒才保存一次草稿，
+    同一时刻最多只有一次保存在进行中，不会产生逐 token 的数据库写入。
+    """
+
+    def __init__(self, service: "ChatDraftService", chat_window_id: int, query: str):
+        self.service = service
+        self.chat_window_id = chat_window_id
+        self.query = query
+        self.reply: List[str] = []
+        self.tool_calls: List[str] = []
+        self.tool_results: List[dict] = []
+        self._tokens_since_save = 0
+        self._last_save = time.monotonic()
+        self._saving: Optional[asyncio.Task] = None
+        self._closed = False
+        # 是否保存过草稿
+        self.saved = False
+
+    def add(self, chunk: LLMMessage):
+        """
+        记录模型返回的一个消息块，达到保存阈值时在后台保存草稿
+
+        Args:
+            chunk (LLMMessage): 模型返回的消息块。
+        """
+        if self._closed:
+            return
+        if chunk.type == "message":
+            self.reply.append(chunk.content)
+            self._tokens_since_save += self.service.token_counter.count_text(chunk.content)
+        elif chunk.type == "tool_call":
+            self.tool_calls.append(chunk.content)
+        elif chunk.type == "tool_result":
+            self.tool_results.append(json.loads(chunk.content))
+            # 工具结果获取成本高，收到后尽快保存
+            self._tokens_since_save = self.service.checkpoint_tokens
+        else:
+            return
+
+        due = (self._tokens_since_save >= self.service.checkpoint_tokens
+               or time.monotonic() - self._last_save >= self.service.checkpoint_seconds)
+        if due and (self._saving is None or self._saving.done()):
+            self._tokens_since_save = 0
+            self._last_save = time.monotonic()
+            self._saving = asyncio.create_task(self.service.save(self.chat_window_id, self.snapshot("streaming")))
+            self.saved = True
+
+    def snapshot(self, status: str) -> dict:
+        return {
+            "status": status,
+            "query": self.query,
+            "reply": "".join(self.reply),
+            "tool_calls": "".join(self.tool_calls),
+            "tool_results": list(self.tool_results),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    async def close(self):
+        """结束保存草稿并等待进行中的保存完成，之后由本轮对话的写入清空草稿"""
+        self._closed = True
+        if self._saving is not None:
+            await asyncio.gather(self._saving, return_exceptions=True)
+
+    def interrupt(self):
+        """回复被中断（如客户端断开）时，在后台将当前草稿标记为 interrupted"""
+        if self._closed:
+            return
+        self._closed = True
+        saving = self._saving
+        snapshot = self.snapshot("interrupted")
+
+        async def save_after_pending():
+            if saving is not None:
+                await asyncio.gather(saving, return_exceptions=True)
+            await self.service.save(self.chat_window_id, snapshot)
+
+        self.service.run_in_background(save_after_pending())
+
+
+class ChatDraftService:
+    """
+    回复草稿服务
+
+    流式回复过程中定期把已生成的内容保存到 ChatWindow.draft，进程崩溃或发布重启时不会丢失整轮回复。
+    本轮对话写入时草稿随之清空；中断的回复标记为 interrupted；启动时将长时间未更新的 streaming 草稿
+    （所属进程已退出）标记为 interrupted。
+    """
+
+    def __init__(self, chat_window_dao: ChatWindowDAO, token_counter: TokenCounter):
+        """
+        初始化回复草稿服务
+
+        Args:
+            chat_window_dao (ChatWindowDAO): 会话记录DAO。
+            token_counter (TokenCounter): token 计数器。
+        """
+        self.chat_window_dao = chat_window_dao
+        self.token_counter = token_counter
+        self.enabled = os.getenv("DRAFT_CHECKPOINT_ENABLED", "true").lower() == "true"
+        self.checkpoint_tokens = int(os.getenv("DRAFT_CHECKPOINT_TOKENS", 200))
+        self.checkpoint_seconds = float(os.getenv("DRAFT_CHECKPOINT_SECONDS", 5))
+        self.stale_seconds = int(os.getenv("DRAFT_STALE_SECONDS", 120))
+        self._tasks: Set[asyncio.Task] = set()
+
+    def begin(self, chat_window_id: int, query: str) -> Optional[DraftCheckpoint]:
+        """
+        开始记录一轮对话的回复草稿
+
+        Args:
+            chat_window_id (int): 会话ID。
+            query (str): 用户问题。
+
+        Returns:
+            Optional[DraftCheckpoint]: 草稿，未启用时返回 None。
+        """
+        return DraftCheckpoint(self, chat_window_id, query) if self.enabled else None
+
+    async def save(self, chat_window_id: int, draft: dict):
+        try:
+            await self.chat_window_dao.update_draft(chat_window_id, draft)
+        except Exception as e:
+            # 草稿仅用于恢复，保存失败不影响本轮对话
+            logger.warning(f"会话 {chat_window_id} 草稿保存失败: {e}")
+
+    def run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def mark_stale_drafts(self):
+        """将所属进程已退出（长时间未更新）的 streaming 草稿标记为 interrupted"""
+        if not self.enabled:
+            return
+        try:
+            count = await self.chat_window_dao.mark_stale_drafts_interrupted(self.stale_seconds)
+            if count:
+                logger.info(f"已将 {count} 个未完成的回复草稿标记为 interrupted")
+        except Exception as e:
+            logger.warning(f"标记未完成的回复草稿失败: {e}")
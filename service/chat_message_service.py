@@ -0,0 +1,141 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from core.llm.token_counter import TokenCounter
+from dao.chat_message_dao import ChatMessageDAO
+from dao.chat_window_dao import ChatWindowDAO
+from dto.chat_window_dto import ContentDTO, ChatMessageDTO
+from model.chat_window import ChatWindow
+
+# 加载环境变量
+load_dotenv()
+
+
+class ChatMessageService:
+    """
+    会话消息存储服务
+
+    CHAT_MESSAGE_STORAGE=table（默认）时消息逐条追加到 chat_message 表，每轮只插入新消息；
+    =json 时追加到 ChatWindow.content 的 JSONB 数组。读取方法对两种存储返回相同格式的消息字典。
+    """
+
+    def __init__(self, chat_window_dao: ChatWindowDAO, chat_message_dao: ChatMessageDAO,
+                 token_counter: TokenCounter):
+        """
+        初始化会话消息存储服务
+
+        Args:
+            chat_window_dao (ChatWindowDAO): 会话记录DAO。
+            chat_message_dao (ChatMessageDAO): 会话消息DAO。
+            token_counter (TokenCounter): token 计数器，用于记录每条消息的 token 数量。
+        """
+        self.chat_window_dao = chat_window_dao
+        self.chat_message_dao = chat_message_dao
+        self.token_counter = token_counter
+        self.storage = os.getenv("CHAT_MESSAGE_STORAGE", "table")
+
+    @property
+    def use_table(self) -> bool:
+        return self.storage == "table"
+
+    async def append_turn(self, chat_window_id: int, query: str, reply: Optional[str] = None):
+        """
+        追加一轮对话（用户问题及助手回复）
+
+        Args:
+            chat_window_id (int): 会话ID。
+            query (str): 用户问题。
+            reply (Optional[str]): 助手回复。
+        """
+        new_content = self.build_turn(query, reply)
+        if self.use_table:
+            await self.chat_message_dao.append_messages(chat_window_id, new_content)
+        else:
+            # json 存储：在数据库端原子追加到 content 数组
+            await self.chat_window_dao.append_chat_window_content(chat_window_id, new_content)
+
+    async def append_turns(self, turns: List[Tuple[int, str, Optional[str]]]):
+        """
+        批量追加多个会话的多轮对话，整批只执行一次批量写入
+
+        Args:
+            turns (List[Tuple[int, str, Optional[str]]]): (会话ID, 用户问题, 助手回复) 列表，同一会话按顺序追加。
+        """
+        content_by_window: Dict[int, List[dict]] = {}
+        for chat_window_id, query, reply in turns:
+            content_by_window.setdefault(chat_window_id, []).extend(self.build_turn(query, reply))
+        if self.use_table:
+            await self.chat_message_dao.append_messages_batch(content_by_window)
+        else:
+            await self.chat_window_dao.append_chat_window_content_batch(content_by_window)
+
+    def build_turn(self, query: str, reply: Optional[str]) -> List[dict]:
+        """构建一轮对话的两条消息，table 存储时附带 token 数量"""
+        new_content = [
+            ChatMessageDTO(role="user", content=[ContentDTO(type="text", text=query)]).model_dump(),
+            ChatMessageDTO(role="assistant", content=[ContentDTO(type="text", text=reply)]).model_dump()
+        ]
+        if self.use_table:
+            for message, text in zip(new_content, (query, reply)):
+                message["token_count"] = self.token_counter.count(text)
+        return new_content
+
+    def message_count(self, chat_window: ChatWindow) -> int:
+        """会话中的消息总条数"""
+        return chat_window.message_count if self.use_table else len(chat_window.content or [])
+
+    async def get_messages(self, chat_window: ChatWindow, after_seq: int = 0) -> List[dict]:
+        """
+        获取会话中第 after_seq 条之后的全部消息
+
+        Args:
+            chat_window (ChatWindow): 会话。
+            after_seq (int): 跳过的消息条数。
+
+        Returns:
+            List[dict]: 消息列表，每项包含 role、content。
+        """
+        if self.use_table:
+            return [m.model_dump() for m in await self.chat_message_dao.get_messages(chat_window.id, after_seq)]
+        return (chat_window.content or [])[after_seq:]
+
+    async def get_recent_messages(self, chat_window: ChatWindow, limit: int) -> List[dict]:
+        """获取会话最近的 limit 条消息，按时间正序"""
+        if self.use_table:
+            return [m.model_dump() for m in await self.chat_message_dao.get_recent_messages(chat_window.id, limit)]
+        return (chat_window.content or [])[-limit:]
+
+    async def get_message_page(self, chat_window: ChatWindow, before: Optional[int] = None,
+                               since: Optional[int] = None, limit: int = 50) -> List[Tuple[int, dict]]:
+        """
+        按序号游标分页获取会话消息，序号从 1 开始
+
+        Args:
+            chat_window (ChatWindow): 会话。
+            before (Optional[int]): 返回序号小于该值的最近 limit 条，为空时返回最新的 limit 条。
+            since (Optional[int]): 增量模式，返回序号大于该值的最早 limit 条。
+            limit (int): 最大条数。
+
+        Returns:
+            List[Tuple[int, dict]]: (序号, 消息) 列表，按序号正序。
+        """
+        if self.use_table:
+            messages = await self.chat_message_dao.get_message_page(chat_window.id, before, since, limit)
+            return [(m.seq, m.model_dump()) for m in messages]
+
+        # json 存储：在内存中切片，序号即数组下标加 1
+        content = chat_window.content or []
+        if since is not None:
+            start = max(since, 0)
+            end = start + limit
+        else:
+            end = len(content) if before is None else min(max(before - 1, 0), len(content))
+            start = max(end - limit, 0)
+        return [(start + i + 1, message) for i, message in enumerate(content[start:end])]
+
+    async def get_messages_by_windows(self, chat_windows: List[ChatWindow]) -> Dict[int, List[dict]]:
+        """获取多个会话的全部消息，按会话ID分组"""
+        if self.use_table:
+            grouped = await self.chat_message_dao.get_messages_by_window_ids([w.id for w in chat_windows])
+            return {chat_window_id: [m.model_dump() for m in messages] for chat_window_id, messages in grouped.items()}
+        return {w.id: w.content or [] for w in chat_windows}
@@ -0,0 +1,418 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import exc
+from core.common.logger import get_logger
+from core.history.history_store import HistoryStore
+from service.chat_message_service import ChatMessageService
+from service.chat_summary_service import ChatSummaryService
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# (会话ID, 用户问题, 助手回复)
+Turn = Tuple[int, str, Optional[str]]
+# (对话, 已重放次数)
+SpoolRecord = Tuple[Turn, int]
+
+
+class ChatPersistQueue:
+    """
+    会话写入队列（write-behind）
+
+    流式会话结束后只需将本轮对话放入有界队列，由后台任务按 PERSIST_FLUSH_INTERVAL_MS 收集
+    多个会话的写入，合并为一次批量写入。队列满时 submit 会等待（背压）。
+    连接类错误按指数退避重试，仍失败则整批追加到本地 JSONL 落盘文件，数据库恢复后（下一次成功写入或重启时）重放；
+    数据错误（如违反约束）不重试，二分拆分批次，只有失败的对话落盘，同批中其他会话的对话照常写入。
+    重放为至少一次语义：极端情况下（提交成功但连接随即断开）同一轮对话可能被重复写入。
+    每条落盘记录带有重放次数，因数据错误重放 PERSIST_MAX_REPLAYS 次仍失败时移入死信文件，不再重放。
+
+    同一会话的对话按提交顺序写入：会话有对话在落盘文件中时，其后的对话也追加到落盘文件，
+    重放时按落盘顺序写入（多个进程的落盘文件之间不保证顺序）。
+
+    落盘文件按进程区分（PERSIST_SPOOL_PATH 的文件名中加入 pid），多个 worker 互不影响；
+    重放时同时接管已退出的进程遗留的落盘文件（改名接管，同一文件只会被一个进程接管）。
+
+    历史存储在提交写入时即已追加本轮对话；写入落盘时丢弃相应会话的历史缓存，下次读取时从数据库回源，
+    使历史存储不包含数据库中没有的对话。
+    """
+
+    def __init__(self, chat_message_service: ChatMessageService, chat_summary_service: ChatSummaryService,
+                 history_store: HistoryStore):
+        """
+        初始化会话写入队列
+
+        Args:
+            chat_message_service (ChatMessageService): 会话消息存储服务。
+            chat_summary_service (ChatSummaryService): 会话摘要服务，写入完成后触发摘要压缩。
+            history_store (HistoryStore): 会话历史存储，写入落盘时丢弃相应会话的缓存。
+        """
+        self.chat_message_service = chat_message_service
+        self.chat_summary_service = chat_summary_service
+        self.history_store = history_store
+        self.enabled = os.getenv("PERSIST_WRITE_BEHIND", "true").lower() == "true"
+        self.batch_size = int(os.getenv("PERSIST_BATCH_SIZE", 100))
+        self.flush_interval = int(os.getenv("PERSIST_FLUSH_INTERVAL_MS", 200)) / 1000
+        self.max_retries = int(os.getenv("PERSIST_MAX_RETRIES", 3))
+        self.retry_backoff = int(os.getenv("PERSIST_RETRY_BACKOFF_MS", 500)) / 1000
+        self.max_replays = int(os.getenv("PERSIST_MAX_REPLAYS", 5))
+        # 落盘文件 data/chat_persist_spool.<pid>.jsonl，死信文件 data/chat_persist_spool.<pid>.dead.jsonl
+        self.spool_base = os.getenv("PERSIST_SPOOL_PATH", "data/chat_persist_spool.jsonl")
+        root, ext = os.path.splitext(self.spool_base)
+        self.spool_path = f"{root}.{os.getpid()}{ext}"
+        self.dead_letter_path = f"{root}.{os.getpid()}.dead{ext}"
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=int(os.getenv("PERSIST_QUEUE_SIZE", 1000)))
+        self._worker: Optional[asyncio.Task] = None
+        self._invalidations: Set[asyncio.Task] = set()
+        self._replaying = False
+        # 落盘文件中是否有待重放的数据
+        self._spool_pending = False
+        # 有对话在落盘文件中等待重放的会话，及最近一次接管落盘文件后再次落盘的会话
+        self._spooled_chats: Set[int] = set()
+        self._spooled_since_claim: Set[int] = set()
+        # 正在写入的批次，停止超时时写入落盘文件
+        self._inflight: List[Turn] = []
+        # 统计指标
+        self._flushed_turns = 0
+        self._flush_batches = 0
+        self._retries = 0
+        self._spooled_turns = 0
+        self._replayed_turns = 0
+        self._dead_lettered_turns = 0
+        self._last_flush_ms = 0.0
+
+    async def start(self):
+        """启动后台写入任务，并重放上次遗留的落盘数据"""
+        if not self.enabled or self._worker is not None:
+            return
+        # 先接管落盘文件再启动写入任务，这些会话的新对话排在落盘数据之后写入
+        self._replaying = True
+        try:
+            records, paths = await self._claim_spool()
+            self._worker = asyncio.create_task(self._run())
+            await self._replay(records, paths)
+        finally:
+            self._replaying = False
+
+    async def stop(self, timeout: float = 10):
+        """
+        停止后台写入任务，等待队列中已有的写入完成
+
+        Args:
+            timeout (float): 最长等待秒数，超时后剩余数据写入落盘文件。
+        """
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._worker, timeout)
+        except asyncio.TimeoutError:
+            logger.error("会话写入队列停止超时，剩余数据写入落盘文件")
+            remaining = list(self._inflight)
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    remaining.append(item)
+            await self._spool([(turn, 0) for turn in remaining])
+        self._worker = None
+
+    async def submit(self, chat_window_id: int, query: str, reply: Optional[str] = None):
+        """
+        提交一轮对话的写入，未启用 write-behind 时直接写入
+
+        Args:
+            chat_window_id (int): 会话ID。
+            query (str): 用户问题。
+            reply (Optional[str]): 助手回复。
+        """
+        if self._worker is None:
+            await self.chat_message_service.append_turn(chat_window_id, query, reply)
+            self.chat_summary_service.schedule_compaction(chat_window_id)
+            return
+        await self._queue.put((chat_window_id, query, reply))
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch: List[Turn] = [item]
+            # 在刷新间隔内继续收集，直到达到批量上限
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._inflight = batch
+            await self._flush(batch)
+            self._inflight = []
+
+    async def _flush(self, batch: List[Turn]):
+        """
+        批量写入新提交的对话，无法写入的对话写入落盘文件
+
+        已有对话在落盘文件中等待重放的会话，其新对话直接追加到落盘文件，重放时按顺序写入，保持会话内的消息顺序。
+
+        Args:
+            batch (List[Turn]): 待写入的对话。
+        """
+        has_spooled_chats = any(turn[0] in self._spooled_chats for turn in batch)
+        written = await self._write([(turn, 0) for turn in batch], False, self._spooled_chats)
+        self._flushed_turns += len(written)
+        for chat_window_id in {turn[0] for turn in written}:
+            self.chat_summary_service.schedule_compaction(chat_window_id)
+        # 数据库已恢复（或有对话在等待之前的落盘数据），重放之前落盘的数据
+        if self._spool_pending and not self._replaying and (written or has_spooled_chats):
+            await self._replay_spool()
+
+    async def _write(self, records: List[SpoolRecord], replaying: bool, blocked: Set[int]) -> List[Turn]:
+        """
+        写入一组对话，数据错误时二分拆分批次，只把无法写入的对话写入落盘文件（或死信文件）
+
+        连接类错误（数据库不可用）按指数退避重试，仍失败时整批落盘；数据错误（如违反约束）重试无意义，
+        直接拆分批次定位失败的对话，其他会话的对话照常写入。
+
+        Args:
+            records (List[SpoolRecord]): 待写入的对话及其已重放次数。
+            replaying (bool): 是否为重放落盘数据，数据错误时重放次数加一。
+            blocked (Set[int]): 已有对话落盘的会话，这些会话之后的对话不再写入而是追加到落盘文件。
+
+        Returns:
+            List[Turn]: 写入成功的对话。
+        """
+        pending = [record for record in records if record[0][0] not in blocked]
+        if len(pending) < len(records):
+            await self._spool([record for record in records if record[0][0] in blocked])
+        if not pending:
+            return []
+
+        error = await self._append([turn for turn, _ in pending])
+        if error is None:
+            return [turn for turn, _ in pending]
+        transient = self._is_transient(error)
+        if len(pending) > 1 and not transient:
+            middle = len(pending) // 2
+            written = await self._write(pending[:middle], replaying, blocked)
+            return written + await self._write(pending[middle:], replaying, blocked)
+
+        logger.error(f"会话写入失败，{len(pending)} 轮对话写入落盘文件: {error}")
+        failed = [(turn, replays + 1 if replaying and not transient else replays) for turn, replays in pending]
+        await self._spool(failed)
+        blocked.update(turn[0] for turn, replays in failed if replays < self.max_replays)
+        return []
+
+    async def _append(self, turns: List[Turn]) -> Optional[Exception]:
+        """
+        批量写入，连接类错误按指数退避重试
+
+        Returns:
+            Optional[Exception]: 写入成功时为空，否则为最后一次失败的异常。
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                start = time.perf_counter()
+                await self.chat_message_service.append_turns(turns)
+                self._last_flush_ms = (time.perf_counter() - start) * 1000
+                self._flush_batches += 1
+                return None
+            except Exception as e:
+                if attempt == self.max_retries or not self._is_transient(e):
+                    return e
+                self._retries += 1
+                logger.warning(f"会话批量写入失败，第 {attempt + 1} 次重试: {e}")
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """是否为连接类错误（数据库不可用、连接断开或超时），此类错误与数据无关，重试可能成功"""
+        if isinstance(error, (OSError, asyncio.TimeoutError, exc.TimeoutError, exc.OperationalError,
+                              exc.InterfaceError)):
+            return True
+        return isinstance(error, exc.DBAPIError) and error.connection_invalidated
+
+    async def _spool(self, records: List[SpoolRecord]):
+        """
+        将对话追加到落盘文件，重放次数达到 PERSIST_MAX_REPLAYS 的对话移入死信文件
+
+        Args:
+            records (List[SpoolRecord]): 对话及记录的重放次数。
+        """
+        if not records:
+            return
+        # 多次重放仍失败的数据移入死信文件，不再重放
+        dead = [record for record in records if record[1] >= self.max_replays]
+        spooled = [record for record in records if record[1] < self.max_replays]
+
+        def write(path: str, items: List[SpoolRecord]):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for (chat_window_id, query, reply), replays in items:
+                    f.write(json.dumps({"chat_window_id": chat_window_id, "query": query, "reply": reply,
+                                        "replays": replays}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        if dead:
+            await asyncio.to_thread(write, self.dead_letter_path, dead)
+            self._dead_lettered_turns += len(dead)
+            logger.error(f"{len(dead)} 轮对话多次重放仍写入失败，已移入死信文件 {self.dead_letter_path}")
+        if spooled:
+            await asyncio.to_thread(write, self.spool_path, spooled)
+            self._spooled_turns += len(spooled)
+            self._spool_pending = True
+            chat_ids = {turn[0] for turn, _ in spooled}
+            self._spooled_chats.update(chat_ids)
+            self._spooled_since_claim.update(chat_ids)
+        # 历史存储中已追加的这些对话尚未写入数据库，丢弃缓存
+        for chat_window_id in {turn[0] for turn, _ in records}:
+            task = asyncio.create_task(self._invalidate_history(chat_window_id))
+            self._invalidations.add(task)
+            task.add_done_callback(self._invalidations.discard)
+
+    async def _invalidate_history(self, chat_window_id: int):
+        # 在会话锁内丢弃，排在正在进行的追加之后；不在写入任务中等待锁：
+        # 持有锁的请求可能正因队列已满等待写入任务
+        try:
+            async with self.history_store.lock(chat_window_id):
+                await self.history_store.invalidate(chat_window_id)
+        except Exception as e:
+            logger.error(f"会话 {chat_window_id} 历史缓存丢弃失败: {e}")
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _claim_spool_files(self) -> List[str]:
+        """
+        接管待重放的落盘文件：本进程的落盘文件及未完成的重放文件，已退出的进程（含未按进程区分的旧文件）遗留的文件
+
+        Returns:
+            List[str]: 接管后的文件路径（均已改名为本进程的重放文件）。
+        """
+        directory = os.path.dirname(self.spool_base) or "."
+        root, ext = os.path.splitext(os.path.basename(self.spool_base))
+        pattern = re.compile(rf"^{re.escape(root)}(?:\.(\d+))?{re.escape(ext)}(?:\.replay.*)?$")
+        own_replay = os.path.basename(self.spool_path) + ".replay"
+        if not os.path.isdir(directory):
+            return []
+
+        claimed = []
+        for name in sorted(os.listdir(directory)):
+            match = pattern.match(name)
+            if match is None:
+                continue
+            path = os.path.join(directory, name)
+            if name.startswith(own_replay):
+                # 本进程之前未完成的重放
+                claimed.append(path)
+                continue
+            pid = int(match.group(1)) if match.group(1) else None
+            if pid is not None and pid != os.getpid() and self._process_alive(pid):
+                continue
+            # 先改名再读取，重放期间新的失败写入进入新的落盘文件；其他进程已接管时改名失败
+            target = os.path.join(directory, f"{own_replay}.{time.time_ns()}")
+            try:
+                os.replace(path, target)
+            except FileNotFoundError:
+                continue
+            claimed.append(target)
+        return claimed
+
+    async def _claim_spool(self) -> Tuple[List[SpoolRecord], List[str]]:
+        """
+        接管待重放的落盘文件并按文件中的顺序读取记录，这些会话的新对话在重放完成前追加到落盘文件
+
+        Returns:
+            Tuple[List[SpoolRecord], List[str]]: 落盘的对话及其已重放次数，接管的文件路径。
+        """
+        def take() -> Tuple[List[SpoolRecord], List[str]]:
+            paths = self._claim_spool_files()
+            records: List[SpoolRecord] = []
+            for path in paths:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            r = json.loads(line)
+                        except json.JSONDecodeError:
+                            # 进程异常退出时可能写入不完整的行
+                            logger.error(f"落盘文件 {path} 中的记录无法解析，已跳过: {line[:200]}")
+                            continue
+                        records.append(((r["chat_window_id"], r["query"], r["reply"]), r.get("replays", 0)))
+            return records, paths
+
+        self._spool_pending = False
+        self._spooled_since_claim = set()
+        records, paths = await asyncio.to_thread(take)
+        self._spooled_chats.update(turn[0] for turn, _ in records)
+        return records, paths
+
+    async def _replay(self, records: List[SpoolRecord], paths: List[str]):
+        """
+        按落盘顺序重放，同一会话中一轮对话重新落盘后，该会话之后的对话也追加到落盘文件，不会越过它写入
+
+        Args:
+            records (List[SpoolRecord]): 落盘的对话及其已重放次数。
+            paths (List[str]): 接管的文件路径，重放完成后删除。
+        """
+        if not paths:
+            return
+        logger.info(f"重放落盘的 {len(records)} 轮对话")
+        blocked: Set[int] = set()
+        for i in range(0, len(records), self.batch_size):
+            written = await self._write(records[i:i + self.batch_size], True, blocked)
+            self._replayed_turns += len(written)
+            for chat_window_id in {turn[0] for turn in written}:
+                self.chat_summary_service.schedule_compaction(chat_window_id)
+        for path in paths:
+            await asyncio.to_thread(os.remove, path)
+        # 重放期间没有再次落盘的会话，新对话恢复直接写入
+        self._spooled_chats -= {turn[0] for turn, _ in records} - self._spooled_since_claim
+
+    async def _replay_spool(self):
+        self._replaying = True
+        try:
+            await self._replay(*await self._claim_spool())
+        finally:
+            self._replaying = False
+
+    def stats(self) -> dict:
+        """
+        获取写入队列指标
+
+        Returns:
+            dict: 队列长度、已写入轮数及批次数、重试次数、落盘、重放及移入死信文件的轮数、最近一次批量写入耗时。
+        """
+        return {
+            "enabled": self._worker is not None,
+            "queued": self._queue.qsize(),
+            "flushed_turns": self._flushed_turns,
+            "flush_batches": self._flush_batches,
+            "retries": self._retries,
+            "spooled_turns": self._spooled_turns,
+            "replayed_turns": self._replayed_turns,
+            "dead_lettered_turns": self._dead_lettered_turns,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+        }
@@ -1,12 +1,27 @@
 from core.llm.llm_manager import LLMChat
-from typing import AsyncGenerator, List, Optional
+from typing import AsyncGenerator, List, Optional, Tuple
+from langchain_core.tools import BaseTool
+from core.llm.llm_message import LLMMessage
+from core.llm.response_cache import ResponseCache
+from core.llm.singleflight import SingleFlight
+from core.llm.llm_scheduler import LLMScheduler, QueueFullError
+from core.llm.context_builder import ContextBuilder
+from core.llm.agent_checkpointer import AgentCheckpointer
+from dao.base_dao import UnitOfWorkProvider
+from core.history.history_store import HistoryStore
 from core.mcp.convert_mcp_tools import convert_mcp_to_langchain_tools
 from dao.chat_window_dao import ChatWindowDAO
 from dto.chat_dto import ChatDTO
-from dto.chat_window_dto import ContentDTO, ChatMessageDTO
+from exception.exception import BaseAPIException
+from exception.exception_dict import ExceptionType
 from model.chat_window import ChatWindow
+from service.chat_summary_service import ChatSummaryService
+from service.chat_message_service import ChatMessageService
+from service.chat_persist_queue import ChatPersistQueue
+from service.chat_draft_service import ChatDraftService
 from service.mcp_config_service import MCPConfigService
 import json
+from contextlib import aclosing
 
 
 class ChatService:
@@ -14,10 +29,15 @@ class ChatService:
     ChatService 类 - 提供与模型会话相关的服务
 
     该类负责与语言模型 (LLM) 进行交互，动态加载工具并支持流式会话。
-    同时维护用户的历史会话记录，以实现更自然的上下文会话效果。
+    会话历史按会话ID保存在历史存储中，以实现更自然的上下文会话效果。
     """
 
-    def __init__(self, llm: LLMChat, mcp_config_service: MCPConfigService, chat_window_dao: ChatWindowDAO):
+    def __init__(self, llm: LLMChat, mcp_config_service: MCPConfigService, chat_window_dao: ChatWindowDAO,
+                 llm_scheduler: LLMScheduler, response_cache: ResponseCache, singleflight: SingleFlight,
+                 context_builder: ContextBuilder, chat_summary_service: ChatSummaryService,
+                 history_store: HistoryStore, chat_message_service: ChatMessageService,
+                 chat_persist_queue: ChatPersistQueue, chat_draft_service: ChatDraftService,
+                 agent_checkpointer: AgentCheckpointer, unit_of_work: UnitOfWorkProvider):
         """
         初始化 ChatService
 
@@ -25,11 +45,33 @@ class ChatService:
             llm (LLMChat): 语言模型管理器，用于处理会话逻辑。
             mcp_config_service (MCPConfigService): MCP 配置服务，用于获取 MCP-Server 的相关配置。
             chat_window_dao: 会话记录DAO，用于持久化会话及对话历史
+            llm_scheduler (LLMScheduler): 模型请求调度器，负责按提供方限流及按用户公平排队。
+            response_cache (ResponseCache): 普通会话的模型响应缓存。
+            singleflight (SingleFlight): 相同请求合并器，使并发的相同请求共享一次模型调用。
+            context_builder (ContextBuilder): 上下文组装器，按模型的 token 预算组装输入。
+            chat_summary_service (ChatSummaryService): 会话滚动摘要服务，用于压缩长会话的早期对话。
+            history_store (HistoryStore): 按会话ID保存的历史存储。
+            chat_message_service (ChatMessageService): 会话消息存储服务。
+            chat_persist_queue (ChatPersistQueue): 会话写入队列，在后台批量持久化对话。
+            chat_draft_service (ChatDraftService): 回复草稿服务，定期保存生成中的回复。
+            agent_checkpointer (AgentCheckpointer): 代理状态持久化，按会话保存工具调用及结果。
+            unit_of_work (UnitOfWorkProvider): 工作单元，调用模型前的数据库操作共享一个连接。
         """
         self.llm = llm
         self.chat_window_dao = chat_window_dao
         self.mcp_config_service = mcp_config_service
-        self.user_history_dict = {}  # 用于存储每个用户的历史会话记录
+        self.llm_scheduler = llm_scheduler
+        self.response_cache = response_cache
+        self.singleflight = singleflight
+        self.context_builder = context_builder
+        self.token_counter = context_builder.token_counter
+        self.chat_summary_service = chat_summary_service
+        self.history_store = history_store
+        self.chat_message_service = chat_message_service
+        self.chat_persist_queue = chat_persist_queue
+        self.chat_draft_service = chat_draft_service
+        self.agent_checkpointer = agent_checkpointer
+        self.unit_of_work = unit_of_work
 
     async def agent_stream(self, chat_dto: ChatDTO) -> AsyncGenerator[str, None]:
         """
@@ -43,80 +85,192 @@ class ChatService:
         Yields:
             str: 模型返回的流式会话响应，每次生成一个 JSON 格式的消息块。
         """
-        # 判断是否需要创建会话
-        if not chat_dto.chat_id:
-            new_chat_window_id = await self.create_chat(chat_dto.user_id, chat_dto.query)
-        # 初始化 langchain agent 工具列表
-        tools = []
-        if chat_dto.server_id:
-            # 通过json文件获取mcp-server配置，这个需要保留
-            # server_params = await load_config_from_file(chat_dto.server_name)
+        # 调用模型前的数据库读写使用同一个连接及事务，提交后释放连接，不在生成回复期间占用
+        server_params = None
+        async with self.unit_of_work.begin():
+            # 判断是否需要创建会话
+            chat_window_id = chat_dto.chat_id or await self.create_chat(chat_dto.user_id, chat_dto.query)
+            if chat_dto.server_id:
+                # 通过json文件获取mcp-server配置，这个需要保留
+                # server_params = await load_config_from_file(chat_dto.server_name)
 
-            # 通过数据库获取mcp-server配置
-            server_params = await self.mcp_config_service.load_mcp_server_config(chat_dto.server_id)
+                # 通过数据库获取mcp-server配置
+                server_params = await self.mcp_config_service.load_mcp_server_config(chat_dto.server_id)
+            # 预先加载会话历史
+            await self.history_store.get(chat_window_id)
 
+        # 初始化 langchain agent 工具列表
+        tools = []
+        if server_params:
             # 获取mcp-server的所有tools并转换为langchain agent tools
             tools = await convert_mcp_to_langchain_tools([server_params])
 
+        # 定期保存生成中的回复草稿
+        draft = self.chat_draft_service.begin(chat_window_id, chat_dto.query)
+
         # 定义回调方法，用于收集模型返回的数据
         async def data_callback(collected_data):
-            user_id = chat_dto.user_id
             user_query = chat_dto.query
             print("--->messages:", ''.join(collected_data["messages"]))
+            if draft:
+                await draft.close()
             if "messages" in collected_data and collected_data["messages"]:
                 assistant_reply = ''.join(collected_data["messages"])
 
-                # 初始化或更新用户的历史记录
-                if user_id not in self.user_history_dict:
-                    self.user_history_dict[user_id] = []
-                self.user_history_dict[user_id].append({
-                    "user": chat_dto.query,
-                    "assistant": assistant_reply
-                })
-                # 保留最近 3 条历史记录
-                self.user_history_dict[user_id] = self.user_history_dict[user_id][-3:]
-                # 更新会话历史记录
-                if chat_dto.chat_id is None:
-                    chat_window_id = new_chat_window_id
-                else:
-                    chat_window_id = chat_dto.chat_id
-                await self.update_chat_window(chat_window_id, user_query, assistant_reply)
+                # 同一会话的并发请求按顺序提交写入并更新历史存储，写入完成后会在后台触发摘要压缩；
+                # 写入最终失败并落盘时，写入队列会丢弃该会话的历史缓存
+                async with self.history_store.lock(chat_window_id):
+                    await self.update_chat_window(chat_window_id, user_query, assistant_reply)
+                    await self.history_store.append(chat_window_id, user_query, assistant_reply)
+            elif draft and draft.saved:
+                # 没有生成回复，丢弃已保存的草稿
+                await self.chat_draft_service.save(chat_window_id, None)
             for tool_call in collected_data["tool_calls"]:
                 print("--->tool_call:", tool_call)
+            # 清理该会话的旧代理状态
+            if self.agent_checkpointer.enabled:
+                await self.agent_checkpointer.prune(str(chat_window_id))
+
+        shared = False
+        if self.agent_checkpointer.enabled:
+            # 代理状态按会话保存，只发送新问题，之前的工具结果可直接复用
+            chunks = self.checkpointed_stream(chat_dto, chat_window_id, tools, data_callback)
+        else:
+            # 构造模型的输入内容
+            inputs = await self.load_inputs(chat_dto, chat_window_id, tools)
+            if tools:
+                chunks = self.scheduled_stream(chat_dto.user_id, inputs, tools, callback=data_callback)
+            else:
+                # 无工具调用时，输入相同的并发请求共享同一次模型调用，数据块扇出给每个请求；
+                # 合并的请求不单独排队，按预估输入 token 数计入该用户的公平队列份额
+                shared = True
+                chunks = self.singleflight.stream(
+                    self.make_request_key(inputs),
+                    lambda: self.scheduled_stream(chat_dto.user_id, inputs, tools),
+                    on_follow=lambda: self.llm_scheduler.charge(
+                        self.llm.name(), chat_dto.user_id, self.token_counter.count_messages(inputs["messages"]))
+                )
+
+        collected_messages = []
+        try:
+            # 客户端断开时立即关闭上游数据流，释放调度名额及会话锁
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    if draft:
+                        draft.add(chunk)
+                    if chunk.type == "tool_result":
+                        continue
+                    if chunk.type == "message":
+                        collected_messages.append(chunk.content)
+                    yield json.dumps(chunk.model_dump()) + "\n"
+        except BaseException:
+            # 客户端断开或模型调用异常，保留已生成的内容并标记为中断
+            if draft:
+                draft.interrupt()
+            raise
+
+        # 共享的数据流不携带回调，由每个请求各自持久化
+        if shared:
+            await data_callback({"messages": collected_messages, "tool_calls": [], "tool_errors": []})
+
+    async def scheduled_stream(self, user_id: int, inputs: dict, tools: List[BaseTool], callback=None,
+                               **agent_kwargs) -> AsyncGenerator[LLMMessage, None]:
+        """
+        经调度器排队后调用语言模型的流式接口
+
+        Args:
+            user_id (int): 用户 ID，用于公平排队。
+            inputs (dict): 模型输入。
+            tools (List[BaseTool]): 工具列表。
+            callback (callable, optional): 完成后的回调函数。
+            **agent_kwargs: 代理状态持久化参数（checkpointer、thread_id、state_modifier）。
+
+        Yields:
+            LLMMessage: 首个消息为排队耗时（毫秒），其后为模型返回的消息；队列已满时返回错误消息。
+        """
+        input_tokens = self.token_counter.count_messages(inputs["messages"])
+        try:
+            async with self.llm_scheduler.acquire(self.llm.name(), user_id, input_tokens) as ticket:
+                yield LLMMessage(content=str(ticket.wait_ms), type="queue")
+
+                # 输出在结束后合并计数一次，消息块不写入计数缓存
+                outputs = []
+                async for chunk in self.llm.stream_chat(inputs=inputs, tools=tools, callback=callback,
+                                                          **agent_kwargs):
+                    outputs.append(chunk.content or "")
+                    yield chunk
+                ticket.settle(input_tokens + self.token_counter.count_text("".join(outputs)))
+        except QueueFullError as e:
+            yield LLMMessage(content=str(e), type="error")
+
+    async def checkpointed_stream(self, chat_dto: ChatDTO, chat_window_id: int, tools: List[BaseTool],
+                                  callback) -> AsyncGenerator[LLMMessage, None]:
+        """
+        从会话的代理状态恢复并调用语言模型的流式接口
+
+        读取代理状态、调用模型及回调中清理旧检查点都在会话锁内完成，
+        同一会话的并发请求依次执行，后一轮从前一轮写入的检查点恢复。
+
+        Args:
+            chat_dto (ChatDTO): 会话请求数据传输对象。
+            chat_window_id (int): 会话ID，作为代理状态的 thread_id。
+            tools (List[BaseTool]): 工具列表。
+            callback (callable): 完成后的回调函数。
+
+        Yields:
+            LLMMessage: 同 scheduled_stream。
+        """
+        async with self.agent_checkpointer.lock(str(chat_window_id)):
+            inputs, agent_kwargs = await self.load_agent_inputs(chat_dto, chat_window_id, tools)
+            async with aclosing(self.scheduled_stream(chat_dto.user_id, inputs, tools, callback=callback,
+                                                      **agent_kwargs)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+
+    def make_request_key(self, inputs: dict) -> str:
+        """
+        生成请求合并用的键，模型、参数及输入完全相同的请求键相同
 
-        # 构造模型的输入内容
-        inputs = await self.load_inputs(chat_dto)
+        Args:
+            inputs (dict): 模型输入。
 
-        # 调用语言模型的流式接口，生成响应
-        async for chunk in self.llm.stream_chat(inputs=inputs, tools=tools, callback=data_callback):
-            yield json.dumps(chunk.model_dump()) + "\n"
+        Returns:
+            str: 请求键。
+        """
+        namespace = ResponseCache.make_namespace(self.llm.name(), self.llm.model_params())
+        return ResponseCache.make_key(namespace, json.dumps(inputs, ensure_ascii=False))
 
-    async def load_inputs(self, chat_dto: ChatDTO) -> dict:
+    async def load_inputs(self, chat_dto: ChatDTO, chat_window_id: Optional[int] = None,
+                          tools: Optional[List[BaseTool]] = None) -> dict:
         """
         加载模型输入内容
 
-        根据用户请求，拼接提示词、历史记录和当前问题，构造模型的输入。
+        根据用户请求，在当前模型的 token 预算内拼接提示词、历史记录和当前问题，构造模型的输入。
+        工具定义同样占用预算，历史记录从最新一轮开始装入。
 
         Args:
             chat_dto (ChatDTO): 会话请求数据传输对象。
+            chat_window_id (Optional[int]): 会话ID，为空时不携带历史记录。
+            tools (Optional[List[BaseTool]]): 本轮可用的工具。
 
         Returns:
             dict: 拼装好的模型输入，包含消息列表。
         """
-        # 初始化消息列表
-        messages = []
-        # 如果有提示词，加入系统提示
-        if chat_dto.prompt:
-            messages.append(("system", chat_dto.prompt))
-
-        # 添加最近 3 条用户历史记录
-        if chat_dto.user_id in self.user_history_dict:
-            for record in self.user_history_dict[chat_dto.user_id][-3:]:
-                messages.append(("user", record["user"]))
-                messages.append(("assistant", record["assistant"]))
+        # 已有滚动摘要时，发送摘要及未被摘要覆盖的最近几轮
+        history, summary = [], None
+        if chat_window_id:
+            chat_history = await self.history_store.get(chat_window_id)
+            history, summary = chat_history.pending_turns(), chat_history.running_summary
 
-        # 添加当前用户的问题
-        messages.append(("user", chat_dto.query))
+        budget = self.context_builder.budget_for(self.llm.model_params().get("model"), self.llm.name())
+        messages = self.context_builder.build(
+            budget=budget,
+            query=chat_dto.query,
+            history=history,
+            system_prompt=chat_dto.prompt,
+            tools=tools,
+            summary=summary
+        )
 
         # 打印即将发送给模型的消息
         print(">>> 模型输入 messages：")
@@ -125,6 +279,48 @@ class ChatService:
 
         return {"messages": messages}
 
+    async def load_agent_inputs(self, chat_dto: ChatDTO, chat_window_id: int,
+                                tools: Optional[List[BaseTool]] = None) -> Tuple[dict, dict]:
+        """
+        加载启用代理状态持久化时的模型输入
+
+        会话已有代理状态时只发送新问题；首次使用（或状态已过期）时以历史记录作为代理的初始状态。
+        系统提示词及滚动摘要不写入代理状态，而是通过 state_modifier 在每次调用模型前加上，
+        同时按 token 预算裁剪代理状态。
+
+        Args:
+            chat_dto (ChatDTO): 会话请求数据传输对象。
+            chat_window_id (int): 会话ID，作为代理状态的 thread_id。
+            tools (Optional[List[BaseTool]]): 本轮可用的工具。
+
+        Returns:
+            Tuple[dict, dict]: 模型输入，及传给 stream_chat 的代理状态持久化参数。
+        """
+        thread_id = str(chat_window_id)
+        chat_history = await self.history_store.get(chat_window_id)
+        budget = self.context_builder.budget_for(self.llm.model_params().get("model"), self.llm.name())
+        if await self.agent_checkpointer.has_state(thread_id):
+            messages = [("user", chat_dto.query)]
+        else:
+            messages = self.context_builder.build(
+                budget=budget,
+                query=chat_dto.query,
+                history=chat_history.pending_turns(),
+                tools=tools
+            )
+        state_modifier = self.context_builder.build_state_modifier(
+            budget=budget,
+            system_prompt=chat_dto.prompt,
+            tools=tools,
+            summary=chat_history.running_summary
+        )
+        agent_kwargs = {
+            "checkpointer": self.agent_checkpointer.saver,
+            "thread_id": thread_id,
+            "state_modifier": state_modifier,
+        }
+        return {"messages": messages}, agent_kwargs
+
     async def create_chat(self, user_id: int, query: str, chat_messages: Optional[List[str]] = None) -> int:
         # 会话概要
         # summary_prompt = "根据会话记录总结出本次会话的概要"
@@ -139,43 +335,47 @@ class ChatService:
         return await self.chat_window_dao.get_chat_window_by_id(chat_window_id)
 
     async def update_chat_window(self, chat_window_id: int, query: str, reply: Optional[str] = None):
-        # 旧会话
-        old_chat_window: ChatWindow = await self.chat_window_dao.get_chat_window_by_id(chat_window_id)
-
-        # 构建新会话 content
-        content_user = ContentDTO(type="text", text=query)
-        content_assistant = ContentDTO(type="text", text=reply)
-        
-        # 创建消息，注意 content 需要是列表
-        chat_message_user = ChatMessageDTO(
-            role="user",
-            content=[content_user]
-        )
-        chat_message_assistant = ChatMessageDTO(
-            role="assistant",
-            content=[content_assistant]
-        )
+        # 追加本轮对话，由写入队列在后台批量持久化
+        await self.chat_persist_queue.submit(chat_window_id, query, reply)
 
-        # 构建新的内容列表并转换为可序列化的字典
-        new_content = [
-            chat_message_user.model_dump(),
-            chat_message_assistant.model_dump()
-        ]
+    async def normal_chat(self, chat_dto: ChatDTO) -> str:
+        # 优先读取响应缓存（按用户隔离）
+        cache_namespace = ResponseCache.make_namespace(self.llm.name(), self.llm.model_params(), chat_dto.user_id)
+        if chat_dto.use_cache:
+            cached_reply = self.response_cache.get(cache_namespace, chat_dto.query)
+            if cached_reply is not None:
+                return cached_reply
 
-        # 最终更新内容
-        if old_chat_window.content is None:
-            update_content = new_content
-        else:
-            old_content = old_chat_window.content
-            old_content.extend(new_content)
-            update_content = old_content
-
-        # 更新会话窗口
-        await self.chat_window_dao.update_chat_window(
-            chat_window_id=chat_window_id,
-            summary=None,
-            content=update_content
+        # 相同请求并发到达时只调用一次模型（请求合并只在同一时刻进行，不按用户区分）；
+        # 上游调用按发起者排队计费，合并的请求按预估输入 token 数计入自己的公平队列份额
+        request_namespace = ResponseCache.make_namespace(self.llm.name(), self.llm.model_params())
+        reply = await self.singleflight.do(
+            ResponseCache.make_key(request_namespace, chat_dto.query),
+            lambda: self.scheduled_normal_chat(chat_dto),
+            on_follow=lambda: self.llm_scheduler.charge(
+                self.llm.name(), chat_dto.user_id, self.token_counter.count_message(chat_dto.query))
         )
+        self.response_cache.put(cache_namespace, chat_dto.query, reply)
+        return reply
 
-    async def normal_chat(self, chat_dto: ChatDTO) -> str:
-        return await self.llm.normal_chat(1, chat_dto.query)
+    async def scheduled_normal_chat(self, chat_dto: ChatDTO) -> str:
+        """
+        经调度器排队后调用语言模型的普通会话接口
+
+        Args:
+            chat_dto (ChatDTO): 会话请求数据传输对象。
+
+        Returns:
+            str: 模型返回的内容。
+        """
+        input_tokens = self.token_counter.count_message(chat_dto.query)
+        try:
+            async with self.llm_scheduler.acquire(self.llm.name(), chat_dto.user_id, input_tokens) as ticket:
+                reply = await self.llm.normal_chat(1, chat_dto.query)
+                ticket.settle(input_tokens + self.token_counter.count_text(reply))
+                return reply
+        except QueueFullError as e:
+            raise BaseAPIException(
+                status_code=ExceptionType.TOO_MANY_REQUESTS.code,
+                detail=str(e)
+            )
@@ -0,0 +1,142 @@
+import asyncio
+import os
+from typing import List, Optional, Set, TYPE_CHECKING
+from dotenv import load_dotenv
+from core.common.logger import get_logger
+from core.history.history_store import HistoryStore
+from core.llm.llm_scheduler import LLMScheduler
+from core.llm.token_counter import TokenCounter
+from dao.chat_window_dao import ChatWindowDAO
+from service.chat_message_service import ChatMessageService
+
+if TYPE_CHECKING:
+    from core.llm.llm_chat import LLMChat
+
+# 加载环境变量
+load_dotenv()
+
+logger = get_logger(__name__)
+
+SUMMARY_PROMPT = """你是对话摘要助手。请将“已有摘要”与“新增对话”合并为一份新的摘要，要求：
+1. 保留用户的目标、关键事实、已得出的结论及尚未解决的问题；
+2. 省略寒暄与重复内容，不要编造信息；
+3. 使用与对话相同的语言，不超过 {max_chars} 字。
+
+已有摘要：
+{summary}
+
+新增对话：
+{turns}
+
+新的摘要："""
+
+
+class ChatSummaryService:
+    """
+    会话滚动摘要服务
+
+    会话中未被摘要覆盖的消息超过 token 阈值后，在后台使用低成本模型将较早的对话
+    与已有摘要合并为新的滚动摘要，只保留最近若干轮原文，使每轮的输入成本基本恒定。
+    """
+
+    def __init__(self, summary_llm: "LLMChat", chat_window_dao: ChatWindowDAO, token_counter: TokenCounter,
+                 history_store: HistoryStore, chat_message_service: ChatMessageService, llm_scheduler: LLMScheduler):
+        """
+        初始化会话摘要服务
+
+        Args:
+            summary_llm (LLMChat): 用于生成摘要的（低成本）语言模型。
+            chat_window_dao (ChatWindowDAO): 会话记录DAO。
+            token_counter (TokenCounter): token 计数器。
+            history_store (HistoryStore): 会话历史存储，摘要更新后同步。
+            chat_message_service (ChatMessageService): 会话消息存储服务。
+            llm_scheduler (LLMScheduler): 模型请求调度器，摘要请求按会话所属用户排队并计入配额。
+        """
+        self.summary_llm = summary_llm
+        self.chat_window_dao = chat_window_dao
+        self.token_counter = token_counter
+        self.history_store = history_store
+        self.chat_message_service = chat_message_service
+        self.llm_scheduler = llm_scheduler
+        self.trigger_tokens = int(os.getenv("SUMMARY_TRIGGER_TOKENS", 4000))
+        self.keep_turns = int(os.getenv("SUMMARY_KEEP_TURNS", 3))
+        self.max_chars = int(os.getenv("SUMMARY_MAX_CHARS", 800))
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule_compaction(self, chat_window_id: int):
+        """
+        在后台触发一次摘要压缩，同一会话同时只会有一个压缩任务。
+
+        Args:
+            chat_window_id (int): 会话ID。
+        """
+        if chat_window_id in self._running:
+            return
+        self._running.add(chat_window_id)
+        task = asyncio.create_task(self._compact_safely(chat_window_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _compact_safely(self, chat_window_id: int):
+        try:
+            await self.compact(chat_window_id)
+        except Exception as e:
+            logger.error(f"会话 {chat_window_id} 摘要压缩失败: {e}")
+        finally:
+            self._running.discard(chat_window_id)
+
+    async def compact(self, chat_window_id: int) -> Optional[str]:
+        """
+        压缩会话：未摘要部分超过阈值时，将除最近若干轮外的消息并入滚动摘要。
+
+        Args:
+            chat_window_id (int): 会话ID。
+
+        Returns:
+            Optional[str]: 新的摘要，未触发压缩时返回 None。
+        """
+        chat_window = await self.chat_window_dao.get_chat_window_by_id(chat_window_id)
+        if chat_window is None or not self.chat_message_service.message_count(chat_window):
+            return None
+
+        summarized_count = chat_window.summarized_count or 0
+        pending = await self.chat_message_service.get_messages(chat_window, after_seq=summarized_count)
+        pending_tokens = sum(self.token_counter.count_message(self.message_text(m)) for m in pending)
+        if pending_tokens <= self.trigger_tokens:
+            return None
+
+        # 保留最近若干轮（每轮包含用户与助手两条消息）的原文
+        to_summarize = pending[:max(len(pending) - self.keep_turns * 2, 0)]
+        if not to_summarize:
+            return None
+
+        prompt = SUMMARY_PROMPT.format(
+            max_chars=self.max_chars,
+            summary=chat_window.running_summary or "（无）",
+            turns=self.format_turns(to_summarize)
+        )
+        # 与对话请求共用提供方的 RPM/TPM 配额，按会话所属用户公平排队；队列已满时放弃本次压缩，下一轮再触发
+        input_tokens = self.token_counter.count_message(prompt)
+        async with self.llm_scheduler.acquire(self.summary_llm.name(), chat_window.user_id, input_tokens) as ticket:
+            running_summary = await self.summary_llm.normal_chat(1, prompt)
+            ticket.settle(input_tokens + self.token_counter.count_text(running_summary))
+        async with self.history_store.lock(chat_window_id):
+            await self.chat_window_dao.update_running_summary(
+                chat_window_id=chat_window_id,
+                running_summary=running_summary,
+                summarized_count=summarized_count + len(to_summarize)
+            )
+            await self.history_store.update_summary(chat_window_id, running_summary,
+                                                    summarized_count + len(to_summarize))
+        logger.info(f"会话 {chat_window_id} 已压缩 {len(to_summarize)} 条消息（{pending_tokens} tokens）")
+        return running_summary
+
+    @staticmethod
+    def message_text(message: dict) -> str:
+        """提取会话内容中单条消息的文本"""
+        return "".join(c.get("text") or "" for c in message.get("content", []))
+
+    def format_turns(self, messages: List[dict]) -> str:
+        role_names = {"user": "用户", "assistant": "助手"}
+        return "\n".join(f"{role_names.get(m.get('role'), m.get('role'))}：{self.message_text(m)}" for m in messages)
@@ -1,31 +1,139 @@
-from typing import List
+from typing import AsyncIterator, List, Optional
 from dao.chat_window_dao import ChatWindowDAO
-from dto.chat_window_dto import ChatWindowDTO
+from dto.chat_window_dto import ChatWindowDTO, ChatWindowSummaryDTO, ChatWindowPageDTO, ChatMessageItemDTO, \
+    ChatMessagePageDTO
+from exception.exception import BaseAPIException
+from exception.exception_dict import ExceptionType
 from model.chat_window import ChatWindow
+from service.chat_message_service import ChatMessageService
+from utils import result_utils
 
 
 class ChatWindowService:
-    def __init__(self, chat_window_dao: ChatWindowDAO):
+    def __init__(self, chat_window_dao: ChatWindowDAO, chat_message_service: ChatMessageService):
         self.chat_window_dao = chat_window_dao
+        self.chat_message_service = chat_message_service
 
 
     async def get_user_chat_windows(self, user_id: int) -> List[ChatWindowDTO]:
         result = await self.chat_window_dao.get_user_chat_windows(user_id)
         return await self.convert_models_to_chat_windows(result)
 
+    async def get_user_chat_windows_etag(self, user_id: int) -> str:
+        """
+        根据用户会话列表的版本信息生成 ETag（一次聚合查询，不读取会话内容）
+
+        ETag 与列表内容都读取只读副本且先取 ETag：副本只会前进，两者之间同步的修改只会让 ETag 比内容旧，
+        下次请求时重新获取，不会把旧内容当作最新。
+
+        Args:
+            user_id (int): 用户ID。
+
+        Returns:
+            str: ETag。
+        """
+        version = await self.chat_window_dao.get_user_chat_windows_version(user_id)
+        return result_utils.build_etag("chat_window_list", user_id, *version)
+
+    async def stream_user_chat_windows(self, user_id: int) -> AsyncIterator[ChatWindowDTO]:
+        """
+        逐个生成用户的全部会话，会话按游标分批读取，每批的消息一次查询取出
+
+        Args:
+            user_id (int): 用户ID。
+
+        Yields:
+            ChatWindowDTO: 会话及其对话记录。
+        """
+        async for chat_windows in self.chat_window_dao.stream_user_chat_windows(user_id):
+            for chat_window_dto in await self.convert_models_to_chat_windows(chat_windows):
+                yield chat_window_dto
+
+    async def get_user_chat_window_page(self, user_id: int, before: Optional[int] = None,
+                                        limit: int = 20) -> ChatWindowPageDTO:
+        """
+        分页获取用户会话列表，不加载对话信息记录
+
+        Args:
+            user_id (int): 用户ID。
+            before (Optional[int]): 游标，返回ID小于该值的会话。
+            limit (int): 每页条数。
+
+        Returns:
+            ChatWindowPageDTO: 当前页会话及下一页游标。
+        """
+        # 多取一条用于判断是否还有下一页
+        rows = await self.chat_window_dao.get_user_chat_window_page(user_id, before, limit + 1)
+        items = [ChatWindowSummaryDTO(id=row.id, summary=row.summary, created_at=row.created_at,
+                                      updated_at=row.updated_at) for row in rows[:limit]]
+        next_before = items[-1].id if len(rows) > limit else None
+        return ChatWindowPageDTO(items=items, next_before=next_before)
+
+    async def get_chat_window(self, chat_window_id: int) -> ChatWindowDTO:
+        """获取单个会话及其全部对话信息记录"""
+        chat_window = await self.get_chat_window_model(chat_window_id)
+        chat_messages = await self.chat_message_service.get_messages(chat_window)
+        return self.convert_model_to_chat_window_dto(chat_window, chat_messages)
+
+    async def get_chat_messages(self, chat_window_id: int, before: Optional[int] = None,
+                                since: Optional[int] = None, limit: int = 50) -> ChatMessagePageDTO:
+        """
+        按序号游标分页获取会话消息
+
+        默认返回最新的 limit 条；传入 before 向前翻页；传入 since 为增量模式，返回该序号之后的消息，
+        用于客户端重连后只同步新消息。
+
+        Args:
+            chat_window_id (int): 会话ID。
+            before (Optional[int]): 返回序号小于该值的消息。
+            since (Optional[int]): 返回序号大于该值的消息。
+            limit (int): 每页条数。
+
+        Returns:
+            ChatMessagePageDTO: 当前页消息、向前翻页的游标及会话当前的最大序号。
+        """
+        if before is not None and since is not None:
+            raise BaseAPIException(
+                status_code=ExceptionType.INVALID_PARAM.code,
+                detail="before 与 since 不能同时指定"
+            )
+        chat_window = await self.get_chat_window_model(chat_window_id)
+        page = await self.chat_message_service.get_message_page(chat_window, before, since, limit)
+        chat_messages = [ChatMessageItemDTO(seq=seq, **message) for seq, message in page]
+        next_before = chat_messages[0].seq if since is None and chat_messages and chat_messages[0].seq > 1 else None
+        return ChatMessagePageDTO(
+            chat_messages=chat_messages,
+            draft=chat_window.draft,
+            next_before=next_before,
+            last_seq=self.chat_message_service.message_count(chat_window)
+        )
+
+    async def get_chat_window_user_id(self, chat_window_id: int) -> Optional[int]:
+        return await self.chat_window_dao.get_chat_window_user_id(chat_window_id)
+
+    async def get_chat_window_model(self, chat_window_id: int) -> ChatWindow:
+        chat_window = await self.chat_window_dao.get_chat_window_by_id(chat_window_id)
+        if chat_window is None:
+            raise BaseAPIException(
+                status_code=ExceptionType.RESOURCE_NOT_FOUND.code,
+                detail=ExceptionType.RESOURCE_NOT_FOUND.message
+            )
+        return chat_window
+
     async def convert_models_to_chat_windows(self, chat_windows: List[ChatWindow]) -> List[ChatWindowDTO]:
-        return [self.convert_model_to_chat_window_dto(chat_window) for chat_window in chat_windows]
+        # 一次查询取出所有会话的消息
+        messages = await self.chat_message_service.get_messages_by_windows(chat_windows)
+        return [self.convert_model_to_chat_window_dto(chat_window, messages[chat_window.id])
+                for chat_window in chat_windows]
 
     @staticmethod
-    def convert_model_to_chat_window_dto(chat_window: ChatWindow) -> ChatWindowDTO:
-        # 确保 content 字段有值，如果为 None 则使用空列表
-        chat_messages = chat_window.content if chat_window.content else []
-        
+    def convert_model_to_chat_window_dto(chat_window: ChatWindow, chat_messages: List[dict]) -> ChatWindowDTO:
         return ChatWindowDTO(
             id=chat_window.id,
             user_id=chat_window.user_id,
             summary=chat_window.summary,
             chat_messages=chat_messages,
+            draft=chat_window.draft,
             created_at=chat_window.created_at,
             updated_at=chat_window.updated_at
         )
\ No newline at end of file
@@ -1,20 +1,24 @@
 import json
+from sqlalchemy.exc import IntegrityError
 from core.common.logger import get_logger
 from core.mcp.server.server_loader import StdioServerParameters
-from dto.mcp_server_dto import MCPServerDTO, CreateMCPServerDTO
-from typing import List, Optional
+from dto.mcp_server_dto import MCPServerDTO, CreateMCPServerDTO, MCPServersConfigDTO
+from typing import AsyncIterator, List, Optional
 from dao.mcp_server_dao import MCPServerDAO
+from core.mcp.server_config_cache import MCPServerConfigCache
 from exception.exception import BaseAPIException
 from model.mcp_server import McpServer
 from exception.exception_dict import ExceptionType
+from utils import result_utils
 
 logger = get_logger(__name__)
 
 
 class MCPConfigService:
 
-    def __init__(self, mcp_server_dao: MCPServerDAO):
+    def __init__(self, mcp_server_dao: MCPServerDAO, config_cache: MCPServerConfigCache):
         self.mcp_server_dao = mcp_server_dao
+        self.config_cache = config_cache
 
     # 不设置为静态方法，因为config service已经在container注册过了，一定有实例
     def to_dto(self, server: Optional[McpServer]) -> Optional[MCPServerDTO]:
@@ -35,6 +39,17 @@ class MCPConfigService:
         servers = await self.mcp_server_dao.get_servers_by_user_id(user_id)
         return [self.to_dto(server) for server in servers]
 
+    # 根据用户servers的版本信息（数量及最大更新时间）生成 ETag
+    async def get_user_servers_etag(self, user_id: int) -> str:
+        version = await self.mcp_server_dao.get_servers_version(user_id)
+        return result_utils.build_etag("mcp_server_list", user_id, *version)
+
+    # 逐个生成用户的所有servers（游标分批读取）
+    async def stream_user_servers(self, user_id: int) -> AsyncIterator[MCPServerDTO]:
+        async for servers in self.mcp_server_dao.stream_servers_by_user_id(user_id):
+            for server in servers:
+                yield self.to_dto(server)
+
     # 获取单个server
     async def get_server(self, server_id: int) -> Optional[MCPServerDTO]:
         server = await self.mcp_server_dao.get_server_by_id(server_id)
@@ -59,14 +74,7 @@ class MCPConfigService:
                 detail="MCP server command 不能为空"
             )
 
-        # 检查同一用户下是否存在同名服务器
-        existing_servers = await self.get_user_servers(mcp_server.user_id)
-        if any(server.server_name == mcp_server.server_name for server in existing_servers):
-            raise BaseAPIException(
-                status_code=ExceptionType.DUPLICATE_SERVER_NAME.code,
-                detail=ExceptionType.DUPLICATE_SERVER_NAME.message
-            )
-
+        # 同一用户下已存在同名服务器时由唯一约束拒绝插入
         new_server = await self.mcp_server_dao.create_server(
             user_id=mcp_server.user_id,
             server_name=mcp_server.server_name,
@@ -74,6 +82,11 @@ class MCPConfigService:
             args=mcp_server.args,
             env=mcp_server.env
         )
+        if new_server is None:
+            raise BaseAPIException(
+                status_code=ExceptionType.DUPLICATE_SERVER_NAME.code,
+                detail=ExceptionType.DUPLICATE_SERVER_NAME.message
+            )
         return self.to_dto(new_server)
 
     # 编辑server
@@ -98,27 +111,27 @@ class MCPConfigService:
                 detail=ExceptionType.RESOURCE_NOT_FOUND.message
             )
 
-        # 如果服务器名称发生变化，检查新名称是否与其他服务器冲突
-        if current_server.server_name != mcp_server.server_name:
-            existing_servers = await self.get_user_servers(mcp_server.user_id)
-            if any(server.server_name == mcp_server.server_name for server in existing_servers):
-                raise BaseAPIException(
-                    status_code=ExceptionType.DUPLICATE_SERVER_NAME.code,
-                    detail=ExceptionType.DUPLICATE_SERVER_NAME.message
-                )
-
-        updated_server = await self.mcp_server_dao.update_server(
-            id=mcp_server.id,
-            server_name=mcp_server.server_name,
-            command=mcp_server.command,
-            args=mcp_server.args,
-            env=mcp_server.env
-        )
+        # 新名称与同一用户下其他服务器冲突时由唯一约束拒绝更新
+        try:
+            updated_server = await self.mcp_server_dao.update_server(
+                id=mcp_server.id,
+                server_name=mcp_server.server_name,
+                command=mcp_server.command,
+                args=mcp_server.args,
+                env=mcp_server.env
+            )
+        except IntegrityError:
+            raise BaseAPIException(
+                status_code=ExceptionType.DUPLICATE_SERVER_NAME.code,
+                detail=ExceptionType.DUPLICATE_SERVER_NAME.message
+            )
         if not updated_server:
             raise BaseAPIException(
                 status_code=ExceptionType.SERVER_UPDATE_FAILED.code,
                 detail=ExceptionType.SERVER_UPDATE_FAILED.message
             )
+        # 本进程立即失效，其他 worker 通过变更通知失效
+        self.config_cache.invalidate(mcp_server.id)
         return self.to_dto(updated_server)
 
     # 删除server
@@ -137,13 +150,78 @@ class MCPConfigService:
                 status_code=ExceptionType.SERVER_DELETE_FAILED.code,
                 detail=ExceptionType.SERVER_DELETE_FAILED.message
             )
+        self.config_cache.invalidate(server_id)
         return success
 
+    # 批量导入servers
+    async def import_servers(self, user_id: int, config: MCPServersConfigDTO) -> List[MCPServerDTO]:
+        """
+        以标准 mcpServers 格式批量导入用户的服务器，同名服务器覆盖启动参数
+
+        Args:
+            user_id (int): 用户ID。
+            config (MCPServersConfigDTO): mcpServers 格式的服务器配置。
+
+        Returns:
+            List[MCPServerDTO]: 新增及更新后的服务器。
+        """
+        servers = []
+        for server_name, server_config in config.mcpServers.items():
+            if not server_name.strip():
+                raise BaseAPIException(
+                    status_code=ExceptionType.INVALID_PARAM.code,
+                    detail="MCP server name 不能为空"
+                )
+            if not server_config.command.strip():
+                raise BaseAPIException(
+                    status_code=ExceptionType.INVALID_PARAM.code,
+                    detail=f"MCP server {server_name} 的 command 不能为空"
+                )
+            servers.append({
+                "server_name": server_name,
+                "command": server_config.command,
+                "args": server_config.args,
+                "env": server_config.env,
+            })
+
+        upserted = await self.mcp_server_dao.upsert_servers(user_id, servers)
+        for server in upserted:
+            self.config_cache.invalidate(server.id)
+        return [self.to_dto(server) for server in upserted]
+
+    # 批量导出servers
+    async def export_servers(self, user_id: int) -> dict:
+        """
+        以标准 mcpServers 格式导出用户的全部服务器，可直接用于 MCP 客户端配置文件或再次导入
+
+        Args:
+            user_id (int): 用户ID。
+
+        Returns:
+            dict: {"mcpServers": {"server_name": {"command": ..., "args": [...], "env": {...}}}}。
+        """
+        servers = await self.mcp_server_dao.get_servers_by_user_id(user_id)
+        mcp_servers = {}
+        for server in servers:
+            mcp_servers.update(server.to_mcp_config())
+        return {"mcpServers": mcp_servers}
+
     # 加载mcp_server_config
     async def load_mcp_server_config(self, server_id: int) -> StdioServerParameters:
-        """ Load the server configuration from DB """
+        """ Load the server configuration from cache or DB """
         try:
-            mcp_sever = await self.get_server(server_id)
+            cached = self.config_cache.get(server_id)
+            if cached is not None:
+                return cached
+
+            generation = self.config_cache.generation(server_id)
+            server = await self.mcp_server_dao.get_server_by_id(server_id)
+            if server is None:
+                raise BaseAPIException(
+                    status_code=ExceptionType.RESOURCE_NOT_FOUND.code,
+                    detail=ExceptionType.RESOURCE_NOT_FOUND.message
+                )
+            mcp_sever = self.to_dto(server)
 
             # Construct the server parameters
             result = StdioServerParameters(
@@ -154,6 +232,9 @@ class MCPConfigService:
 
             # debug
             logger.debug(f"Loaded config from DB: command='{result.command}', args={result.args}, env={result.env}")
+            self.config_cache.put(server_id, result,
+                                  version=server.updated_at.isoformat() if server.updated_at else None,
+                                  generation=generation)
 
             # return result
             return result
@@ -1,14 +1,19 @@
 from dao.user_dao import UserDAO
 from core.common.logger import logger
-from passlib.hash import bcrypt
+from core.common.password_hasher import PasswordHasher, PasswordHasherBusyError
+from service.auth_service import AuthService
+from exception.exception import BaseAPIException
+from exception.exception_dict import ExceptionType
 from model.user import User
 from typing import List
 
 
 @logger
 class UserService:
-    def __init__(self, user_dao: UserDAO):
+    def __init__(self, user_dao: UserDAO, password_hasher: PasswordHasher, auth_service: AuthService):
         self.user_dao = user_dao
+        self.password_hasher = password_hasher
+        self.auth_service = auth_service
 
     async def get_users(self) -> List[User]:
         print("enter user service")
@@ -17,8 +22,21 @@ class UserService:
         return users
 
     async def create_user(self, name: str, email: str, password: str):
-        hashed_password = bcrypt.hash(password)
-        return await self.user_dao.create_user(name, email, hashed_password)
+        try:
+            hashed_password = await self.password_hasher.hash(password)
+        except PasswordHasherBusyError as e:
+            raise BaseAPIException(status_code=ExceptionType.TOO_MANY_REQUESTS.code, detail=str(e))
+        user = await self.user_dao.create_user(name, email, hashed_password)
+        # 用户变更后删除认证缓存
+        self.auth_service.invalidate_user(name)
+        return user
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """在密码哈希线程池中校验密码，不阻塞事件循环"""
+        try:
+            return await self.password_hasher.verify(plain_password, hashed_password)
+        except PasswordHasherBusyError as e:
+            raise BaseAPIException(status_code=ExceptionType.TOO_MANY_REQUESTS.code, detail=str(e))
 
     async def get_user_by_name(self, user_name) -> User:
         return await self.user_dao.get_user_by_name(user_name)
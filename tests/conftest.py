@@ -0,0 +1,11 @@
+import os
+
+# 导入容器时会创建数据库引擎（不建立连接），测试不访问数据库，未配置时使用占位值
+for name, value in {
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_NAME": "efflux_test",
+    "DATABASE_USERNAME": "efflux",
+    "DATABASE_PASSWORD": "efflux",
+}.items():
+    os.environ.setdefault(name, value)
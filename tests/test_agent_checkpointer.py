@@ -0,0 +1,87 @@
+import asyncio
+import operator
+import time
+from typing import Annotated, TypedDict
+from langgraph.graph import END, START, StateGraph
+from core.llm.agent_checkpointer import AgentCheckpointer
+
+
+class State(TypedDict):
+    messages: Annotated[list, operator.add]
+
+
+def build_graph(checkpointer: AgentCheckpointer):
+    graph = StateGraph(State)
+    graph.add_node("reply", lambda state: {"messages": [f"reply {len(state['messages'])}"]})
+    graph.add_edge(START, "reply")
+    graph.add_edge("reply", END)
+    return graph.compile(checkpointer=checkpointer.saver)
+
+
+async def run_turn(checkpointer: AgentCheckpointer, thread_id: str, query: str = "hi"):
+    await build_graph(checkpointer).ainvoke({"messages": [query]}, AgentCheckpointer.config(thread_id))
+    await checkpointer.prune(thread_id)
+
+
+def test_prune_keeps_latest_checkpoints_and_state():
+    """清理后每个会话只保留最近的检查点及其写入记录，最新状态不变"""
+    checkpointer = AgentCheckpointer("memory", keep_checkpoints=2)
+
+    async def run():
+        await run_turn(checkpointer, "1", "q1")
+        await run_turn(checkpointer, "1", "q2")
+        return await build_graph(checkpointer).aget_state(AgentCheckpointer.config("1"))
+
+    state = asyncio.run(run())
+    checkpoints = checkpointer.saver.storage["1"][""]
+    assert len(checkpoints) == 2
+    assert {key[2] for key in checkpointer.saver.writes if key[0] == "1"} <= set(checkpoints)
+    assert state.values["messages"] == ["q1", "reply 1", "q2", "reply 3"]
+
+
+def test_max_threads_evicts_least_recently_used():
+    checkpointer = AgentCheckpointer("memory", max_threads=2)
+
+    async def run():
+        for thread_id in ("1", "2", "3"):
+            await run_turn(checkpointer, thread_id)
+
+    asyncio.run(run())
+    assert set(checkpointer.saver.storage) == {"2", "3"}
+    assert not [key for key in checkpointer.saver.writes if key[0] == "1"]
+
+
+def test_expire_deletes_idle_threads():
+    checkpointer = AgentCheckpointer("memory", thread_ttl=60)
+
+    async def run():
+        await run_turn(checkpointer, "1")
+        await run_turn(checkpointer, "2")
+        checkpointer._last_used["1"] = time.monotonic() - 120
+        await checkpointer.expire()
+        return await checkpointer.has_state("1"), await checkpointer.has_state("2")
+
+    assert asyncio.run(run()) == (False, True)
+    assert list(checkpointer._last_used) == ["2"]
+
+
+def test_lock_serializes_thread_and_is_released():
+    """同一会话的锁依次获取，退出（含异常退出）后释放"""
+    checkpointer = AgentCheckpointer("memory")
+    events = []
+
+    async def turn(name: str, fail: bool = False):
+        async with checkpointer.lock("1"):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+            if fail:
+                raise ValueError(name)
+
+    async def run():
+        results = await asyncio.gather(turn("a", fail=True), turn("b"), return_exceptions=True)
+        assert isinstance(results[0], ValueError)
+
+    asyncio.run(run())
+    assert events == ["a start", "a end", "b start", "b end"]
+    assert checkpointer._locks == {}
@@ -0,0 +1,79 @@
+from dependency_injector import providers
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from controller import chat_controller, chat_window_controller
+from controller.auth_dependency import get_current_user
+from core.common.container import Container
+from dto.mcp_server_dto import MCPServerDTO
+from dto.user_dto import UserResult
+from exception.exception import global_exception_handlers
+from exception.exception_dict import ExceptionType
+
+
+class FakeMCPConfigService:
+    """只提供 get_server 的 MCP 配置服务，服务器 2 属于用户 2"""
+
+    async def get_server(self, server_id: int) -> MCPServerDTO:
+        return MCPServerDTO(id=server_id, user_id=2, server_name="other", command="npx", args=[], env={"API_KEY": "x"})
+
+
+class FakeChatWindowService:
+    """会话 2 属于用户 2，其他会话不存在"""
+
+    def __init__(self):
+        self.loaded = False
+
+    async def get_chat_window_user_id(self, chat_window_id: int):
+        return 2 if chat_window_id == 2 else None
+
+    async def get_chat_window(self, chat_window_id: int):
+        self.loaded = True
+        raise AssertionError("未通过鉴权时不应加载会话")
+
+
+class FakeChatService:
+    def __init__(self):
+        self.called = False
+
+    async def agent_stream(self, chat_dto):
+        self.called = True
+        yield "started"
+
+    async def normal_chat(self, chat_dto):
+        self.called = True
+        return "started"
+
+
+def make_client(chat_service: FakeChatService) -> TestClient:
+    app = FastAPI(exception_handlers=global_exception_handlers)
+    app.include_router(chat_controller.router)
+    app.dependency_overrides[get_current_user] = lambda: UserResult(id=1, name="alice", email="alice@example.com")
+    app.dependency_overrides[chat_controller.get_chat_service] = lambda: chat_service
+    return TestClient(app)
+
+
+def test_chat_with_other_users_mcp_server_is_rejected():
+    """用户 1 不能使用用户 2 的 MCP 服务器发起对话，也不会启动该服务器的进程"""
+    chat_service = FakeChatService()
+    client = make_client(chat_service)
+    with Container.mcp_config_service.override(providers.Object(FakeMCPConfigService())):
+        for path in ("/chat/stream_agent", "/chat/normal_chat"):
+            response = client.post(path, json={"user_id": 1, "server_id": 2, "query": "hello"})
+            assert response.json()["code"] != 200
+            assert response.json()["sub_code"] == ExceptionType.AUTHORIZATION_FAILED.code
+    assert not chat_service.called
+
+
+def test_other_users_chat_window_is_not_loaded_or_revealed():
+    """用户 1 读取用户 2 的会话与读取不存在的会话结果相同，且不加载会话内容"""
+    chat_window_service = FakeChatWindowService()
+    app = FastAPI(exception_handlers=global_exception_handlers)
+    app.include_router(chat_window_controller.router)
+    app.dependency_overrides[get_current_user] = lambda: UserResult(id=1, name="alice", email="alice@example.com")
+    app.dependency_overrides[chat_window_controller.get_chat_window_service] = lambda: chat_window_service
+    client = TestClient(app)
+    with Container.chat_window_service.override(providers.Object(chat_window_service)):
+        responses = [client.get(f"/chat_window/{chat_window_id}").json() for chat_window_id in (2, 3)]
+    assert [response["sub_code"] for response in responses] == [ExceptionType.RESOURCE_NOT_FOUND.code] * 2
+    assert responses[0] == responses[1]
+    assert not chat_window_service.loaded
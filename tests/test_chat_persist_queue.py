@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from sqlalchemy.exc import IntegrityError
+from service.chat_persist_queue import ChatPersistQueue
+
+
+class FakeChatMessageService:
+    """按批写入对话，批次中包含 bad 中的问题时整批失败（模拟违反约束）"""
+
+    def __init__(self):
+        self.bad = set()
+        self.written = []
+
+    async def append_turns(self, turns):
+        if any(query in self.bad for _, query, _ in turns):
+            raise IntegrityError("INSERT INTO chat_message", {}, Exception("violates foreign key constraint"))
+        self.written.extend(turns)
+
+
+class FakeChatSummaryService:
+    def schedule_compaction(self, chat_window_id):
+        pass
+
+
+class FakeHistoryStore:
+    def __init__(self):
+        self.invalidated = set()
+
+    @asynccontextmanager
+    async def lock(self, chat_id):
+        yield
+
+    async def invalidate(self, chat_id):
+        self.invalidated.add(chat_id)
+
+
+def make_queue(tmp_path, monkeypatch, max_replays=5):
+    monkeypatch.setenv("PERSIST_SPOOL_PATH", str(tmp_path / "spool.jsonl"))
+    monkeypatch.setenv("PERSIST_RETRY_BACKOFF_MS", "0")
+    monkeypatch.setenv("PERSIST_MAX_REPLAYS", str(max_replays))
+    return ChatPersistQueue(FakeChatMessageService(), FakeChatSummaryService(), FakeHistoryStore())
+
+
+def read_records(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_failing_turn_does_not_spool_other_chats(tmp_path, monkeypatch):
+    """批次中一轮对话违反约束时只有该对话落盘，不重试，其他会话的对话照常写入"""
+    queue = make_queue(tmp_path, monkeypatch)
+    messages = queue.chat_message_service
+    messages.bad = {"b"}
+
+    asyncio.run(queue._flush([(1, "a", "ra"), (2, "b", "rb"), (3, "c", "rc"), (1, "d", "rd")]))
+
+    assert messages.written == [(1, "a", "ra"), (3, "c", "rc"), (1, "d", "rd")]
+    assert [r["chat_window_id"] for r in read_records(queue.spool_path)] == [2]
+    assert queue.stats()["retries"] == 0
+    assert queue.history_store.invalidated == {2}
+
+
+def test_spooled_chat_keeps_message_order(tmp_path, monkeypatch):
+    """会话有对话落盘后，其新对话也落盘，重放时按提交顺序写入"""
+    queue = make_queue(tmp_path, monkeypatch)
+    messages = queue.chat_message_service
+    messages.bad = {"b"}
+
+    async def run():
+        await queue._flush([(1, "a", "ra"), (2, "b", "rb")])
+        # 会话 2 的新对话不越过落盘的对话写入；会话 3 写入成功后触发重放，会话 2 仍失败
+        await queue._flush([(2, "d", "rd"), (3, "e", "re")])
+        assert [turn for turn in messages.written if turn[0] == 2] == []
+        # 数据修复后重放，会话 2 的对话按顺序写入
+        messages.bad = set()
+        await queue._flush([(4, "f", "rf")])
+
+    asyncio.run(run())
+
+    assert [turn[1] for turn in messages.written if turn[0] == 2] == ["b", "d"]
+    assert read_records(queue.spool_path) == []
+    assert not queue._spooled_chats
+
+
+def test_turn_is_dead_lettered_after_max_replays(tmp_path, monkeypatch):
+    """重放次数用尽的对话移入死信文件，该会话之后的对话恢复直接写入"""
+    queue = make_queue(tmp_path, monkeypatch, max_replays=1)
+    messages = queue.chat_message_service
+    messages.bad = {"b"}
+
+    async def run():
+        await queue._flush([(2, "b", "rb")])
+        await queue._flush([(1, "a", "ra")])
+        await queue._flush([(2, "c", "rc")])
+
+    asyncio.run(run())
+
+    assert [(r["chat_window_id"], r["query"], r["replays"]) for r in read_records(queue.dead_letter_path)] \
+        == [(2, "b", 1)]
+    assert messages.written == [(1, "a", "ra"), (2, "c", "rc")]
+    assert queue.stats()["dead_lettered_turns"] == 1
@@ -0,0 +1,28 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from core.llm.context_builder import ContextBuilder
+
+
+def tool_call(call_id: str) -> dict:
+    return {"name": "search", "args": {"q": call_id}, "id": call_id}
+
+
+def test_drop_dangling_tool_calls_removes_answered_results_of_dropped_call():
+    """工具调用消息中只有部分调用有结果时，该消息及已有的工具结果一起移除，不留下没有对应调用的工具结果"""
+    messages = [
+        HumanMessage(content="q1"),
+        AIMessage(content="", tool_calls=[tool_call("1"), tool_call("2")]),
+        ToolMessage(content="r1", tool_call_id="1"),
+    ]
+    assert ContextBuilder.drop_dangling_tool_calls(messages) == [messages[0]]
+
+
+def test_drop_dangling_tool_calls_keeps_complete_tool_rounds():
+    messages = [
+        HumanMessage(content="q1"),
+        AIMessage(content="", tool_calls=[tool_call("1")]),
+        ToolMessage(content="r1", tool_call_id="1"),
+        AIMessage(content="a1"),
+        HumanMessage(content="q2"),
+        AIMessage(content="", tool_calls=[tool_call("2")]),
+    ]
+    assert ContextBuilder.drop_dangling_tool_calls(messages) == messages[:5]
@@ -0,0 +1,48 @@
+import asyncio
+from core.llm.llm_scheduler import LLMScheduler, ProviderLimits
+
+
+def test_cancelled_waiters_do_not_fill_queue():
+    """排队期间断开的请求不再占用队列名额"""
+
+    async def run():
+        scheduler = LLMScheduler(ProviderLimits(max_concurrency=1, max_queue_depth=2))
+        release = asyncio.Event()
+
+        async def call(user_id: int, hold: bool = False):
+            async with scheduler.acquire("p", user_id, 10):
+                if hold:
+                    await release.wait()
+
+        holder = asyncio.create_task(call(1, hold=True))
+        await asyncio.sleep(0)
+        cancelled = [asyncio.create_task(call(2)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for task in cancelled:
+            task.cancel()
+        await asyncio.gather(*cancelled, return_exceptions=True)
+        assert scheduler.stats()["p"]["queue_depth"] == 0
+
+        # 已取消的等待者仍在堆中，但不影响新请求排队
+        live = [asyncio.create_task(call(3)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["p"]["queue_depth"] == 2
+        release.set()
+        await asyncio.gather(holder, *live)
+        assert scheduler.stats()["p"]["rejected"] == 0
+
+    asyncio.run(run())
+
+
+def test_charge_survives_queue_drain():
+    """合并请求记入的代价在队列清空后仍保留，该用户之后的请求排在其他用户之后"""
+
+    async def run():
+        scheduler = LLMScheduler(ProviderLimits())
+        scheduler.charge("p", 1, 1000)
+        async with scheduler.acquire("p", 2, 10):
+            pass
+        return scheduler._providers["p"].last_finish
+
+    last_finish = asyncio.run(run())
+    assert last_finish[1] == 1000
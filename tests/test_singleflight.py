@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from core.llm.singleflight import FlightCancelledError, SingleFlight
+
+
+def test_request_after_last_subscriber_leaves_starts_new_flight():
+    """最后一个订阅者退出后到达的相同请求发起新的调用，不会收到已取消调用的异常"""
+    calls = []
+
+    async def upstream():
+        calls.append(len(calls))
+        for i in range(3):
+            yield i
+            await asyncio.sleep(0.01)
+
+    async def run():
+        flight = SingleFlight()
+        first = flight.stream("k", upstream)
+        assert await first.__anext__() == 0
+        await first.aclose()
+        # 上游调用的取消尚未完成时到达的新请求
+        return [chunk async for chunk in flight.stream("k", upstream)]
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    assert calls == [0, 1]
+
+
+def test_cancelled_flight_raises_dedicated_error():
+    """共享的上游调用被取消时，订阅者收到 FlightCancelledError 而不是 CancelledError"""
+
+    async def upstream():
+        yield 0
+        await asyncio.sleep(10)
+        yield 1
+
+    async def run():
+        flight = SingleFlight()
+        stream = flight.stream("k", upstream)
+        assert await stream.__anext__() == 0
+        next_chunk = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        flight._streams["k"].task.cancel()
+        with pytest.raises(FlightCancelledError):
+            await next_chunk
+
+    asyncio.run(run())
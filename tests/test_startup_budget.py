@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import profile_imports  # noqa: E402
+
+# 冷启动导入 main 的预算（毫秒），CI 机器较慢时可调大
+BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 1500))
+
+
+@pytest.mark.skipif(os.getenv("STARTUP_IMPORT_BUDGET_MS") == "0", reason="STARTUP_IMPORT_BUDGET_MS=0 时不检查")
+def test_cold_import_within_budget():
+    """冷启动导入应用不超出预算，且不加载由容器延迟导入的包（langchain、langgraph 等）"""
+    report, failures = profile_imports.check("main", runs=3, top=10, budget_ms=BUDGET_MS,
+                                             forbid=profile_imports.DEFAULT_FORBIDDEN)
+    assert not failures, report
@@ -1,15 +1,17 @@
-from typing import Optional, Any
-from dto.global_response import GlobalResponse
-from pydantic import BaseModel
-from datetime import datetime
-import json
-
-class DateTimeEncoder(json.JSONEncoder):
-    """自定义JSON编码器，用于处理datetime对象"""
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+import hashlib
+import os
+from typing import Optional, Any, AsyncIterator, Union
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from dto.global_response import GlobalResponse, GlobalStreamingResponse
+
+# 加载环境变量
+load_dotenv()
+
+# 可条件请求的列表接口的缓存策略，默认每次使用前都需要向服务端验证 ETag
+# （部分 env-file 解析器会保留引号，去掉两端的引号）
+LIST_CACHE_CONTROL = os.getenv("LIST_CACHE_CONTROL", "private, no-cache").strip().strip('"\'')
+
 
 def build_response(data: Optional[Any] = None) -> GlobalResponse:
     """构建成功响应
@@ -20,21 +22,33 @@ def build_response(data: Optional[Any] = None) -> GlobalResponse:
     Returns:
         GlobalResponse: 统一的成功响应格式
     """
-    # 如果是 Pydantic 模型或包含 Pydantic 模型的列表，转换为字典
-    if isinstance(data, BaseModel):
-        data = data.model_dump()
-    elif isinstance(data, list):
-        data = [item.model_dump() if isinstance(item, BaseModel) else item for item in data]
-        
+    # Pydantic 模型（或其列表）由 GlobalResponse 直接序列化，无需先转换为字典
     return GlobalResponse(
         code=200,
         sub_code=200,
         sub_message="success",
-        data=data,
-        json_encoder=DateTimeEncoder
+        data=data
     )
 
 
+async def build_stream_response(items: AsyncIterator[Any]) -> Union[GlobalResponse, GlobalStreamingResponse]:
+    """构建 data 为数组的流式成功响应
+
+    在返回响应前先取出第一个元素，查询出错时仍按普通异常处理返回错误响应；结果为空时直接返回普通响应。
+
+    Args:
+        items: 数组元素的异步迭代器（异步生成器）
+
+    Returns:
+        Union[GlobalResponse, GlobalStreamingResponse]: 与 build_response(list) 相同格式的响应
+    """
+    try:
+        first = await anext(items)
+    except StopAsyncIteration:
+        return build_response([])
+    return GlobalStreamingResponse(items, head=[first])
+
+
 def build_error_response(sub_code: int, sub_message: str, data: Optional[Any] = None) -> GlobalResponse:
     """构建错误响应
     
@@ -50,8 +64,7 @@ def build_error_response(sub_code: int, sub_message: str, data: Optional[Any] =
         code=500,
         sub_code=sub_code,
         sub_message=sub_message,
-        data=data,
-        json_encoder=DateTimeEncoder
+        data=data
     )
 
 
@@ -69,6 +82,65 @@ def build_validation_error_response(sub_code: int, errors: list) -> GlobalRespon
         code=400,
         sub_code=sub_code,
         sub_message="参数验证错误",
-        data=errors,
-        json_encoder=DateTimeEncoder
+        data=errors
     )
+
+
+def build_etag(*parts: Any) -> str:
+    """根据资源的版本信息（如记录数、最大更新时间）生成强 ETag
+
+    Args:
+        parts: 版本信息
+
+    Returns:
+        str: 带引号的 ETag
+    """
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """请求的 If-None-Match 是否与当前 ETag 匹配（弱比较）
+
+    Args:
+        request: 请求
+        etag: 当前 ETag
+
+    Returns:
+        bool: 匹配时应返回 304
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 弱比较：忽略 W/ 前缀
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def build_not_modified_response(etag: str) -> Response:
+    """构建 304 响应（无响应体）
+
+    Args:
+        etag: 当前 ETag
+
+    Returns:
+        Response: 304 响应
+    """
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL})
+
+
+def set_cache_headers(response: Response, etag: str) -> Response:
+    """为响应设置 ETag 及 Cache-Control
+
+    Args:
+        response: 响应
+        etag: 当前 ETag
+
+    Returns:
+        Response: 原响应
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = LIST_CACHE_CONTROL
+    return response